@@ -1,15 +1,17 @@
 
 from fastapi import APIRouter
-from app.api.endpoints import books, tasks, voice, config, version, logs, files, system
+from app.api.endpoints import books, tasks, voice, config, version, logs, files, system, events
 
 api_router = APIRouter()
 api_router.include_router(files.router, prefix="/files", tags=["files"])
 api_router.include_router(system.router, prefix="/system", tags=["system"])
 api_router.include_router(books.router, tags=["books"])
+# logs 须在 tasks 之前注册: /logs/search 不能被 /logs/{book_name} 截获
+api_router.include_router(logs.router, tags=["logs"])
 api_router.include_router(tasks.router, tags=["tasks"])
 api_router.include_router(voice.router, tags=["voice"])
 api_router.include_router(config.router, tags=["config"])
 api_router.include_router(version.router, tags=["version"])
-api_router.include_router(logs.router, tags=["logs"])
+api_router.include_router(events.router, tags=["events"])
 
 
@@ -1,5 +1,5 @@
 import time
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Query, Request, Response
 from fastapi.responses import FileResponse, StreamingResponse
 import shutil
 import pathlib
@@ -13,22 +13,39 @@ import logging
 import threading
 import shutil
 import re
+import hashlib
+from urllib.parse import quote
 
 logger = logging.getLogger(__name__)
 
 from app.core.config import APP_DATA_DIR, CACHE_DIR, EXPORT_DIR
-from app.core.state import state
+from app.api.etag import make_etag, not_modified, set_etag
+from app.db.jobs import job_store
+from app.services.job_control import job_control
+from app.services.job_runner import job_runner
 from app.core.log_manager import log_manager
+from app.core.event_bus import event_bus
 from app.services.book_manager import BookProcessor
+from app.core.mp3_info import measure_duration_ms
+from app.services.audio_stream import VirtualAudioStream, RangeNotSatisfiable, parse_range, stream_index_cache
+from app.services.zip_stream import StreamingZip, ZipMember, file_crc32
+from app.services.pack_queue import pack_queue
+from app.services.audiobook_export import export_audiobook
 from app.schemas.book import Book, Chapter
 from app.schemas.config import GenerateRequest
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 router = APIRouter()
 
 def get_book_dir(book_name: str) -> pathlib.Path:
     """获取书籍音频目录，处理末尾空格的兼容性"""
+    # 0. 已登记的书籍直接使用 books.dir_name，无需探测文件系统
+    from app.db.database import db
+    dir_name = db.get_book_dir_name(book_name)
+    if dir_name:
+        return APP_DATA_DIR / dir_name
+
     # 1. 尝试完全匹配
     path = APP_DATA_DIR / f"{book_name}_audio"
     if path.exists():
@@ -44,92 +61,131 @@ def get_book_dir(book_name: str) -> pathlib.Path:
     # 3. 实在找不到，返回常规路径（即使不存在）
     return APP_DATA_DIR / f"{book_name}_audio"
 
+def _active_jobs() -> Dict[tuple, dict]:
+    """任务表中的未结束任务 (所有进程)，键为 (书名, 任务类型)"""
+    return {(job['book'], job['kind']): job for job in job_store.active_jobs()}
+
+def _build_book_status(book_name: str, stats: Optional[dict], assets: List[dict],
+                       jobs: Optional[Dict[tuple, dict]] = None) -> dict:
+    """根据 book_stats 行、资产列表与未结束任务组装书籍状态 (不访问文件系统)"""
+    if not stats:
+        # 可能是新书或者未导入 DB
+        return {"total": 0, "completed": 0, "status": "pending"}
+
+    total = stats['total']
+    completed = stats['completed']
+
+    if jobs is None:
+        jobs = _active_jobs()
+
+    # Check if actually running
+    is_running = (book_name, "tts") in jobs
+
+    if is_running:
+        status = "processing"
+    elif completed == total and total > 0:
+        status = "completed"
+    else:
+        status = "pending" # Paused or not started
+
+    zip_status = "none"
+    pack_position = None
+    pack_job = jobs.get((book_name, "pack"))
+    if pack_job:
+        zip_status = job_control.pack_status(pack_job)
+        pack_position = job_store.queue_position(pack_job)
+    elif assets:
+        zip_status = "ready"
+
+    return {
+        "total": total,
+        "completed": completed,
+        "failed": stats['failed'],
+        "chars_total": stats['chars_total'],
+        "chars_done": stats['chars_done'],
+        "audio_bytes": stats['audio_bytes'],
+        "audio_duration_ms": stats['audio_duration_ms'],
+        "status": status,
+        "zip_status": zip_status,
+        "pack_position": pack_position,
+        "zip_assets": assets
+    }
+
+def _asset_to_dict(row) -> dict:
+    return {
+        "id": row['id'],
+        "filename": row['filename'],
+        "description": row['description'],
+        "size": row['size_str'],
+        "created_at": row['created_at']
+    }
+
+def _runtime_fingerprint(jobs: Dict[tuple, dict]) -> str:
+    """影响书籍列表、但不计入数据版本号的任务状态 (运行中的任务与打包状态)"""
+    return repr(sorted((key, job['status'], job['paused'], job['cancel_requested']) for key, job in jobs.items()))
+
 def get_book_status(book_name: str):
     from app.db.database import db
-    book_dir = get_book_dir(book_name)
     try:
         cursor = db.get_cursor()
         cursor.execute(
-            "SELECT status, count(*) as count FROM tasks WHERE book_name = ? GROUP BY status", 
+            "SELECT s.* FROM books b JOIN book_stats s ON s.book_id = b.id WHERE b.name = ?",
             (book_name,)
         )
-        rows = cursor.fetchall()
-        
-        if not rows:
-            # 可能是新书或者未导入 DB
-            return {"total": 0, "completed": 0, "status": "pending"}
-
-        stats = {row['status']: row['count'] for row in rows}
-        total = sum(stats.values())
-        completed = stats.get('completed', 0)
-        
-        # Check if actually running
-        is_running = book_name in state.active_processors
-        
-        if is_running:
-            status = "processing"
-        elif completed == total and total > 0:
-            status = "completed"
-        else:
-            status = "pending" # Paused or not started
-            
-    
-        # Check zip status from DB
-        zip_assets = []
+        stats = cursor.fetchone()
         cursor.execute(
-            "SELECT id, filename, description, size_str, created_at FROM book_assets WHERE book_name = ? ORDER BY created_at DESC",
+            "SELECT id, filename, description, size_str, created_at FROM book_assets "
+            "WHERE book_id = (SELECT id FROM books WHERE name = ?) ORDER BY created_at DESC",
             (book_name,)
         )
-        asset_rows = cursor.fetchall()
-        for row in asset_rows:
-            # Verify file exists on disk
-            asset_path = EXPORT_DIR / row['filename']
-            if asset_path.exists():
-                zip_assets.append({
-                    "id": row['id'],
-                    "filename": row['filename'],
-                    "description": row['description'],
-                    "size": row['size_str'],
-                    "created_at": row['created_at']
-                })
-            else:
-                # Optionally cleanup missing files from DB
-                cursor.execute("DELETE FROM book_assets WHERE id = ?", (row['id'],))
-        db.commit()
-
-        zip_status = "none"
-        if book_name in state.active_packers:
-            zip_status = state.active_packers[book_name]
-        elif zip_assets:
-            zip_status = "ready"
-
-        return {
-            "total": total, 
-            "completed": completed, 
-            "status": status, 
-            "zip_status": zip_status,
-            "zip_assets": zip_assets
-        }
+        assets = [_asset_to_dict(row) for row in cursor.fetchall()]
+        return _build_book_status(book_name, dict(stats) if stats else None, assets)
     except Exception as e:
         logger.error(f"Error getting book status: {e}")
         return {"total": 0, "completed": 0, "status": "error"}
 
 @router.get("/books", response_model=None) # /api/books
-async def list_books():
-    books = []
-    if not APP_DATA_DIR.exists():
+async def list_books(request: Request, response: Response):
+    """书籍列表: 统计数据来自触发器维护的 book_stats，不再逐本扫描目录和 GROUP BY"""
+    from app.db.database import db
+    try:
+        jobs = _active_jobs()
+        etag = make_etag("books", db.get_revision(), _runtime_fingerprint(jobs))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        set_etag(response, etag)
+
+        cursor = db.get_cursor()
+        cursor.execute("""
+            SELECT b.id AS book_id, b.name, b.dir_name,
+                   s.total, s.completed, s.failed, s.chars_total, s.chars_done, s.audio_bytes,
+                   s.audio_duration_ms
+            FROM books b LEFT JOIN book_stats s ON s.book_id = b.id
+            ORDER BY b.name
+        """)
+        book_rows = [dict(row) for row in cursor.fetchall()]
+
+        # 资产一次性查出后按书籍分组；缺失文件在下载时清理
+        cursor.execute(
+            "SELECT id, book_id, filename, description, size_str, created_at FROM book_assets ORDER BY created_at DESC"
+        )
+        assets_by_book = {}
+        for row in cursor.fetchall():
+            assets_by_book.setdefault(row['book_id'], []).append(_asset_to_dict(row))
+    except Exception as e:
+        logger.error(f"Error listing books: {e}")
         return []
-        
-    for item in APP_DATA_DIR.iterdir():
-        if item.is_dir() and item.name.endswith("_audio"):
-            # Trim book_name to remove potential trailing spaces from filesystem
-            book_name = item.name.replace("_audio", "").strip()
-            status_info = get_book_status(book_name)
-            books.append({
-                "name": book_name,
-                "path": str(item),
-                **status_info
-            })
+
+    books = []
+    for row in book_rows:
+        book_name = row['name']
+        stats = row if row['total'] is not None else None
+        books.append({
+            "name": book_name,
+            "path": str(APP_DATA_DIR / row['dir_name']),
+            **_build_book_status(book_name, stats, assets_by_book.get(row['book_id'], []), jobs)
+        })
     return books
 
 @router.post("/upload")
@@ -144,6 +200,7 @@ async def upload_book(file: UploadFile = File(...)):
         await asyncio.to_thread(processor.process)
         
         logger.info(f"📚 Book uploaded and processed: {file.filename}")
+        event_bus.publish("book_imported", {"book": file_path.stem})
         
         return {"message": f"Successfully uploaded and processed {file.filename}"}
     except Exception as e:
@@ -154,12 +211,19 @@ async def upload_book(file: UploadFile = File(...)):
 async def delete_book(book_name: str):
     """删除书籍及其所有文件"""
     # 1. 检查是否正在运行
-    if book_name in state.active_processors:
+    if job_store.is_active(book_name):
         raise HTTPException(status_code=400, detail="Cannot delete book while processing. Please stop the task first.")
     
-    # 2. 删除数据库记录
+    # 2. 删除数据库记录 (先记下已登记的资产文件，记录删除后无法再关联)
     from app.db.database import db
+    asset_files = []
     try:
+        cursor = db.get_cursor()
+        cursor.execute(
+            "SELECT filename FROM book_assets WHERE book_id = (SELECT id FROM books WHERE name = ?)",
+            (book_name,)
+        )
+        asset_files = [row['filename'] for row in cursor.fetchall()]
         db.delete_book_tasks(book_name)
     except Exception as e:
         # 记录错误但继续尝试删除文件
@@ -175,13 +239,14 @@ async def delete_book(book_name: str):
             raise HTTPException(status_code=500, detail=f"Failed to delete book directory: {e}")
 
     # 3.5 删除所有相关资产 (zip)
-    try:
-        zip_path = EXPORT_DIR / f"{book_name}.zip"
-        if zip_path.exists():
-            zip_path.unlink()
-            logger.info(f"Deleted zip asset for {book_name}")
-    except Exception as e:
-        logger.error(f"Failed to delete zip asset for {book_name}: {e}")
+    for filename in [f"{book_name}.zip", *asset_files]:
+        try:
+            zip_path = EXPORT_DIR / filename
+            if zip_path.exists():
+                zip_path.unlink()
+                logger.info(f"Deleted zip asset for {book_name}: {filename}")
+        except Exception as e:
+            logger.error(f"Failed to delete zip asset for {book_name}: {e}")
 
     # 4. 删除源文件 (txt/epub)
     # 遍历 APP_DATA_DIR 找到同名文件 (忽略扩展名)
@@ -200,19 +265,30 @@ async def delete_book(book_name: str):
     except Exception as e:
          logger.error(f"Error scanning for source files: {e}")
             
+    stream_index_cache.invalidate(book_name)
     logger.info(f"🗑️ Book deleted: {book_name}")
+    event_bus.publish("book_deleted", {"book": book_name})
     return {"message": f"Book '{book_name}' deleted successfully"}
 
 @router.get("/chapters/{book_name}")
-async def list_chapters_api(book_name: str):
+async def list_chapters_api(book_name: str, request: Request, response: Response):
+    from app.db.database import db
     book_dir = get_book_dir(book_name)
     if not book_dir.exists():
         raise HTTPException(status_code=404, detail="Book not found")
-        
-    from app.db.database import db
+
+    etag = make_etag("chapters", book_name, db.get_revision(book_name))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     try:
+        set_etag(response, etag)
         cursor = db.get_cursor()
-        cursor.execute("SELECT * FROM tasks WHERE book_name = ? ORDER BY chapter_index", (book_name,))
+        cursor.execute(
+            "SELECT * FROM tasks WHERE book_id = (SELECT id FROM books WHERE name = ?) ORDER BY chapter_index",
+            (book_name,)
+        )
         rows = cursor.fetchall()
         
         if not rows:
@@ -238,7 +314,7 @@ async def clean_chapters(book_name: str, request: CleanRequest):
          raise HTTPException(status_code=404, detail="Book not found")
          
     # Check if running
-    if book_name in state.active_processors:
+    if job_store.is_active(book_name):
         raise HTTPException(status_code=400, detail="Cannot clean while task is running. Please pause or stop first.")
 
     from app.db.database import db
@@ -252,8 +328,9 @@ async def clean_chapters(book_name: str, request: CleanRequest):
         
         # 1. 查找需要清理的任务以获取文件名
         placeholders = ','.join(['?'] * len(request.chapter_ids))
-        query = f"SELECT chapter_index, title, audio_path FROM tasks WHERE book_name = ? AND chapter_index IN ({placeholders})"
-        cursor.execute(query, (book_name, *request.chapter_ids))
+        book_id = db.get_book_id(book_name)
+        query = f"SELECT chapter_index, title, audio_path FROM tasks WHERE book_id = ? AND chapter_index IN ({placeholders})"
+        cursor.execute(query, (book_id, *request.chapter_ids))
         rows = cursor.fetchall()
         
         if not rows:
@@ -275,9 +352,10 @@ async def clean_chapters(book_name: str, request: CleanRequest):
             cleaned_count += 1
             
         # 2. Reset status in DB
-        update_query = f"UPDATE tasks SET status = 'pending', audio_path = NULL WHERE book_name = ? AND chapter_index IN ({placeholders})"
-        cursor.execute(update_query, (book_name, *request.chapter_ids))
+        update_query = f"UPDATE tasks SET status = 'pending', audio_path = NULL, audio_bytes = 0, audio_mtime = NULL, audio_duration_ms = NULL, audio_crc32 = NULL WHERE book_id = ? AND chapter_index IN ({placeholders})"
+        cursor.execute(update_query, (book_id, *request.chapter_ids))
         conn.commit()
+        event_bus.publish("book_stats", {"book": book_name, **db.get_book_stats(book_name)})
                 
         return {"message": f"Cleaned {cleaned_count} chapters"}
     except Exception as e:
@@ -304,51 +382,204 @@ async def open_folder_api(book_name: str = Query(...)):
 
 @router.get("/files/{book_name}")
 async def list_audio_files(book_name: str):
-    """获取书籍的所有音频文件列表"""
-    book_dir = get_book_dir(book_name)
-    if not book_dir.exists():
+    """获取书籍的所有音频文件列表 (来自数据库索引，不扫描目录)"""
+    from app.db.database import db
+    book_id = db.get_book_id(book_name)
+    if book_id is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    
-    files = []
-    for mp3_file in sorted(book_dir.glob("*.mp3")):
+
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT chapter_index, audio_path, audio_bytes, audio_duration_ms, audio_mtime FROM tasks "
+        "WHERE book_id = ? AND status = 'completed' AND audio_path IS NOT NULL ORDER BY chapter_index",
+        (book_id,)
+    )
+    return [{
+        "id": row['chapter_index'],
+        "filename": row['audio_path'],
+        "size": row['audio_bytes'] or 0,
+        "duration_ms": row['audio_duration_ms'],
+        "mtime": row['audio_mtime'],
+        "path": row['audio_path']
+    } for row in cursor.fetchall()]
+
+def reconcile_audio_files(book_name: str) -> dict:
+    """
+    按需将数据库中的音频索引与磁盘文件对齐
+    - 已完成但文件丢失/为空的章节重置为 pending
+    - 文件大小或修改时间变化的章节刷新 size / mtime / duration
+    - 旧数据中已完成但未记录 audio_path 的章节按 "0001-*.mp3" 补登记
+    """
+    from app.db.database import db
+    book_id = db.get_book_id(book_name)
+    if book_id is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book_dir = get_book_dir(book_name)
+
+    # 一次目录扫描，按章节号建立索引
+    on_disk = {}
+    if book_dir.exists():
+        for entry in os.scandir(book_dir):
+            match = re.match(r'^(\d+)-.*\.mp3$', entry.name)
+            if match and entry.is_file():
+                on_disk.setdefault(int(match.group(1)), entry)
+
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT chapter_index, audio_path, audio_bytes, audio_mtime, audio_duration_ms FROM tasks "
+        "WHERE book_id = ? AND status = 'completed'",
+        (book_id,)
+    )
+    refreshed, missing = [], []
+    for row in cursor.fetchall():
+        entry = on_disk.get(row['chapter_index'])
+        if row['audio_path'] and (entry is None or entry.name != row['audio_path']):
+            path = book_dir / row['audio_path']
+            entry = path if path.exists() else entry
         try:
-            # 解析文件名: 0001-章节标题.mp3
-            parts = mp3_file.name.split('-', 1)
-            if len(parts) >= 1:
-                file_id = int(parts[0])
-                file_size = mp3_file.stat().st_size
-                
-                files.append({
-                    "id": file_id,
-                    "filename": mp3_file.name,
-                    "size": file_size,
-                    "path": mp3_file.name
-                })
-        except (ValueError, IndexError):
-            # Skip files that don't match the expected format
+            file_stat = entry.stat() if entry is not None else None
+        except OSError:
+            file_stat = None
+        if file_stat is None or file_stat.st_size == 0:
+            missing.append((book_id, row['chapter_index']))
             continue
-    
-    return files
+
+        name = entry.name
+        if (name != row['audio_path'] or file_stat.st_size != row['audio_bytes']
+                or file_stat.st_mtime != row['audio_mtime'] or row['audio_duration_ms'] is None):
+            duration = measure_duration_ms(book_dir / name)
+            refreshed.append((name, file_stat.st_size, file_stat.st_mtime, duration, book_id, row['chapter_index']))
+
+    if refreshed:
+        cursor.executemany(
+            "UPDATE tasks SET audio_path = ?, audio_bytes = ?, audio_mtime = ?, audio_duration_ms = ?, audio_crc32 = NULL "
+            "WHERE book_id = ? AND chapter_index = ?",
+            refreshed
+        )
+    if missing:
+        cursor.executemany(
+            "UPDATE tasks SET status = 'pending', audio_path = NULL, audio_bytes = 0, audio_mtime = NULL, "
+            "audio_duration_ms = NULL, audio_crc32 = NULL WHERE book_id = ? AND chapter_index = ?",
+            missing
+        )
+    db.commit()
+    return {"refreshed": len(refreshed), "missing": len(missing)}
+
+@router.post("/files/{book_name}/reconcile")
+async def reconcile_audio_files_api(book_name: str):
+    """手动触发音频索引与磁盘文件的对账"""
+    if job_store.is_active(book_name):
+        raise HTTPException(status_code=400, detail="Cannot reconcile while task is running. Please pause or stop first.")
+    result = await asyncio.to_thread(reconcile_audio_files, book_name)
+    logger.info(f"🔄 音频索引对账完成 '{book_name}': 刷新 {result['refreshed']}，丢失 {result['missing']}")
+    if result['missing']:
+        from app.db.database import db
+        event_bus.publish("book_stats", {"book": book_name, **db.get_book_stats(book_name)})
+    return result
 
 @router.get("/file/{book_name}/{file_id}")
 async def download_single_file(book_name: str, file_id: int):
     """下载单个音频文件"""
+    from app.db.database import db
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT t.audio_path, t.audio_bytes, t.audio_mtime FROM tasks t JOIN books b ON b.id = t.book_id "
+        "WHERE b.name = ? AND t.chapter_index = ? AND t.status = 'completed' AND t.audio_path IS NOT NULL",
+        (book_name, file_id)
+    )
+    row = cursor.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # 已知确切路径，只需一次 stat (结果交给 FileResponse 复用)
+    mp3_file = get_book_dir(book_name) / row['audio_path']
+    try:
+        stat_result = mp3_file.stat()
+    except OSError:
+        raise HTTPException(status_code=404, detail="File missing on disk, try reconciling the file index")
+    return FileResponse(
+        mp3_file,
+        filename=mp3_file.name,
+        media_type="audio/mpeg",
+        stat_result=stat_result
+    )
+
+def _get_book_stream(book_name: str) -> VirtualAudioStream:
+    """获取 (或重建) 书籍的整本虚拟音频流索引"""
+    from app.db.database import db
+    revision = db.get_revision(book_name)
+    stream = stream_index_cache.get(book_name, revision)
+    if stream is not None:
+        return stream
+
     book_dir = get_book_dir(book_name)
     if not book_dir.exists():
         raise HTTPException(status_code=404, detail="Book not found")
-    
-    # 查找匹配的文件
-    for mp3_file in book_dir.glob(f"{file_id:04d}-*.mp3"):
-        return FileResponse(
-            mp3_file,
-            filename=mp3_file.name,
-            media_type="audio/mpeg"
-        )
-    
-    raise HTTPException(status_code=404, detail="File not found")
 
-    
-    raise HTTPException(status_code=404, detail="File not found")
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT chapter_index, title, audio_path FROM tasks "
+        "WHERE book_id = (SELECT id FROM books WHERE name = ?) AND status = 'completed' AND audio_path IS NOT NULL "
+        "ORDER BY chapter_index",
+        (book_name,)
+    )
+    files = [(book_dir / row['audio_path'], row['chapter_index'], row['title']) for row in cursor.fetchall()]
+    stream = VirtualAudioStream.from_files(files)
+    stream_index_cache.put(book_name, revision, stream)
+    return stream
+
+@router.get("/stream/{book_name}/index")
+async def book_stream_index(book_name: str):
+    """整本虚拟音频流的章节偏移表"""
+    stream = await asyncio.to_thread(_get_book_stream, book_name)
+    return {"total_size": stream.total_size, "chapters": stream.chapters()}
+
+@router.api_route("/stream/{book_name}", methods=["GET", "HEAD"])
+async def stream_book_audio(book_name: str, request: Request):
+    """
+    整本书音频流 (支持 HTTP Range)
+    已完成章节按顺序拼接为一个虚拟 MP3，播放器可在整本书范围内任意拖动，无需先合并
+    """
+    stream = await asyncio.to_thread(_get_book_stream, book_name)
+    if stream.total_size == 0:
+        raise HTTPException(status_code=404, detail="No audio files to stream")
+
+    from app.db.database import db
+    etag = make_etag("stream", book_name, db.get_revision(book_name), stream.total_size, weak=False)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(book_name)}.mp3"
+    }
+
+    # If-Range 与当前版本不一致时忽略 Range，返回完整内容
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        range_header = None
+
+    try:
+        byte_range = stream.parse_range(range_header)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{stream.total_size}"})
+
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{stream.total_size}"
+    else:
+        start, end = 0, stream.total_size - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="audio/mpeg")
+    return StreamingResponse(
+        stream.iter_range(start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type="audio/mpeg"
+    )
 
 def check_disk_space(target_dir: pathlib.Path, min_mb: int = 500):
     """Ensure sufficient disk space (default 500MB)"""
@@ -370,7 +601,169 @@ def sanitize_filename(name: str) -> str:
         name = "unnamed_file"
     return name
 
-def pack_book_task(book_name: str, target_dir: pathlib.Path, cancel_event: threading.Event, description: str = "Full Pack", file_ids: Optional[List[int]] = None):
+def _pack_filename(book_name: str, description: str) -> str:
+    """根据打包描述生成导出文件名 (e.g., "Chapters: 1-10" -> "书名_1-10.zip")"""
+    safe_book_name = sanitize_filename(book_name)
+
+    range_label = "Full"
+    if description.startswith("Chapters:"):
+        range_label = description.replace("Chapters:", "").strip().replace(" ", "")
+    elif description.startswith("Range:"):
+        range_label = description.replace("Range:", "").strip().replace(" ", "")
+    elif description.startswith("Files:"):
+        # Try to get cleaner range if it looks like "1,2,3"
+        files_str = description.replace("Files:", "").strip()
+        if "," in files_str:
+            parts = [p.strip() for p in files_str.split(',')]
+            if len(parts) > 2:
+                range_label = f"{parts[0]}-{parts[-1]}"
+            else:
+                range_label = files_str.replace(",", "-")
+        else:
+            range_label = files_str
+    
+    if not range_label or range_label == "Selected":
+        range_label = "Pack"
+
+    # Clean range label for filename safety
+    safe_range = sanitize_filename(range_label)
+    return f"{safe_book_name}_{safe_range}.zip"
+
+def _write_zip_entries(zip_file: zipfile.ZipFile, files: List[tuple], cancel_event: threading.Event,
+                       book_name: str, description: str):
+    """逐个写入条目 (可取消)，按 5% 粒度推送进度"""
+    total_files = len(files)
+    for i, (file_path, arcname) in enumerate(files):
+        if cancel_event.is_set():
+            raise asyncio.CancelledError("Task cancelled during zipping")
+        
+        with open(file_path, 'rb') as src_file:
+            with zip_file.open(arcname, 'w') as dest_file:
+                while True:
+                    if cancel_event.is_set():
+                        raise asyncio.CancelledError("Task cancelled inner loop")
+                    chunk = src_file.read(1024 * 1024)
+                    if not chunk: break
+                    dest_file.write(chunk)
+                    pack_queue.throttle.consume(len(chunk))
+        
+        if total_files > 0 and (i + 1) % max(1, total_files // 20) == 0:
+            percent = int((i + 1) / total_files * 100)
+            log_manager.put_log(f"📦 '{book_name}' 打包进度: {percent}% ({i + 1}/{total_files})", level="info", category="packing", book=book_name)
+            event_bus.publish("pack_progress", {
+                "book": book_name, "percent": percent,
+                "done": i + 1, "total": total_files, "description": description
+            })
+
+def _find_reusable_asset(book_name: str, zip_path: pathlib.Path, files: List[tuple]) -> Optional[tuple]:
+    """
+    查找可增量追加的同名导出: 其中每个条目 (文件名、大小、CRC) 都与本次待打包文件一致
+    返回 (asset_id, 已包含的 arcname 集合)，无可复用导出时返回 None
+    """
+    from app.db.database import db
+    if not zip_path.exists():
+        return None
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT id FROM book_assets WHERE book_id = (SELECT id FROM books WHERE name = ?) AND filename = ? "
+        "ORDER BY created_at DESC LIMIT 1",
+        (book_name, zip_path.name)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None
+    asset_id = row['id']
+    cursor.execute("SELECT arcname, size, crc32 FROM asset_entries WHERE asset_id = ?", (asset_id,))
+    entries = {r['arcname']: (r['size'], r['crc32']) for r in cursor.fetchall()}
+    if not entries:
+        return None
+
+    # 归档实际内容须与记录一致 (只读中央目录，开销与条目数成正比)
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            if {info.filename: (info.file_size, info.CRC) for info in zf.infolist()} != entries:
+                return None
+    except (zipfile.BadZipFile, OSError):
+        return None
+
+    # 已有条目必须仍是本次打包的文件且内容未变 (CRC 优先取音频索引)
+    current = {arcname: file_path for file_path, arcname in files}
+    cursor.execute(
+        "SELECT audio_path, audio_bytes, audio_mtime, audio_crc32 FROM tasks "
+        "WHERE book_id = (SELECT id FROM books WHERE name = ?) AND audio_crc32 IS NOT NULL",
+        (book_name,)
+    )
+    index = {sanitize_filename(r['audio_path']): (r['audio_bytes'], r['audio_mtime'], r['audio_crc32'])
+             for r in cursor.fetchall() if r['audio_path']}
+    for arcname, (size, crc) in entries.items():
+        file_path = current.get(arcname)
+        if file_path is None:
+            return None
+        file_stat = os.stat(file_path)
+        if file_stat.st_size != size:
+            return None
+        indexed = index.get(arcname)
+        if indexed and indexed[0] == file_stat.st_size and indexed[1] == file_stat.st_mtime:
+            file_crc = indexed[2]
+        else:
+            file_crc = file_crc32(pathlib.Path(file_path))
+        if file_crc != crc:
+            return None
+    return asset_id, set(entries)
+
+def _append_zip_entries(zip_path: pathlib.Path, work_path: pathlib.Path, files: List[tuple],
+                        cancel_event: threading.Event, book_name: str, description: str):
+    """
+    向已有归档追加条目: 在副本上追加 (新条目从原中央目录处开始写入)，完成后原子替换原文件
+    正在下载原文件的客户端继续读取旧内容；失败或取消时原文件保持不变，副本由调用方清理
+    """
+    shutil.copyfile(zip_path, work_path)
+    with zipfile.ZipFile(work_path, "a", compression=zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+        _write_zip_entries(zip_file, files, cancel_event, book_name, description)
+    if cancel_event.is_set():
+        raise asyncio.CancelledError("Task cancelled before finalize")
+    os.replace(work_path, zip_path)
+
+def _register_pack_asset(book_name: str, zip_path: pathlib.Path, description: str,
+                         reuse_asset_id: Optional[int] = None, selection_key: Optional[str] = None):
+    """登记导出资产及其包含的条目 (同名旧记录对应的文件已被覆盖，一并移除)"""
+    from app.db.database import db
+    size_bytes = zip_path.stat().st_size
+    if size_bytes < 1024 * 1024:
+        size_str = f"{size_bytes / 1024:.1f}KB"
+    else:
+        size_str = f"{size_bytes / (1024 * 1024):.1f}MB"
+
+    book_id = db.get_book_id(book_name)
+    cursor = db.get_cursor()
+    if reuse_asset_id is not None:
+        asset_id = reuse_asset_id
+        cursor.execute(
+            "UPDATE book_assets SET description = ?, size_str = ?, selection_key = ?, created_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (description, size_str, selection_key, asset_id)
+        )
+    else:
+        cursor.execute("DELETE FROM book_assets WHERE book_id = ? AND filename = ?", (book_id, zip_path.name))
+        cursor.execute(
+            "INSERT INTO book_assets (book_id, filename, description, size_str, selection_key) VALUES (?, ?, ?, ?, ?)",
+            (book_id, zip_path.name, description, size_str, selection_key)
+        )
+        asset_id = cursor.lastrowid
+
+    with zipfile.ZipFile(zip_path) as zf:
+        entries = []
+        for info in zf.infolist():
+            match = re.match(r'^(\d+)', info.filename)
+            entries.append((asset_id, int(match.group(1)) if match else None, info.filename, info.file_size, info.CRC))
+    cursor.execute("DELETE FROM asset_entries WHERE asset_id = ?", (asset_id,))
+    cursor.executemany(
+        "INSERT OR REPLACE INTO asset_entries (asset_id, chapter_index, arcname, size, crc32) VALUES (?, ?, ?, ?, ?)",
+        entries
+    )
+    db.commit()
+
+def pack_book_task(book_name: str, target_dir: pathlib.Path, cancel_event: threading.Event, description: str = "Full Pack",
+                   file_ids: Optional[List[int]] = None, selection_key: Optional[str] = None):
     """Background task for packing book audio with cancellation support and unique naming"""
     temp_zip_path = None
     try:
@@ -379,38 +772,14 @@ def pack_book_task(book_name: str, target_dir: pathlib.Path, cancel_event: threa
 
         # Check if dir exists
         if not target_dir.exists():
-            logger.error(f"📚 Book dir not found for packing: {book_name}")
-            return
+            raise FileNotFoundError(f"Book dir not found for packing: {book_name}")
             
         EXPORT_DIR.mkdir(parents=True, exist_ok=True)
         
         # [Patch] Filename Safety & Uniqueness
         safe_book_name = sanitize_filename(book_name)
         
-        # Determine dynamic filename based on description (e.g., "Chapters: 1-10" -> "1-10")
-        range_label = "Full"
-        if description.startswith("Chapters:"):
-            range_label = description.replace("Chapters:", "").strip().replace(" ", "")
-        elif description.startswith("Range:"):
-            range_label = description.replace("Range:", "").strip().replace(" ", "")
-        elif description.startswith("Files:"):
-            # Try to get cleaner range if it looks like "1,2,3"
-            files_str = description.replace("Files:", "").strip()
-            if "," in files_str:
-                parts = [p.strip() for p in files_str.split(',')]
-                if len(parts) > 2:
-                    range_label = f"{parts[0]}-{parts[-1]}"
-                else:
-                    range_label = files_str.replace(",", "-")
-            else:
-                range_label = files_str
-        
-        if not range_label or range_label == "Selected":
-            range_label = "Pack"
-
-        # Clean range label for filename safety
-        safe_range = sanitize_filename(range_label)
-        file_basename = f"{safe_book_name}_{safe_range}.zip"
+        file_basename = _pack_filename(book_name, description)
         
         # Use timestamp for temp file to ensure unique background operations
         timestamp = time.strftime('%Y%m%d_%H%M%S')
@@ -447,34 +816,30 @@ def pack_book_task(book_name: str, target_dir: pathlib.Path, cancel_event: threa
                                 continue
                                 
                     files_to_zip.append((file_path, arcname))
+        files_to_zip.sort(key=lambda item: item[1])
         
-        total_files = len(files_to_zip)
-        logger.info(f"📦 开始打包 '{book_name}' [{description}] (共 {total_files} 个文件)...")
-        log_manager.put_log(f"📦 开始打包 '{book_name}' [{description}] (共 {total_files} 个文件)...")
-
-        # 2. Write zip
-        with zipfile.ZipFile(temp_zip_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=3, allowZip64=True) as zip_file:
-            for i, (file_path, arcname) in enumerate(files_to_zip):
-                if cancel_event.is_set():
-                    raise asyncio.CancelledError("Task cancelled during zipping")
-                
-                with open(file_path, 'rb') as src_file:
-                    with zip_file.open(arcname, 'w') as dest_file:
-                        while True:
-                            if cancel_event.is_set():
-                                raise asyncio.CancelledError("Task cancelled inner loop")
-                            chunk = src_file.read(1024 * 1024)
-                            if not chunk: break
-                            dest_file.write(chunk)
-                
-                if total_files > 0 and (i + 1) % max(1, total_files // 20) == 0:
-                    percent = int((i + 1) / total_files * 100)
-                    log_manager.put_log(f"📦 '{book_name}' 打包进度: {percent}% ({i + 1}/{total_files})", level="info")
+        # 2. 同名导出的内容是本次的子集时，只追加新增章节
+        reusable = _find_reusable_asset(book_name, final_zip_path, files_to_zip)
+        if reusable:
+            asset_id, existing = reusable
+            new_files = [(file_path, arcname) for file_path, arcname in files_to_zip if arcname not in existing]
+            logger.info(f"📦 增量打包 '{book_name}' [{description}] (已有 {len(existing)} 个，追加 {len(new_files)} 个文件)...")
+            log_manager.put_log(f"📦 增量打包 '{book_name}' [{description}] (已有 {len(existing)} 个，追加 {len(new_files)} 个文件)...", category="packing", book=book_name)
+            if new_files:
+                _append_zip_entries(final_zip_path, temp_zip_path, new_files, cancel_event, book_name, description)
+            _register_pack_asset(book_name, final_zip_path, description, reuse_asset_id=asset_id, selection_key=selection_key)
+        else:
+            total_files = len(files_to_zip)
+            logger.info(f"📦 开始打包 '{book_name}' [{description}] (共 {total_files} 个文件)...")
+            log_manager.put_log(f"📦 开始打包 '{book_name}' [{description}] (共 {total_files} 个文件)...", category="packing", book=book_name)
+
+            # MP3 本身已压缩，使用存储模式避免无意义的 deflate 开销
+            with zipfile.ZipFile(temp_zip_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+                _write_zip_entries(zip_file, files_to_zip, cancel_event, book_name, description)
 
-        # Move to final and register in DB
-        if temp_zip_path.exists():
+            # Move to final and register in DB
             if cancel_event.is_set():
-                 raise asyncio.CancelledError("Task cancelled before finalize")
+                raise asyncio.CancelledError("Task cancelled before finalize")
 
             if final_zip_path.exists():
                 try:
@@ -483,32 +848,22 @@ def pack_book_task(book_name: str, target_dir: pathlib.Path, cancel_event: threa
                     logger.warning(f"Could not remove existing zip {final_zip_path}: {e}")
 
             temp_zip_path.rename(final_zip_path)
-            
-            # Register asset in DB
-            from app.db.database import db
-            size_bytes = final_zip_path.stat().st_size
-            if size_bytes < 1024 * 1024:
-                size_str = f"{size_bytes / 1024:.1f}KB"
-            else:
-                size_str = f"{size_bytes / (1024 * 1024):.1f}MB"
-            
-            cursor = db.get_cursor()
-            cursor.execute(
-                "INSERT INTO book_assets (book_name, filename, description, size_str) VALUES (?, ?, ?, ?)",
-                (book_name, file_basename, description, size_str)
-            )
-            db.commit()
+            _register_pack_asset(book_name, final_zip_path, description, selection_key=selection_key)
             
         logger.info(f"✅ '{book_name}' 打包完成: {file_basename}")
-        log_manager.put_log(f"✅ '{book_name}' 打包完成 [{description}]。", level="success")
+        log_manager.put_log(f"✅ '{book_name}' 打包完成 [{description}]。", level="success", category="packing", book=book_name)
+        event_bus.publish("pack_finished", {"book": book_name, "status": "completed", "filename": file_basename})
 
     except asyncio.CancelledError:
         logger.warning(f"🚫 打包任务已取消: {book_name}")
-        log_manager.put_log(f"🚫 打包任务已取消: {book_name}", level="warning")
+        log_manager.put_log(f"🚫 打包任务已取消: {book_name}", level="warning", category="packing", book=book_name)
+        event_bus.publish("pack_finished", {"book": book_name, "status": "cancelled"})
         # Cleanup happens in finally block
     except Exception as e:
         logger.error(f"❌ 打包 '{book_name}' 失败: {e}")
-        log_manager.put_log(f"❌ 打包 '{book_name}' 失败: {e}", level="error")
+        log_manager.put_log(f"❌ 打包 '{book_name}' 失败: {e}", level="error", category="packing", book=book_name)
+        # 交由任务执行器记录失败状态并发布 pack_finished
+        raise
     finally:
         # Cleanup temp file
         if temp_zip_path and temp_zip_path.exists():
@@ -518,21 +873,62 @@ def pack_book_task(book_name: str, target_dir: pathlib.Path, cancel_event: threa
             except Exception as e:
                 logger.error(f"清理临时文件失败: {e}")
 
-        # Reset state
-        if book_name in state.active_packers:
-            del state.active_packers[book_name]
-        if book_name in state.cancel_events:
-            del state.cancel_events[book_name]
 
+def _selection_key(book_name: str, file_ids: Optional[List[int]]) -> Optional[str]:
+    """
+    导出选择键: 书籍 + 排序后的章节 ID + 各章节音频的大小与修改时间
+    取自音频索引 (不读取音频内容)，索引尚未回填的章节只 stat 文件；没有可导出的章节时返回 None
+    """
+    from app.db.database import db
+    book_id = db.get_book_id(book_name)
+    if book_id is None:
+        return None
+    book_dir = get_book_dir(book_name)
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT chapter_index, audio_path, audio_bytes, audio_mtime FROM tasks "
+        "WHERE book_id = ? AND status = 'completed' AND audio_path IS NOT NULL ORDER BY chapter_index",
+        (book_id,)
+    )
+    wanted = set(file_ids) if file_ids is not None else None
+    parts = []
+    for row in cursor.fetchall():
+        if wanted is not None and row['chapter_index'] not in wanted:
+            continue
+        size, mtime = row['audio_bytes'], row['audio_mtime']
+        if mtime is None or not size:
+            try:
+                file_stat = (book_dir / row['audio_path']).stat()
+            except OSError:
+                continue
+            size, mtime = file_stat.st_size, file_stat.st_mtime
+        parts.append((row['chapter_index'], row['audio_path'], size, mtime))
+    if not parts:
+        return None
+    return hashlib.sha1(json.dumps([book_name, parts], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _find_cached_asset(book_name: str, selection_key: str) -> Optional[dict]:
+    """查找相同选择、文件仍存在的导出"""
+    from app.db.database import db
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT * FROM book_assets WHERE book_id = (SELECT id FROM books WHERE name = ?) AND selection_key = ? "
+        "ORDER BY created_at DESC",
+        (book_name, selection_key)
+    )
+    for row in cursor.fetchall():
+        if (EXPORT_DIR / row['filename']).exists():
+            return _asset_to_dict(row)
+    return None
 
 @router.post("/pack/{book_name}", status_code=202)
 async def pack_book_endpoint(
     book_name: str, 
-    background_tasks: BackgroundTasks, 
     description: str = "Full Pack",
-    file_ids: Optional[str] = Query(None) # Pass as comma separated string
+    file_ids: Optional[str] = Query(None), # Pass as comma separated string
+    priority: int = Query(0, description="优先级，数值越大越先执行；相同优先级按提交顺序")
 ):
-    """Start packing book audio"""
+    """Queue a packing job (executed by the dedicated pack worker pool)"""
     logger.info(f"📥 Pack request: {book_name}, Desc: {description}, IDs: {file_ids}")
     parsed_ids = None
     if file_ids:
@@ -543,59 +939,215 @@ async def pack_book_endpoint(
             logger.error(f"❌ Invalid file_ids: {file_ids}")
             raise HTTPException(status_code=400, detail="Invalid file_ids format")
 
-    if book_name in state.active_packers:
-        # Check if cancelling
-        if state.active_packers[book_name] == "cancelling":
-             raise HTTPException(status_code=400, detail="Previous task is cancelling, please wait")
-        raise HTTPException(status_code=400, detail="Packing task already in progress")
-        
     target_dir = get_book_dir(book_name)
     if not target_dir.exists():
         raise HTTPException(status_code=404, detail="Book directory not found")
-        
-    # Init cancellation event
-    cancel_event = threading.Event()
-    state.cancel_events[book_name] = cancel_event
 
-    # Set state
-    state.active_packers[book_name] = "packing"
-    
-    # Start task
-    background_tasks.add_task(pack_book_task, book_name, target_dir, cancel_event, description, parsed_ids)
+    # 相同选择 (章节及其内容均未变化) 的导出已存在时直接返回
+    selection_key = await asyncio.to_thread(_selection_key, book_name, parsed_ids)
+    if selection_key:
+        cached = await asyncio.to_thread(_find_cached_asset, book_name, selection_key)
+        if cached:
+            logger.info(f"♻️ 复用已有导出 '{book_name}': {cached['filename']}")
+            return {"message": "Existing export reused", "status": "ready", "asset_id": cached['id'],
+                    "asset": cached, "cached": True}
+
+    job_id, position, existing_job = await _enqueue_pack(book_name, {
+        "action": "zip", "description": description, "file_ids": parsed_ids, "selection_key": selection_key
+    }, priority)
+    if existing_job:
+        # 相同选择的任务已在队列中/执行中，合并为同一个任务
+        return {"message": "Identical packing task already queued", "status": job_control.pack_status(existing_job),
+                "job_id": job_id, "position": position, "coalesced": True}
+    if position:
+        log_manager.put_log(f"⏳ '{book_name}' 打包任务已加入队列 (第 {position} 位)", level="info", category="packing", book=book_name)
     
-    return {"message": "Packing task started", "status": "packing"}
+    return {"message": "Packing task queued", "status": "queued" if position else "packing",
+            "job_id": job_id, "position": position}
+
+async def _enqueue_pack(book_name: str, params: dict, priority: int) -> tuple:
+    """
+    打包/合并任务入队，返回 (任务 ID, 排队位置, 合并到的已有任务)
+    同一本书已有打包任务时: 选择相同 (含并发的相同请求) 则合并为该任务，否则返回 400
+    """
+    job_id = await asyncio.to_thread(job_store.enqueue, book_name, "pack", params, priority)
+    if job_id is None:
+        selection_key = params.get("selection_key")
+        existing_job = selection_key and await asyncio.to_thread(job_store.find_selection, selection_key)
+        if existing_job:
+            return existing_job['id'], job_store.queue_position(existing_job), existing_job
+        pack_job = await asyncio.to_thread(job_store.active_job, book_name, "pack")
+        if pack_job and pack_job['cancel_requested']:
+            raise HTTPException(status_code=400, detail="Previous task is cancelling, please wait")
+        raise HTTPException(status_code=400, detail="Packing task already in progress")
+    job_runner.wake()
+    job = await asyncio.to_thread(job_store.active_job, book_name, "pack")
+    event_bus.publish("pack_queue", await asyncio.to_thread(job_store.queue_snapshot, "pack"))
+    return job_id, job_store.queue_position(job) if job else None, None
+
+@job_runner.pack_handler("zip")
+def _run_zip_job(book_name: str, params: dict, cancel_event: threading.Event):
+    pack_book_task(book_name, get_book_dir(book_name), cancel_event, params.get("description", "Full Pack"),
+                   params.get("file_ids"), params.get("selection_key"))
+
+def _build_streaming_zip(book_name: str, file_ids: Optional[List[int]]) -> StreamingZip:
+    """由音频索引构建流式 ZIP 布局 (索引中的 CRC 仅在文件大小与修改时间未变时采用)"""
+    from app.db.database import db
+    book_id = db.get_book_id(book_name)
+    if book_id is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    book_dir = get_book_dir(book_name)
+
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT chapter_index, audio_path, audio_bytes, audio_mtime, audio_crc32 FROM tasks "
+        "WHERE book_id = ? AND status = 'completed' AND audio_path IS NOT NULL ORDER BY chapter_index",
+        (book_id,)
+    )
+    members = []
+    for row in cursor.fetchall():
+        if file_ids is not None and row['chapter_index'] not in file_ids:
+            continue
+        path = book_dir / row['audio_path']
+        try:
+            file_stat = path.stat()
+        except OSError:
+            continue
+        crc = row['audio_crc32']
+        if file_stat.st_size != row['audio_bytes'] or file_stat.st_mtime != row['audio_mtime']:
+            crc = None
+        members.append(ZipMember(
+            path, sanitize_filename(row['audio_path']), file_stat.st_size, file_stat.st_mtime,
+            crc32=crc, chapter_index=row['chapter_index']
+        ))
+    return StreamingZip(members)
+
+def _save_member_crc32(book_name: str, members: List[ZipMember]):
+    """把流式导出时顺带算出的 CRC 写回音频索引，后续导出可直接响应 Range"""
+    from app.db.database import db
+    updates = [(m.crc32, m.size, m.mtime, db.get_book_id(book_name), m.chapter_index)
+               for m in members if m.crc32 is not None]
+    if not updates:
+        return
+    try:
+        cursor = db.get_cursor()
+        cursor.executemany(
+            "UPDATE tasks SET audio_crc32 = ? WHERE audio_crc32 IS NULL AND audio_bytes = ? AND audio_mtime = ? "
+            "AND book_id = ? AND chapter_index = ?",
+            updates
+        )
+        db.commit()
+    except Exception as e:
+        logger.warning(f"Failed to save CRC32 for {book_name}: {e}")
+
+@router.api_route("/pack/{book_name}/stream", methods=["GET", "HEAD"])
+async def stream_pack(
+    book_name: str,
+    request: Request,
+    description: str = "Full Pack",
+    file_ids: Optional[str] = Query(None), # Pass as comma separated string
+    precompute: bool = Query(False, description="预先补算缺失的 CRC，使归档字节确定、支持断点续传")
+):
+    """
+    流式 ZIP 导出 (存储模式，边生成边下载，不写临时文件)
+    Content-Length 总是预先算出；所有条目 CRC 已知 (或 precompute=true) 时支持 Range 续传
+    """
+    parsed_ids = None
+    if file_ids:
+        try:
+            parsed_ids = [int(x.strip()) for x in file_ids.split(",") if x.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid file_ids format")
+
+    archive = await asyncio.to_thread(_build_streaming_zip, book_name, parsed_ids)
+    if not archive.members:
+        raise HTTPException(status_code=404, detail="No audio files to pack")
+
+    range_header = request.headers.get("range")
+    if (precompute or range_header) and not archive.crc_complete:
+        await asyncio.to_thread(archive.ensure_crc32)
+        await asyncio.to_thread(_save_member_crc32, book_name, archive.members)
+
+    filename = _pack_filename(book_name, description)
+    headers = {
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    }
+    if archive.crc_complete:
+        etag = make_etag("zip", *[(m.arcname, m.size, m.mtime, m.crc32) for m in archive.members], weak=False)
+        headers["ETag"] = etag
+        headers["Accept-Ranges"] = "bytes"
+        if_range = request.headers.get("if-range")
+        if if_range and if_range != etag:
+            range_header = None
+    else:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, archive.total_size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{archive.total_size}"})
+
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{archive.total_size}"
+    else:
+        start, end = 0, archive.total_size - 1
+        status_code = 200
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="application/zip")
+
+    def body():
+        complete = archive.crc_complete
+        yield from archive.iter_range(start, end)
+        if not complete and archive.crc_complete:
+            _save_member_crc32(book_name, archive.members)
+
+    logger.info(f"📦 流式导出 '{book_name}' [{description}] (共 {len(archive.members)} 个文件, {archive.total_size} 字节)")
+    return StreamingResponse(body(), status_code=status_code, headers=headers, media_type="application/zip")
+
+@router.get("/pack/queue")
+async def get_pack_queue():
+    """打包队列 (所有进程中运行中与排队中的任务及其位置)"""
+    snapshot = await asyncio.to_thread(job_store.queue_snapshot, "pack")
+    return {"workers": pack_queue.workers, **snapshot}
 
 @router.post("/pack/cancel/{book_name}")
 async def cancel_pack_endpoint(book_name: str):
-    """Cancel packing task"""
-    if book_name not in state.active_packers:
+    """Cancel packing task (任务可在任意进程中)"""
+    result = job_control.cancel_pack(book_name)
+    if result is None:
         raise HTTPException(status_code=404, detail="No active packing task found")
-    
-    if book_name in state.cancel_events:
-        state.cancel_events[book_name].set()
-        state.active_packers[book_name] = "cancelling"
-        log_manager.put_log(f"🛑 正在中止 '{book_name}' 的打包任务...", level="warning")
-        return {"message": "Cancellation requested", "status": "cancelling"}
-    
-    return {"message": "Task not cancellable or already finished"}
+
+    if result == "cancelled":
+        log_manager.put_log(f"🛑 已取消排队中的 '{book_name}' 打包任务", level="warning", category="packing", book=book_name)
+        return {"message": "Queued task removed", "status": "cancelled"}
+
+    log_manager.put_log(f"🛑 正在中止 '{book_name}' 的打包任务...", level="warning", category="packing", book=book_name)
+    return {"message": "Cancellation requested", "status": "cancelling"}
 
 @router.get("/assets/download/{asset_id}")
 async def download_asset(asset_id: int):
     """Download specific asset by ID"""
     from app.db.database import db
     cursor = db.get_cursor()
-    cursor.execute("SELECT filename, book_name FROM book_assets WHERE id = ?", (asset_id,))
+    cursor.execute("SELECT filename FROM book_assets WHERE id = ?", (asset_id,))
     row = cursor.fetchone()
     if not row:
         raise HTTPException(status_code=404, detail="Asset not found")
     
     zip_path = EXPORT_DIR / row['filename']
     if not zip_path.exists():
+        # 文件已被外部删除，顺带清理失效的资产记录
+        cursor.execute("DELETE FROM book_assets WHERE id = ?", (asset_id,))
+        db.commit()
         raise HTTPException(status_code=404, detail="Physical file missing")
         
     return FileResponse(
         zip_path, 
-        media_type="application/zip", 
+        media_type="audio/mpeg" if zip_path.suffix == ".mp3" else "application/zip", 
         filename=row['filename']
     )
 
@@ -605,7 +1157,8 @@ async def download_book_zip(book_name: str):
     from app.db.database import db
     cursor = db.get_cursor()
     cursor.execute(
-        "SELECT id, filename FROM book_assets WHERE book_name = ? ORDER BY created_at DESC LIMIT 1",
+        "SELECT id, filename FROM book_assets WHERE book_id = (SELECT id FROM books WHERE name = ?) "
+        "ORDER BY created_at DESC LIMIT 1",
         (book_name,)
     )
     row = cursor.fetchone()
@@ -619,9 +1172,10 @@ async def delete_book_zip(book_name: str, asset_id: Optional[int] = Query(None))
     """Delete packed zip (specific asset or all)"""
     from app.db.database import db
     cursor = db.get_cursor()
+    book_id = db.get_book_id(book_name)
     
     if asset_id:
-        cursor.execute("SELECT filename FROM book_assets WHERE id = ? AND book_name = ?", (asset_id, book_name))
+        cursor.execute("SELECT filename FROM book_assets WHERE id = ? AND book_id = ?", (asset_id, book_id))
         row = cursor.fetchone()
         if row:
             filepath = EXPORT_DIR / row['filename']
@@ -632,80 +1186,143 @@ async def delete_book_zip(book_name: str, asset_id: Optional[int] = Query(None))
         raise HTTPException(status_code=404, detail="Asset not found")
     else:
         # Delete ALL assets for this book
-        cursor.execute("SELECT filename FROM book_assets WHERE book_name = ?", (book_name,))
+        cursor.execute("SELECT filename FROM book_assets WHERE book_id = ?", (book_id,))
         rows = cursor.fetchall()
         for row in rows:
             filepath = EXPORT_DIR / row['filename']
             if filepath.exists(): filepath.unlink()
         
-        cursor.execute("DELETE FROM book_assets WHERE book_name = ?", (book_name,))
+        cursor.execute("DELETE FROM book_assets WHERE book_id = ?", (book_id,))
         db.commit()
         return {"message": "All zip assets for this book deleted"}
 
-@router.post("/merge/{book_name}")
-async def merge_audio(book_name: str, request: GenerateRequest): 
-    """合并音频"""
+def _audiobook_chapters(book_name: str, chapter_ids: Optional[List[int]]) -> List[tuple]:
+    """按章节顺序列出可合并的音频 [(chapter_index, path, title)] (取自音频索引)"""
+    from app.db.database import db
+    book_dir = get_book_dir(book_name)
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT chapter_index, title, audio_path FROM tasks "
+        "WHERE book_id = (SELECT id FROM books WHERE name = ?) AND status = 'completed' AND audio_path IS NOT NULL "
+        "ORDER BY chapter_index",
+        (book_name,)
+    )
+    wanted = set(chapter_ids) if chapter_ids else None
+    chapters = []
+    for row in cursor.fetchall():
+        if wanted is not None and row['chapter_index'] not in wanted:
+            continue
+        path = book_dir / row['audio_path']
+        if path.exists():
+            chapters.append((row['chapter_index'], path, row['title'] or path.stem))
+    return chapters
+
+def _register_audiobook_asset(book_name: str, output_path: pathlib.Path, description: str, selection_key: Optional[str]) -> int:
+    """登记合并导出的有声书 (单文件，无条目明细)"""
+    from app.db.database import db
+    size_bytes = output_path.stat().st_size
+    if size_bytes < 1024 * 1024:
+        size_str = f"{size_bytes / 1024:.1f}KB"
+    else:
+        size_str = f"{size_bytes / (1024 * 1024):.1f}MB"
+    book_id = db.get_book_id(book_name)
+    cursor = db.get_cursor()
+    cursor.execute("DELETE FROM book_assets WHERE book_id = ? AND filename = ?", (book_id, output_path.name))
+    cursor.execute(
+        "INSERT INTO book_assets (book_id, filename, description, size_str, selection_key) VALUES (?, ?, ?, ?, ?)",
+        (book_id, output_path.name, description, size_str, selection_key)
+    )
+    db.commit()
+    return cursor.lastrowid
+
+def merge_audiobook_task(book_name: str, chapter_ids: Optional[List[int]], cancel_event: threading.Event,
+                         description: str, selection_key: Optional[str] = None):
+    """后台合并: 按帧拼接章节音频并写入 ID3 章节标记"""
+    try:
+        check_disk_space(EXPORT_DIR)
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+
+        chapters = _audiobook_chapters(book_name, chapter_ids)
+        if not chapters:
+            raise ValueError("No audio files to merge")
+        safe_book_name = sanitize_filename(book_name)
+        if chapter_ids:
+            output_name = f"{safe_book_name}_audiobook_{chapters[0][0]}-{chapters[-1][0]}.mp3"
+        else:
+            output_name = f"{safe_book_name}_audiobook.mp3"
+        output_path = EXPORT_DIR / output_name
+
+        total = len(chapters)
+        logger.info(f"🔗 开始合并 '{book_name}' 的音频 (共 {total} 个文件)...")
+        log_manager.put_log(f"🔗 开始合并 '{book_name}' 的音频 (共 {total} 个文件)...", category="packing", book=book_name)
+
+        def on_chapter(done: int, total: int):
+            if cancel_event.is_set():
+                raise asyncio.CancelledError("Task cancelled during merge")
+            if done % max(1, total // 20) == 0 or done == total:
+                percent = int(done / total * 100)
+                log_manager.put_log(f"🔗 '{book_name}' 合并进度: {percent}% ({done}/{total})", level="info", category="packing", book=book_name)
+                event_bus.publish("pack_progress", {
+                    "book": book_name, "percent": percent, "done": done, "total": total,
+                    "description": description, "kind": "audiobook"
+                })
+
+        export_audiobook(
+            output_path, book_name, [(path, title) for _, path, title in chapters],
+            on_chapter=on_chapter, on_write=pack_queue.throttle.consume
+        )
+        asset_id = _register_audiobook_asset(book_name, output_path, description, selection_key)
+
+        logger.info(f"✅ 音频合并完成: {output_name}")
+        log_manager.put_log(f"✅ '{book_name}' 合并完成 ({total} 个章节)。", level="success", category="packing", book=book_name)
+        event_bus.publish("pack_finished", {"book": book_name, "status": "completed", "filename": output_name,
+                                            "asset_id": asset_id, "kind": "audiobook"})
+    except asyncio.CancelledError:
+        logger.warning(f"🚫 合并任务已取消: {book_name}")
+        log_manager.put_log(f"🚫 合并任务已取消: {book_name}", level="warning", category="packing", book=book_name)
+        event_bus.publish("pack_finished", {"book": book_name, "status": "cancelled", "kind": "audiobook"})
+    except Exception as e:
+        logger.error(f"❌ 合并 '{book_name}' 失败: {e}")
+        log_manager.put_log(f"❌ 合并 '{book_name}' 失败: {e}", level="error", category="packing", book=book_name)
+        raise
+
+@router.post("/merge/{book_name}", status_code=202)
+async def merge_audio(book_name: str, request: GenerateRequest,
+                      priority: int = Query(0, description="优先级，数值越大越先执行")):
+    """
+    合并音频为带章节标记的单个 MP3 (后台任务，与打包共用队列)
+    进度通过 pack_progress / pack_finished 事件推送，完成后从导出资产下载
+    """
     target_dir = get_book_dir(book_name)
-            
     if not target_dir.exists():
         raise HTTPException(status_code=404, detail="Book directory not found")
-        
-    # Filter chapters if provided
+
     chapter_ids = request.chapter_ids
-    
-    # Get all mp3 files
-    mp3_files = sorted([f for f in target_dir.glob("*.mp3")])
-    if not mp3_files:
+    chapters = await asyncio.to_thread(_audiobook_chapters, book_name, chapter_ids)
+    if not chapters:
         raise HTTPException(status_code=400, detail="No audio files to merge")
-        
-    # If specific chapters requested, filter them
-    if chapter_ids:
-        filtered_files = []
-        for f in mp3_files:
-            try:
-                # Extract ID from filename start "0001"
-                fid = int(f.name.split('-')[0])
-                if fid in chapter_ids:
-                    filtered_files.append(f)
-            except:
-                pass
-        mp3_files = filtered_files
-        
-    if not mp3_files:
-        raise HTTPException(status_code=400, detail="No matching audio files for selected chapters")
 
-    # Create filelist for ffmpeg
-    list_path = target_dir / "filelist.txt"
-    with open(list_path, "w", encoding="utf-8") as f:
-        for mp3 in mp3_files:
-            safe_path = str(mp3.absolute()).replace("'", "'\\''")
-            f.write(f"file '{safe_path}'\n")
+    description = f"Audiobook: {chapters[0][0]}-{chapters[-1][0]}" if chapter_ids else "Audiobook"
+    # 与 ZIP 导出区分的选择键
+    selection_key = await asyncio.to_thread(_selection_key, book_name, chapter_ids or None)
+    if selection_key:
+        selection_key = hashlib.sha1(f"audiobook:{selection_key}".encode("utf-8")).hexdigest()
+        cached = await asyncio.to_thread(_find_cached_asset, book_name, selection_key)
+        if cached:
+            return {"message": "Existing audiobook reused", "status": "ready", "asset_id": cached['id'],
+                    "asset": cached, "cached": True}
 
-    output_path = target_dir / f"{book_name}_merged.mp3"
-    
-    try:
-        cmd = [
-            "ffmpeg", "-y", 
-            "-f", "concat", 
-            "-safe", "0", 
-            "-i", str(list_path), 
-            "-c", "copy", 
-            str(output_path)
-        ]
-        
-        logger.info(f"🔗 开始合并 '{book_name}' 的音频 (共 {len(mp3_files)} 个文件)...")
+    job_id, position, existing_job = await _enqueue_pack(book_name, {
+        "action": "audiobook", "description": description, "chapter_ids": chapter_ids, "selection_key": selection_key
+    }, priority)
+    if existing_job:
+        return {"message": "Identical merge task already queued", "status": job_control.pack_status(existing_job),
+                "job_id": job_id, "position": position, "coalesced": True}
+    return {"message": "Merge task queued", "status": "queued" if position else "packing",
+            "job_id": job_id, "position": position}
+
+@job_runner.pack_handler("audiobook")
+def _run_audiobook_job(book_name: str, params: dict, cancel_event: threading.Event):
+    merge_audiobook_task(book_name, params.get("chapter_ids"), cancel_event, params.get("description", "Audiobook"),
+                         params.get("selection_key"))
 
-        # Run in thread to not block event loop
-        await asyncio.to_thread(subprocess.check_call, cmd)
-        
-        logger.info(f"✅ 音频合并完成: {output_path.name}")
-        
-    except FileNotFoundError:
-        raise HTTPException(status_code=500, detail="ffmpeg not installed on server")
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail=f"ffmpeg merge failed: {e}")
-    finally:
-        if list_path.exists():
-            list_path.unlink()
-            
-    return FileResponse(output_path, filename=f"{book_name}_merged.mp3")
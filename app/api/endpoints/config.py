@@ -155,6 +155,8 @@ async def update_config(request: ConfigUpdateRequest):
         success = save_config_to_yaml(updates)
         
         if success:
+            # 立即重载，使运行中的任务与后续请求使用新配置
+            await get_config().reload(source="save")
             return {
                 "success": True,
                 "message": "配置已保存",
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from app.core.event_bus import event_bus
+import asyncio
+
+router = APIRouter()
+
+# 心跳间隔 (秒)，防止代理因空闲断开连接
+HEARTBEAT_INTERVAL = 15
+
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    SSE 进度事件流
+
+    事件类型: chapter_started / chapter_completed / chapter_failed / task_state /
+    book_stats / book_imported / book_deleted / pack_queue / pack_progress / pack_finished
+    """
+    queue = event_bus.subscribe()
+
+    async def event_generator():
+        try:
+            # 断线后浏览器 3 秒自动重连
+            yield "retry: 3000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield event_bus.format_sse(event)
+        finally:
+            event_bus.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
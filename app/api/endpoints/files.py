@@ -62,24 +62,22 @@ async def get_files_summary():
         "total_size": 0
     }
     
-    # 1. Scan Books
-    if APP_DATA_DIR.exists():
-        for item in APP_DATA_DIR.iterdir():
-            if item.is_dir() and item.name.endswith("_audio"):
-                book_name = item.name.replace("_audio", "")
-                
-                # Count mp3s
-                mp3s = list(item.glob("*.mp3"))
-                size = sum(f.stat().st_size for f in mp3s)
-                
-                summary["books"].append({
-                    "id": book_name,
-                    "name": book_name,
-                    "title": book_name, # Map directory name to title for now
-                    "file_count": len(mp3s),
-                    "total_size": size
-                })
-                summary["total_size"] += size
+    # 1. Books (来自 book_stats 音频索引统计，不再逐本扫描目录)
+    from app.db.database import db
+    cursor = db.get_cursor()
+    cursor.execute(
+        "SELECT b.name, coalesce(s.completed, 0) AS completed, coalesce(s.audio_bytes, 0) AS audio_bytes "
+        "FROM books b LEFT JOIN book_stats s ON s.book_id = b.id ORDER BY b.name"
+    )
+    for row in cursor.fetchall():
+        summary["books"].append({
+            "id": row['name'],
+            "name": row['name'],
+            "title": row['name'], # Map directory name to title for now
+            "file_count": row['completed'],
+            "total_size": row['audio_bytes']
+        })
+        summary["total_size"] += row['audio_bytes']
 
     # 2. Scan Exports
     if EXPORT_DIR.exists():
@@ -154,6 +152,20 @@ async def delete_file(
                  db.commit()
              except Exception:
                  pass # Ignore DB errors if file is gone
+
+        # 章节音频被删除后同步重置音频索引 (文件列表/下载均以数据库为准)
+        if type == "book_file":
+             from app.db.database import db
+             try:
+                 cursor = db.get_cursor()
+                 cursor.execute(
+                     "UPDATE tasks SET status = 'pending', audio_path = NULL, audio_bytes = 0, audio_mtime = NULL, "
+                     "audio_duration_ms = NULL, audio_crc32 = NULL WHERE book_id = (SELECT id FROM books WHERE name = ?) AND audio_path = ?",
+                     (book_name, filename)
+                 )
+                 db.commit()
+             except Exception as e:
+                 logger.warning(f"Failed to reset audio index for {target_path}: {e}")
                  
         return {"message": "File deleted successfully"}
     except Exception as e:
@@ -1,15 +1,49 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from typing import Optional
 from app.core.log_manager import log_manager
+from app.db.log_store import log_store
 import asyncio
+import json
 
 router = APIRouter()
 
 @router.websocket("/ws/logs")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    实时日志
+    客户端可随时发送订阅条件 (字段均可省略，省略表示不限):
+    {"type": "subscribe", "books": ["书名"], "categories": ["tts", "packing"], "min_level": "warning"}
+    """
     await log_manager.connect(websocket)
     try:
-        # 保持连接活跃，也可以接收前端发来的指令（例如调整日志级别，暂未实现）
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                data = json.loads(text)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and data.get("type") == "subscribe":
+                log_manager.subscribe(websocket, data)
     except WebSocketDisconnect:
         log_manager.disconnect(websocket)
+
+@router.get("/logs/search")
+async def search_logs(
+    book: Optional[str] = None,
+    chapter: Optional[int] = None,
+    level: Optional[str] = Query(None, description="最低级别: debug / info / warning / error"),
+    event: Optional[str] = Query(None, description="事件: chapter_started / chapter_completed / chapter_failed / book_started / book_finished"),
+    category: Optional[str] = None,
+    q: Optional[str] = Query(None, description="消息关键字"),
+    since: Optional[float] = Query(None, description="起始时间 (Unix 时间戳)"),
+    until: Optional[float] = Query(None, description="结束时间 (Unix 时间戳)"),
+    before_id: Optional[int] = Query(None, description="翻页: 返回 id 小于该值的记录"),
+    limit: int = Query(200, ge=1, le=2000),
+):
+    """检索结构化日志 (按时间倒序)"""
+    records = await asyncio.to_thread(
+        log_store.search, book=book, chapter=chapter, level=level, event=event, category=category,
+        q=q, since=since, until=until, before_id=before_id, limit=limit
+    )
+    next_before_id = records[-1]["id"] if len(records) == limit else None
+    return {"logs": records, "next_before_id": next_before_id}
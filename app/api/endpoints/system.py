@@ -26,3 +26,12 @@ async def get_system_storage():
             "percent": 0,
             "error": str(e)
         }
+
+
+@router.get("/startup")
+async def get_startup_profile():
+    """
+    Startup timing breakdown (config, router imports, startup event).
+    """
+    from app.core import startup_profile
+    return startup_profile.summary()
@@ -1,12 +1,14 @@
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+import asyncio
+import json
+import time
 
-from app.core.config import APP_DATA_DIR, BARK_ENABLED, BARK_SERVER_URL, BARK_API_KEY, WEB_BASE_URL, config
 from app.core.state import state
-from app.services.tts_engine import TTSProcessor
-from app.services.notifier import BarkNotifier
-from app.schemas.config import GenerateRequest, TTSConfig
+from app.db.jobs import job_store
+from app.services.job_control import job_control
+from app.services.job_runner import job_runner
+from app.schemas.config import GenerateRequest
 
 router = APIRouter()
 
@@ -15,107 +17,85 @@ import logging
 # 获取 logger
 logger = logging.getLogger(__name__)
 
-async def run_tts_task(book_name: str, tts_config: TTSConfig, chapter_ids: Optional[List[int]] = None):
-    try:
-        book_dir = APP_DATA_DIR / f"{book_name}_audio"
-        if not book_dir.exists():
-            logger.error(f"Directory not found for {book_name}")
-            return
-
-        # Initialize Bark Notifier with configuration
-        # 使用全局 config 对象获取配置
-        silent_hours_config = config.get_section("bark.silent_hours")
-        http_timeout = config.get("bark.http_timeout", 5)
-        
-        notifier = BarkNotifier(
-            server_url=BARK_SERVER_URL,
-            api_key=BARK_API_KEY,
-            enabled=BARK_ENABLED,
-            web_base_url=WEB_BASE_URL,
-            silent_hours_config=silent_hours_config,
-            http_timeout=http_timeout
-        )
-
-        # Initialize Processor
-        processor = TTSProcessor(
-            str(book_dir),
-            voice=tts_config.voice,
-            rate=tts_config.rate,
-            volume=tts_config.volume,
-            pitch=tts_config.pitch,
-            concurrency_limit=lambda: state.concurrency,
-            notifier=notifier
-        )
-        
-        # Update global state
-        state.active_processors[book_name] = processor 
-        
-        # Convert chapter_ids to string list if processor expects that?
-        # Processor.process expects Optional[List[str]] based on type hint in tts_processor.py?
-        # Let's check tts_processor.py line 105: process(self, chapter_ids: Optional[List[str]] = None)
-        # But GenerateRequest.chapter_ids is List[int].
-        # We should convert.
-        ids_str = [str(i) for i in chapter_ids] if chapter_ids else None
-        
-        logger.info(f"Starting TTS task for {book_name} with voice {tts_config.voice}")
-        await processor.process(chapter_ids=ids_str)
-            
-    except Exception as e:
-        logger.error(f"Error processing {book_name}: {e}", exc_info=True)
-    finally:
-        if book_name in state.active_processors:
-            del state.active_processors[book_name]
-
-
 from app.db.database import db
+from app.api.etag import make_etag, not_modified, set_etag
 
 @router.post("/start")
-async def start_task(request: GenerateRequest, background_tasks: BackgroundTasks):
-    # 检查内存中是否已在运行
-    if request.book_name in state.active_processors:
+async def start_task(request: GenerateRequest):
+    """合成任务入队，由任务执行器 (内嵌或独立的合成进程) 领取执行"""
+    # 检查任务表 (任意进程) 中是否已在运行
+    job = await asyncio.to_thread(job_store.active_job, request.book_name)
+    if job:
         # If running, check if just paused
-        processor = state.active_processors[request.book_name]
-        if not processor.pause_event.is_set():
-             processor.resume()
+        if job['paused']:
+             await asyncio.to_thread(job_control.set_paused, request.book_name, False)
              return {"message": f"Resumed task for {request.book_name}"}
         return {"message": f"Task for {request.book_name} is already running."}
     
-    # 以后这里可以添加从数据库检查任务状态的逻辑，避免重复启动已完成的任务
-    
-    background_tasks.add_task(run_tts_task, request.book_name, request.config, request.chapter_ids)
-    return {"message": f"Started generating audio for {request.book_name}"}
+    # 参数随任务持久化，进程重启后任务自动重新排队时沿用
+    params = {"config": request.config.model_dump(), "chapter_ids": request.chapter_ids}
+    job_id = await asyncio.to_thread(job_store.enqueue, request.book_name, "tts", params, request.priority)
+    if job_id is None:
+        if not db.get_book_id(request.book_name):
+            raise HTTPException(status_code=404, detail="Book not found")
+        return {"message": f"Task for {request.book_name} is already running."}
+
+    job_runner.wake()
+    return {"message": f"Started generating audio for {request.book_name}", "job_id": job_id}
 
 @router.post("/pause/{book_name}")
 async def pause_task(book_name: str):
-    if book_name in state.active_processors:
-        state.active_processors[book_name].pause()
+    if await asyncio.to_thread(job_control.set_paused, book_name, True):
         return {"message": f"Paused task for {book_name}"}
     return {"message": "Task not running", "status": "error"}
 
 @router.post("/resume/{book_name}")
 async def resume_task(book_name: str):
-    if book_name in state.active_processors:
-        state.active_processors[book_name].resume()
+    if await asyncio.to_thread(job_control.set_paused, book_name, False):
         return {"message": f"Resumed task for {book_name}"}
     return {"message": "Task not running", "status": "error"}
 
+@router.post("/stop/{book_name}")
+async def stop_task(book_name: str):
+    """停止任务: 进行中的章节完成后结束，未开始的章节保持待处理"""
+    if await asyncio.to_thread(job_control.stop_task, book_name):
+        return {"message": f"Stopping task for {book_name}"}
+    return {"message": "Task not running", "status": "error"}
+
 @router.get("/status/{book_name}")
-async def task_status(book_name: str):
-    # 优先返回内存中的实时状态
-    if book_name in state.active_processors:
-        processor = state.active_processors[book_name]
+async def task_status(book_name: str, request: Request, response: Response):
+    # 版本号 + 运行时状态作为 ETag，未变化时直接 304
+    # 运行时状态取自任务表: 任务可能在其他进程中执行，正在处理的章节随心跳写入
+    job = await asyncio.to_thread(job_store.active_job, book_name)
+    runtime = None
+    if job:
+        processor = state.active_processors.get(book_name)
+        if processor:
+            current = sorted(processor.processing_chapters)
+        else:
+            current = json.loads(job['current']) if job['current'] else []
+        runtime = (bool(job['paused']), current)
+    etag = make_etag("status", book_name, db.get_revision(book_name), runtime)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+
+    # 优先返回运行中任务的实时状态
+    if job:
         return {
             "is_running": True,
-            "is_paused": not processor.pause_event.is_set(),
-            "status": "processing",
-            "current_chapter": list(processor.processing_chapters)
+            "is_paused": runtime[0],
+            "status": "stopping" if job['cancel_requested'] else "processing",
+            "current_chapter": runtime[1]
         }
     
     # 如果内存中没有，查询数据库 (历史/已完成状态)
     try:
         cursor = db.get_cursor()
         cursor.execute(
-            "SELECT status, count(*) as count FROM tasks WHERE book_name = ? GROUP BY status", 
+            "SELECT status, count(*) as count FROM tasks "
+            "WHERE book_id = (SELECT id FROM books WHERE name = ?) GROUP BY status",
             (book_name,)
         )
         rows = cursor.fetchall()
@@ -139,10 +119,26 @@ async def task_status(book_name: str):
 async def get_logs(book_name: str):
     if book_name in state.active_processors:
         return {"logs": list(state.active_processors[book_name].logs)}
-    return {"logs": []}
+    # 任务已结束: 从日志库取该书最近的记录
+    from app.db.log_store import log_store
+    from app.core.config import MAX_LOGS
+    records = await asyncio.to_thread(log_store.search, book=book_name, limit=MAX_LOGS)
+    return {"logs": [
+        f"[{time.strftime('%H:%M:%S', time.localtime(r['ts']))}] {r['message']}" for r in reversed(records)
+    ]}
 
 @router.post("/concurrency")
 async def set_concurrency(limit: int = Query(..., ge=1, le=10)):
-    state.concurrency = limit
+    # 写入共享设置，其他进程的任务经心跳同步
+    await asyncio.to_thread(job_control.set_concurrency, limit)
+    # 唤醒等待中的章节 (调大并发时立即生效)
+    for processor in list(state.active_processors.values()):
+        await processor.semaphore.refresh()
     return {"message": f"Concurrency set to {limit}", "effective_next_chapter": True}
         
+
+@router.get("/workers")
+async def list_workers():
+    """各合成节点的累计吞吐 (章节/小时、字符/分钟) 与存活状态"""
+    nodes = await asyncio.to_thread(job_store.nodes)
+    return {"node": job_store.worker_id, "workers": nodes}
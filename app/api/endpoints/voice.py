@@ -3,7 +3,6 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import FileResponse, StreamingResponse
 import hashlib
 import io
-import edge_tts
 import logging
 
 logger = logging.getLogger(__name__)
@@ -53,6 +52,7 @@ async def preview_voice_cached(
         text = "您好，我是微软智能语音助手，这段音频是为了测试我的发音效果。"
 
     try:
+        import edge_tts
         communicate = edge_tts.Communicate(
             text, 
             short_name, 
@@ -78,6 +78,7 @@ async def preview_custom(request: CustomPreviewRequest):
         text = text[:100]
 
     try:
+        import edge_tts
         communicate = edge_tts.Communicate(
             text, 
             request.voice, 
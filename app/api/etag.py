@@ -0,0 +1,26 @@
+"""
+条件请求 (ETag / If-None-Match) 公共工具
+ETag 由数据版本号和内存状态等廉价输入生成，命中时直接返回 304，各接口共用
+"""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts, weak: bool = True) -> str:
+    """由数据版本号和内存状态等廉价输入生成 ETag (If-Range 需要强 ETag)"""
+    digest = hashlib.md5("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """If-None-Match 命中时返回 304 响应，否则返回 None"""
+    header = request.headers.get("if-none-match")
+    if header and (header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
@@ -3,8 +3,11 @@
 整合 YAML 配置和环境变量
 """
 
+import json
 import os
 import pathlib
+import sys
+from typing import Optional
 from app.core.config_loader import get_config
 
 # 初始化配置加载器
@@ -55,9 +58,79 @@ path_adapter = PathAdapter(BASE_DIR)
 AUTO_DETECT = config.get("paths.auto_detect", True)
 AUTO_MIGRATE = config.get("paths.auto_migrate", False)
 
-def setup_adaptive_paths():
-    """设置自适应路径"""
-    global DATA_DIR, APP_DATA_DIR, CACHE_DIR, DB_DIR
+# 路径解析缓存: 首次解析 (候选探测、写入测试) 的结果写入配置目录 (不纳入版本控制)，
+# 后续启动在路径配置与环境变量不变、目录仍可写、旧数据检测结果不变时直接复用
+PATHS_CACHE_FILE = config.config_path.parent / ".paths_cache.json"
+_PATH_ENV_VARS = ("NOVELVOICE_DATA_DIR", "NOVELVOICE_APP_DATA_DIR", "NOVELVOICE_CACHE_DIR", "NOVELVOICE_DB_DIR")
+_CACHED_PATHS = ("DATA_DIR", "APP_DATA_DIR", "CACHE_DIR", "DB_DIR")
+
+
+def _paths_cache_key() -> dict:
+    """决定路径解析结果的输入 (任一变化即缓存失效)"""
+    key = {
+        "base_dir": str(BASE_DIR),
+        "paths": config.get_section("paths"),
+        "env": {name: os.getenv(name) for name in _PATH_ENV_VARS},
+    }
+    return json.loads(json.dumps(key, default=str))
+
+
+def _legacy_data_probe(data_dir: pathlib.Path) -> Optional[str]:
+    """旧数据检测结果 (只在自动检测数据目录时进行，仅检查候选目录是否有数据，开销很小)"""
+    if get_env_path("NOVELVOICE_DATA_DIR") or not AUTO_DETECT:
+        return None
+    candidates = path_adapter.get_candidates(PathType.DATA, config.get("paths.data_dir"))
+    old_data = path_adapter.detect_old_data(data_dir, candidates)
+    return str(old_data) if old_data else None
+
+
+def _load_paths_cache():
+    try:
+        cached = json.loads(PATHS_CACHE_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("key") != _paths_cache_key():
+        return None
+    paths = {name: pathlib.Path(value) for name, value in (cached.get("paths") or {}).items()}
+    if set(paths) != set(_CACHED_PATHS):
+        return None
+    if not all(path.is_dir() and os.access(path, os.W_OK) for path in paths.values()):
+        return None
+    # 旧数据出现或消失 (如挂载了旧数据卷) 时重新解析，以便提示迁移
+    if cached.get("legacy_data") != _legacy_data_probe(paths["DATA_DIR"]):
+        return None
+    return paths
+
+
+def _save_paths_cache():
+    try:
+        PATHS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        PATHS_CACHE_FILE.write_text(json.dumps({
+            "key": _paths_cache_key(),
+            "paths": {name: str(globals()[name]) for name in _CACHED_PATHS},
+            "legacy_data": _legacy_data_probe(DATA_DIR),
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+    except OSError:
+        # 配置目录只读时不缓存，下次启动重新解析
+        pass
+
+
+def setup_adaptive_paths() -> bool:
+    """
+    设置自适应路径
+
+    Returns:
+        是否使用了缓存的解析结果
+    """
+    global DATA_DIR, APP_DATA_DIR, CACHE_DIR, DB_DIR, EXPORT_DIR
+
+    cached = _load_paths_cache()
+    if cached:
+        DATA_DIR, APP_DATA_DIR, CACHE_DIR, DB_DIR = (cached[name] for name in _CACHED_PATHS)
+        EXPORT_DIR = DATA_DIR / "export"
+        EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+        print(f"✅ 使用缓存的路径解析结果: {DATA_DIR}")
+        return True
     
     print("\n🔍 启动路径自适应系统...")
     
@@ -76,7 +149,6 @@ def setup_adaptive_paths():
         
         if not DATA_DIR:
             print("❌ 无法找到可写的数据目录!")
-            import sys
             sys.exit(1)
         
         # 检测旧数据
@@ -87,8 +159,8 @@ def setup_adaptive_paths():
             
             # 根据配置决定是否自动迁移
             should_migrate = AUTO_MIGRATE
-            if not AUTO_MIGRATE and os.getenv("ENV") != "production":
-                # 开发环境询问用户
+            if not AUTO_MIGRATE and os.getenv("ENV") != "production" and sys.stdin and sys.stdin.isatty():
+                # 开发环境询问用户 (仅交互式终端，容器/后台进程中不阻塞启动)
                 try:
                     response = input("   ❓ 是否迁移数据? (y/n): ")
                     should_migrate = response.lower() == 'y'
@@ -149,7 +221,6 @@ def setup_adaptive_paths():
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
     # ==================== 导出目录 ====================
-    global EXPORT_DIR
     EXPORT_DIR = DATA_DIR / "export"
     EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -175,8 +246,11 @@ def setup_adaptive_paths():
     print(f"   📁 数据库目录: {DB_DIR}")
     print(f"   📁 缓存目录: {CACHE_DIR}")
 
+    _save_paths_cache()
+    return False
+
 # 执行路径设置
-setup_adaptive_paths()
+PATHS_FROM_CACHE = setup_adaptive_paths()
 
 # ==================== TTS 配置 ====================
 DEFAULT_VOICE = config.get("tts.default_voice", "zh-CN-XiaoxiaoNeural")
@@ -231,6 +305,10 @@ SERVER_HOST = config.get("server.host", "0.0.0.0")
 SERVER_PORT = config.get("server.port", 8000)
 SERVER_RELOAD = config.get("server.reload", False)
 
+# ==================== 任务执行配置 ====================
+# embedded: API 进程内嵌任务执行器 (默认)；external: 由独立的合成进程 (python -m app.worker) 执行，API 只入队
+WORKER_MODE = os.getenv("WORKER_MODE", config.get("worker.mode", "embedded")).lower()
+
 # ==================== 日志配置 ====================
 LOG_DIR = DATA_DIR / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
@@ -252,6 +330,33 @@ MAX_LOGS = config.get("logging.max_logs", 200)
 APP_LOG_FILE = LOG_DIR / "app.log"
 ERROR_LOG_FILE = LOG_DIR / "error.log"
 
+# ==================== 配置热更新 ====================
+# 配置文件监视间隔 (秒)，0 表示只在手动重载时生效
+CONFIG_WATCH_INTERVAL = config.get("server.config_watch_interval", 0)
+
+
+@config.subscribe
+def _refresh_runtime_constants(changes):
+    """配置重载后刷新可热更新的模块常量 (函数内 from app.core.config import X 的调用方下次即读到新值)"""
+    global DEFAULT_VOICE, DEFAULT_RATE, DEFAULT_VOLUME, DEFAULT_PITCH
+    global MAX_CHARS, CONCURRENCY_LIMIT, MAX_RETRIES, TTS_TIMEOUT
+    global CHAPTER_PATTERN, CHUNK_SIZE, MIN_CHUNK_LENGTH, MAX_LOGS
+    if "tts" in changes:
+        DEFAULT_VOICE = config.get("tts.default_voice", "zh-CN-XiaoxiaoNeural")
+        DEFAULT_RATE = config.get("tts.default_rate", "+0%")
+        DEFAULT_VOLUME = config.get("tts.default_volume", "+0%")
+        DEFAULT_PITCH = config.get("tts.default_pitch", "+0Hz")
+        MAX_CHARS = config.get("tts.max_chars", 8000)
+        CONCURRENCY_LIMIT = config.get("tts.concurrency_limit", 2)
+        MAX_RETRIES = config.get("tts.max_retries", 3)
+        TTS_TIMEOUT = config.get("tts.timeout", 30)
+    if "text_processing" in changes:
+        CHAPTER_PATTERN = config.get("text_processing.chapter_pattern", r"^\s*第.{1,7}[章节回].*")
+        CHUNK_SIZE = config.get("text_processing.chunk_size", 5000)
+        MIN_CHUNK_LENGTH = config.get("text_processing.min_chunk_length", 50)
+    if "logging" in changes:
+        MAX_LOGS = config.get("logging.max_logs", 200)
+
 # 打印配置加载信息
 print("=" * 60)
 print("📋 NovelVoice 配置信息")
@@ -267,17 +372,17 @@ print(f"📱 Bark 通知: {'启用' if BARK_ENABLED else '禁用'}")
 print(f"🌐 服务器: {SERVER_HOST}:{SERVER_PORT}")
 print("=" * 60)
 
-# 启动时检查路径可写性
-print("\n🔍 检查路径权限...")
-from app.core.config_loader import check_paths_writable
-
-path_errors = check_paths_writable([DATA_DIR, APP_DATA_DIR, DB_DIR, CACHE_DIR])
-if path_errors:
-    print("\n❌ 路径权限检查失败:")
-    for path, error in path_errors.items():
-        print(f"  - {path}: {error}")
-    print("\n⚠️  应用可能无法正常运行,请检查目录权限!")
-    print("💡 提示: 请确保应用对数据目录有读写权限\n")
-else:
-    print("✅ 所有路径权限检查通过\n")
+# 启动时检查路径可写性 (缓存命中时已确认目录可写，跳过写入测试)
+if not PATHS_FROM_CACHE:
+    print("\n🔍 检查路径权限...")
+    from app.core.config_loader import check_paths_writable
 
+    path_errors = check_paths_writable([DATA_DIR, APP_DATA_DIR, DB_DIR, CACHE_DIR])
+    if path_errors:
+        print("\n❌ 路径权限检查失败:")
+        for path, error in path_errors.items():
+            print(f"  - {path}: {error}")
+        print("\n⚠️  应用可能无法正常运行,请检查目录权限!")
+        print("💡 提示: 请确保应用对数据目录有读写权限\n")
+    else:
+        print("✅ 所有路径权限检查通过\n")
@@ -3,10 +3,15 @@
 从 config.yml 加载配置,支持环境变量覆盖
 """
 
+import asyncio
+import inspect
 import os
 import pathlib
 import yaml
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+# 配置变更回调: 接收变更的配置段 {section: {"old": ..., "new": ...}}，可为普通函数或协程函数
+ConfigCallback = Callable[[Dict[str, Any]], Union[None, Awaitable[None]]]
 
 
 class ConfigLoader:
@@ -31,10 +36,13 @@ class ConfigLoader:
         
         self.config_path = pathlib.Path(config_path)
         self._config: Dict[str, Any] = {}
+        self._subscribers: List[ConfigCallback] = []
+        self._mtime: Optional[float] = None
         self._load_config()
     
     def _load_config(self):
         """加载 YAML 配置文件"""
+        self._mtime = self._stat_mtime()
         if not self.config_path.exists():
             print(f"⚠️  配置文件不存在: {self.config_path}")
             print(f"📝 使用默认配置")
@@ -190,10 +198,53 @@ class ConfigLoader:
         """获取所有配置"""
         return self._config
     
-    async def reload(self) -> Dict[str, Any]:
+    def subscribe(self, callback: ConfigCallback) -> ConfigCallback:
+        """
+        订阅配置变更，重载成功且有配置段变化时按订阅顺序调用
+
+        Returns:
+            传入的回调 (便于作为装饰器使用)
+        """
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: ConfigCallback):
+        """取消订阅"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    async def _notify(self, changes: Dict[str, Any]):
+        for callback in list(self._subscribers):
+            try:
+                result = callback(changes)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"[NovelVoice] Config subscriber {getattr(callback, '__qualname__', callback)} failed: {e!r}")
+
+    def _stat_mtime(self) -> Optional[float]:
+        try:
+            return self.config_path.stat().st_mtime
+        except OSError:
+            return None
+
+    async def watch(self, interval: float = 2.0):
         """
-        异步重新加载配置文件
+        轮询配置文件修改时间，变化时自动重载 (应用启动时按配置以后台任务运行)
+        """
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._stat_mtime()
+            if mtime is not None and mtime != self._mtime:
+                await self.reload(source="watcher")
+
+    async def reload(self, source: str = "manual") -> Dict[str, Any]:
+        """
+        异步重新加载配置文件，并通知订阅者
         
+        Args:
+            source: 触发来源 (manual / save / watcher)，仅用于日志
+
         Returns:
             dict: 包含状态、消息和配置的字典
         """
@@ -208,7 +259,8 @@ class ConfigLoader:
                     "config": self._config
                 }
             
-            # 读取新配置
+            # 读取新配置 (先记录修改时间，格式错误时监视器不会反复重试同一版本)
+            self._mtime = self._stat_mtime()
             with open(self.config_path, 'r', encoding='utf-8') as f:
                 new_config = yaml.safe_load(f)
             
@@ -230,10 +282,14 @@ class ConfigLoader:
             changes = self._get_config_changes(old_config, new_config)
             
             # 记录日志
-            print(f"[NovelVoice] User triggered manual config reload from disk.")
+            if source == "watcher":
+                print(f"[NovelVoice] Config file change detected, reloading from disk.")
+            else:
+                print(f"[NovelVoice] User triggered {source} config reload from disk.")
             print(f"[NovelVoice] Config reloaded successfully at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             if changes:
                 print(f"[NovelVoice] Detected {len(changes)} config section(s) changed: {', '.join(changes.keys())}")
+                await self._notify(changes)
             
             return {
                 "success": True,
@@ -275,7 +331,7 @@ class ConfigLoader:
         changes = {}
         
         # 检查主要配置段
-        sections = ['tts', 'bark', 'server', 'text_processing', 'paths', 'voices']
+        sections = ['tts', 'bark', 'server', 'text_processing', 'paths', 'voices', 'logging', 'packing', 'http']
         
         for section in sections:
             old_val = old_config.get(section)
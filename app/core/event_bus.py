@@ -0,0 +1,78 @@
+"""
+进度事件总线
+向 /api/events (SSE) 订阅者推送章节、打包、书籍统计等类型化事件，替代前端定时轮询
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class EventBus:
+    """
+    进程内事件总线
+
+    - publish() 可在任意线程调用 (打包任务运行在线程池中)
+    - 每个订阅者一个有界队列，满时丢弃最旧事件，慢客户端不会拖慢发布方
+    - sink 接收每个发布的事件 (独立合成进程借此把事件转发给 API 进程)
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = itertools.count(1)
+        self.sinks: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    def subscribe(self) -> asyncio.Queue:
+        """注册订阅者 (需在事件循环中调用)"""
+        self.loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    def add_sink(self, sink: Callable[[str, Dict[str, Any]], None]):
+        """注册事件转发函数 (需线程安全且不阻塞)"""
+        self.sinks.append(sink)
+
+    def publish(self, event_type: str, data: Optional[Dict[str, Any]] = None):
+        """发布事件 (线程安全，无订阅者时直接返回)"""
+        for sink in self.sinks:
+            sink(event_type, data or {})
+        if not self.subscribers or self.loop is None:
+            return
+
+        event = {
+            "id": next(self._seq),
+            "type": event_type,
+            "data": data or {},
+            "timestamp": time.time()
+        }
+        try:
+            self.loop.call_soon_threadsafe(self._dispatch, event)
+        except RuntimeError:
+            # 事件循环已关闭 (关机阶段)
+            pass
+
+    def _dispatch(self, event: Dict[str, Any]):
+        for queue in list(self.subscribers):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    @staticmethod
+    def format_sse(event: Dict[str, Any]) -> str:
+        """编码为 SSE 帧"""
+        payload = json.dumps(event["data"], ensure_ascii=False)
+        return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+event_bus = EventBus()
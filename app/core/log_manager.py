@@ -1,83 +1,215 @@
 import asyncio
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Any, Optional, FrozenSet
 from fastapi import WebSocket
 import logging
 import json
 import time
 import os
+import threading
 from collections import deque
 from pathlib import Path
-from app.core.config import APP_DATA_DIR
+from app.core.config import APP_DATA_DIR, MAX_LOGS, config
 
 # Ensure logs directory exists
 LOG_DIR = APP_DATA_DIR / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 OPERATION_LOG_FILE = LOG_DIR / "operation.log"
+# 关键操作日志专用 Logger (不向根 Logger 传播，由 setup_logger 挂到日志写入线程)
+OPERATION_LOGGER = "app.operation"
+
+# 本模块自身的错误日志不回送到 WebSocket 广播 (见 setup_logger)，避免广播出错时循环产生日志
+logger = logging.getLogger(__name__)
+
+# 日志级别排序 (success 介于 info 与 warning 之间)
+LEVEL_ORDER = {"debug": 10, "info": 20, "success": 25, "warning": 30, "error": 40}
+
+
+@dataclass(frozen=True)
+class LogFilter:
+    """
+    /ws/logs 订阅条件，字段为空表示不限
+    books 非空时只推送属于这些书籍的日志 (不含无书籍归属的系统日志)
+    """
+    books: FrozenSet[str] = frozenset()
+    categories: FrozenSet[str] = frozenset()
+    min_level: int = 0
+
+    @classmethod
+    def from_message(cls, data: Dict[str, Any]) -> "LogFilter":
+        """由客户端订阅消息构建: {"books": [...], "categories": [...], "min_level": "warning"}"""
+        return cls(
+            books=frozenset(str(b) for b in data.get("books") or []),
+            categories=frozenset(str(c) for c in data.get("categories") or []),
+            min_level=LEVEL_ORDER.get(str(data.get("min_level") or "").lower(), 0),
+        )
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        if self.books and entry.get("book") not in self.books:
+            return False
+        if self.categories and entry.get("category") not in self.categories:
+            return False
+        return LEVEL_ORDER.get(entry.get("level"), 20) >= self.min_level
+
+    def apply(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self == NO_FILTER:
+            return entries
+        return [entry for entry in entries if self.matches(entry)]
+
+
+NO_FILTER = LogFilter()
+
+
+class _LogClient:
+    """单个 WebSocket 连接: 有界发送队列 (满时丢弃最旧的帧) + 独立的发送协程"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.filter = NO_FILTER
+        self.frames: deque = deque(maxlen=max(1, queue_size))
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, frame: str):
+        if len(self.frames) == self.frames.maxlen:
+            self.dropped += 1
+        self.frames.append(frame)
+        self.wakeup.set()
+
 
 class LogConnectionManager:
+    """
+    日志广播
+    日志按批次 (每 batch_interval 秒一帧，JSON 数组) 编码一次后投递到各连接的有界队列，
+    每个连接由独立协程发送，慢客户端只会丢弃自己的旧日志，不会拖慢广播和其他连接
+    """
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, _LogClient] = {}
         self.log_queue = asyncio.Queue()
         self._broadcasting = False
-        # Store last 200 logs in memory
-        self.history: deque = deque(maxlen=200)
+        # 广播协程所在的事件循环 (start_broadcasting 时绑定)；绑定前的日志暂存在有界缓冲中
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: deque = deque(maxlen=MAX_LOGS)
+        self._pending_lock = threading.Lock()
+        # Store last N logs in memory (连接时作为一帧回放)
+        self.history: deque = deque(maxlen=MAX_LOGS)
+        self.batch_interval = max(0.01, config.get("logging.ws_batch_interval_ms", 100) / 1000)
+        self.client_queue_size = config.get("logging.ws_client_queue", 50)
+        # 每批日志的转发函数 (独立合成进程借此把日志转发给 API 进程)
+        self.sinks: List[Callable[[List[Dict[str, Any]]], None]] = []
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        # Send history upon connection
+        client = _LogClient(websocket, self.client_queue_size)
+        # 历史回放与注册之间没有 await，不会与后续批次重复或遗漏
         if self.history:
-            history_list = list(self.history)
-            for log_entry in history_list:
-                await self._send_to_connection(websocket, json.dumps(log_entry, ensure_ascii=False))
+            client.push(json.dumps(list(self.history), ensure_ascii=False))
+        self.clients[websocket] = client
+        client.task = asyncio.create_task(self._sender(client))
+
+    def subscribe(self, websocket: WebSocket, data: Dict[str, Any]):
+        """
+        更新连接的订阅条件
+        丢弃按旧条件积压的批次，并按新条件回放历史 (单帧)
+        """
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        client.filter = LogFilter.from_message(data)
+        client.frames.clear()
+        client.push(json.dumps(client.filter.apply(list(self.history)), ensure_ascii=False))
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.clients.pop(websocket, None)
+        if client and client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
 
     async def start_broadcasting(self):
         """Starts the background task to consume logs from queue and broadcast"""
         if self._broadcasting:
             return
         self._broadcasting = True
-        self.loop = asyncio.get_running_loop() # Store the loop for cross-thread access
+        with self._pending_lock:
+            self.loop = asyncio.get_running_loop() # Store the loop for cross-thread access
+            while self._pending:
+                self.log_queue.put_nowait(self._pending.popleft())
         
         # Start heartbeat task
         asyncio.create_task(self._heartbeat())
         
         while True:
             try:
-                log_entry = await self.log_queue.get()
-                
+                batch = [await self.log_queue.get()]
+                # 攒一个周期内的日志合并为一帧
+                await asyncio.sleep(self.batch_interval)
+                while not self.log_queue.empty():
+                    batch.append(self.log_queue.get_nowait())
+
+                self.history.extend(batch)
+                for sink in self.sinks:
+                    sink(batch)
+
                 # Persist critical logs
-                self._persist_log(log_entry)
-                
-                # Broadcast to WS clients
-                message = json.dumps(log_entry, ensure_ascii=False)
-                await self._broadcast(message)
-            except Exception as e:
-                print(f"Error broadcasting log: {e}")
+                for log_entry in batch:
+                    self._persist_log(log_entry)
+
+                # Broadcast to WS clients (每种订阅条件只过滤、编码一次)
+                if self.clients:
+                    self._broadcast_batch(batch)
+            except Exception:
+                logger.exception("Error broadcasting log")
+
+    def add_sink(self, sink: Callable[[List[Dict[str, Any]]], None]):
+        self.sinks.append(sink)
+
+    def publish_remote(self, batch: List[Dict[str, Any]]):
+        """广播其他进程转发来的一批日志 (已由来源进程持久化，需在事件循环中调用)"""
+        self.history.extend(batch)
+        if self.clients:
+            self._broadcast_batch(batch)
 
     async def _heartbeat(self):
         """Sends a ping every 30s to keep connections alive"""
         while True:
             await asyncio.sleep(30)
-            if self.active_connections:
-                await self._broadcast("_PING_")
+            if self.clients:
+                self._broadcast("_PING_")
                 
-    async def _broadcast(self, message: str):
-        # Create tasks for all connections to avoid blocking if one hangs
-        tasks = []
-        for connection in self.active_connections[:]: # Copy list to avoid modification during iteration
-            tasks.append(self._send_to_connection(connection, message))
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def _send_to_connection(self, connection: WebSocket, message: str):
+    def _broadcast(self, message: str):
+        """投递到各连接的发送队列 (不等待发送完成)"""
+        for client in list(self.clients.values()):
+            client.push(message)
+
+    def _broadcast_batch(self, batch: List[Dict[str, Any]]):
+        """按订阅条件分组，每组过滤并编码一次后投递"""
+        groups: Dict[LogFilter, List[_LogClient]] = {}
+        for client in list(self.clients.values()):
+            groups.setdefault(client.filter, []).append(client)
+        for log_filter, clients in groups.items():
+            entries = log_filter.apply(batch)
+            if not entries:
+                continue
+            message = json.dumps(entries, ensure_ascii=False)
+            for client in clients:
+                client.push(message)
+
+    async def _sender(self, client: _LogClient):
         try:
-            await connection.send_text(message)
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                while client.frames:
+                    await client.websocket.send_text(client.frames.popleft())
+        except asyncio.CancelledError:
+            raise
         except Exception:
-            self.disconnect(connection)
+            pass
+        finally:
+            if client.dropped:
+                logger.debug(f"Log client dropped {client.dropped} frames")
+            self.disconnect(client.websocket)
 
     def _persist_log(self, log_entry: Dict[str, Any]):
         """Write critical operations to disk"""
@@ -92,36 +224,43 @@ class LogConnectionManager:
             should_persist = level in ["error", "success"] or any(k in msg for k in keywords)
 
             if should_persist:
-                timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(log_entry["timestamp"]))
-                line = f"[{timestamp}] [{level.upper()}] {msg}\n"
-                with open(OPERATION_LOG_FILE, "a", encoding="utf-8") as f:
-                    f.write(line)
-        except Exception as e:
-            print(f"Failed to persist log: {e}")
-
-    def put_log(self, message: str, level: str = "info", category: str = "system"):
+                # 经由不传播的 app.operation Logger 交给日志写入线程，不在事件循环中写文件
+                logging.getLogger(OPERATION_LOGGER).log(
+                    logging.ERROR if level == "error" else logging.WARNING if level == "warning" else logging.INFO,
+                    msg, extra={"operation_level": level.upper()}
+                )
+        except Exception:
+            logger.exception("Failed to persist log")
+
+    def put_log(self, message: str, level: str = "info", category: str = "system", book: Optional[str] = None):
         """Called by logic (sync or async) to put log into broadcast queue"""
         
         log_entry = {
             "message": message,
             "level": level,
             "category": category,
+            "book": book,
             "timestamp": time.time()
         }
         
-        # Add to history immediately (thread-safe deque)
-        self.history.append(log_entry)
-
-        # Try to use stored loop for thread-safe access
+        # 广播开始前 (启动阶段) 的日志先缓冲，绑定事件循环后按顺序补发
+        with self._pending_lock:
+            if self.loop is None:
+                self._pending.append(log_entry)
+                return
         try:
-            if hasattr(self, 'loop') and self.loop:
-                self.loop.call_soon_threadsafe(self.log_queue.put_nowait, log_entry)
-            else:
-                # Fallback to current loop if possible
-                loop = asyncio.get_running_loop()
-                loop.call_soon_threadsafe(self.log_queue.put_nowait, log_entry)
-        except Exception as e:
-            # Fallback for sync threads without loop access at startup/shutdown
-            print(f"⚠️ Log queue failed for: {message[:50]}... Error: {e}")
+            self.loop.call_soon_threadsafe(self.log_queue.put_nowait, log_entry)
+        except RuntimeError:
+            # 事件循环已关闭 (进程退出阶段)，文件日志不受影响
+            pass
 
 log_manager = LogConnectionManager()
+
+
+@config.subscribe
+def _resize_history(changes):
+    """配置重载后调整回放历史的长度"""
+    if "logging" in changes:
+        from app.core.config import MAX_LOGS as max_logs
+        if log_manager.history.maxlen != max_logs:
+            log_manager.history = deque(log_manager.history, maxlen=max_logs)
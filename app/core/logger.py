@@ -1,83 +1,237 @@
+import atexit
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, RotatingFileHandler
+from typing import Dict, List, Optional
 from app.core.config import (
-    LOG_DIR, LOG_LEVEL, LOG_FORMAT, 
+    LOG_DIR, LOG_LEVEL, LOG_FORMAT,
     LOG_MAX_BYTES, LOG_BACKUP_COUNT,
     APP_LOG_FILE, ERROR_LOG_FILE
 )
 
-def setup_logger():
+# 写入线程单批最多处理的记录数
+_BATCH_SIZE = 500
+_STOP = object()
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    """emit 时不逐条 flush，由写入线程在每批结束后统一 flush"""
+
+    _deferred = False
+
+    def emit(self, record):
+        self._deferred = True
+        try:
+            super().emit(record)
+        finally:
+            self._deferred = False
+
+    def flush(self):
+        if not self._deferred:
+            super().flush()
+
+
+class LogWriter:
+    """
+    后台日志写入线程
+    业务代码 (含事件循环中的协程) 只把记录放入队列，文件/控制台/WebSocket 输出全部在本线程完成；
+    每次取出一批记录逐个分发，批次结束时统一 flush
+    """
+
+    def __init__(self, log_queue: queue.Queue, handlers: List[logging.Handler],
+                 routes: Optional[Dict[str, List[logging.Handler]]] = None):
+        self.queue = log_queue
+        self.handlers = handlers
+        # 按 Logger 名称路由到专用 handler (不经过默认 handler)
+        self.routes = routes or {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """写完队列中剩余的记录后退出 (进程退出时调用)"""
+        if self._thread and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout=5)
+        for handler in self._all_handlers():
+            try:
+                handler.flush()
+                handler.close()
+            except Exception:
+                pass
+
+    def _all_handlers(self) -> List[logging.Handler]:
+        handlers = list(self.handlers)
+        for routed in self.routes.values():
+            handlers.extend(routed)
+        return handlers
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            batch = [record]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            touched = set()
+            for record in batch:
+                if record is _STOP:
+                    stop = True
+                    continue
+                for handler in self.routes.get(record.name, self.handlers):
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                        touched.add(handler)
+            for handler in touched:
+                try:
+                    handler.flush()
+                except Exception:
+                    pass
+            if stop:
+                return
+
+
+_writer: Optional[LogWriter] = None
+
+
+def shutdown_logger():
+    """停止写入线程并写完剩余日志"""
+    if _writer:
+        _writer.stop()
+
+
+atexit.register(shutdown_logger)
+
+
+def setup_logger(app_log_file=APP_LOG_FILE, error_log_file=ERROR_LOG_FILE):
     """
-    配置全局日志系统
+    配置全局日志系统 (独立的合成进程使用自己的 app/error 日志文件，避免两个进程轮转同一文件)
     - app.log: 记录所有 >= 配置等级的日志
     - error.log: 仅记录 >= ERROR 等级的日志
     - 控制台: 输出所有日志 (方便调试)
+    - operation.log: 关键操作记录 (经由不传播的 app.operation Logger)
+    - logs.db: 结构化日志 (可按书籍/章节/级别/事件检索)
+
+    根 Logger 上只挂一个 QueueHandler，实际输出由后台写入线程批量完成，
+    记录日志的代码不会因磁盘/控制台 I/O 阻塞
     """
+    global _writer
+
     # 确保日志目录存在
     LOG_DIR.mkdir(parents=True, exist_ok=True)
-    
+
     # 获取根 Logger (或指定 'app' Logger)
     # 使用根 Logger 可以捕获所有模块的日志
     logger = logging.getLogger()
     logger.setLevel(LOG_LEVEL)
-    
+
     # 清除现有的 handlers (避免重复)
     if logger.hasHandlers():
         logger.handlers.clear()
-        
+    if _writer:
+        _writer.stop()
+
     # 创建格式化器
     formatter = logging.Formatter(LOG_FORMAT)
-    
+
     # ==================== 1. 应用主日志 (app.log) ====================
     # 记录所有 >= LOG_LEVEL 的日志
-    app_handler = RotatingFileHandler(
-        APP_LOG_FILE,
+    app_handler = BufferedRotatingFileHandler(
+        app_log_file,
         maxBytes=LOG_MAX_BYTES,
         backupCount=LOG_BACKUP_COUNT,
         encoding='utf-8'
     )
     app_handler.setLevel(LOG_LEVEL)
     app_handler.setFormatter(formatter)
-    logger.addHandler(app_handler)
-    
+
     # ==================== 2. 错误日志 (error.log) ====================
     # 仅记录 >= ERROR 的日志
-    error_handler = RotatingFileHandler(
-        ERROR_LOG_FILE,
+    error_handler = BufferedRotatingFileHandler(
+        error_log_file,
         maxBytes=LOG_MAX_BYTES,
         backupCount=LOG_BACKUP_COUNT,
         encoding='utf-8'
     )
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
-    
+
     # ==================== 3. 控制台输出 ====================
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(LOG_LEVEL)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
     # ==================== 4. WebSocket 输出 ====================
-    from app.core.log_manager import log_manager
-    
+    from app.core.log_manager import log_manager, OPERATION_LOG_FILE, OPERATION_LOGGER, logger as log_manager_logger
+
     class WebSocketLogHandler(logging.Handler):
         def emit(self, record):
+            # 广播自身的错误只写文件与控制台，不再回送广播
+            if record.name == log_manager_logger.name:
+                return
             try:
                 msg = self.format(record)
-                log_manager.put_log(msg)
+                if record.levelno >= logging.ERROR:
+                    level = "error"
+                elif record.levelno >= logging.WARNING:
+                    level = "warning"
+                else:
+                    level = "info"
+                # 书籍与分类由 extra={"book": ..., "category": ...} 传入
+                log_manager.put_log(msg, level=level, category=getattr(record, "category", "system"),
+                                    book=getattr(record, "book", None))
             except Exception:
                 self.handleError(record)
 
     ws_handler = WebSocketLogHandler()
     ws_handler.setLevel(LOG_LEVEL)
     ws_handler.setFormatter(formatter)
-    logger.addHandler(ws_handler)
-    
+
+    # ==================== 5. 关键操作日志 (operation.log) ====================
+    operation_handler = BufferedRotatingFileHandler(
+        OPERATION_LOG_FILE,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'
+    )
+    operation_handler.setFormatter(logging.Formatter(
+        "[%(asctime)s] [%(operation_level)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+    ))
+
+    # ==================== 6. 结构化日志库 (logs.db) ====================
+    from app.db.log_store import LogStoreHandler, log_store
+    store_handler = LogStoreHandler(log_store)
+    store_handler.setLevel(LOG_LEVEL)
+
+    # ==================== 队列与写入线程 ====================
+    log_queue: queue.Queue = queue.Queue()
+    queue_handler = QueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+
+    operation_logger = logging.getLogger(OPERATION_LOGGER)
+    operation_logger.handlers.clear()
+    operation_logger.setLevel(logging.INFO)
+    operation_logger.propagate = False
+    operation_logger.addHandler(queue_handler)
+
+    _writer = LogWriter(
+        log_queue,
+        [app_handler, error_handler, console_handler, ws_handler, store_handler],
+        routes={OPERATION_LOGGER: [operation_handler]},
+    )
+    _writer.start()
+
     # 记录启动信息
     logging.info(f"🚀 日志系统初始化完成")
     logging.info(f"📝 日志目录: {LOG_DIR}")
     logging.info(f"🎚️ 日志等级: {LOG_LEVEL}")
-    
+
     return logger
@@ -0,0 +1,243 @@
+"""
+MP3 元数据读取
+解析 ID3v2 标签、Xing/Info/VBRI 信息帧与 MPEG 音频帧头 (信息帧 / 固定码率换算 / 逐帧扫描)，不依赖 ffprobe
+"""
+
+import pathlib
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Tuple
+
+# 比特率表 (kbps)，按 (MPEG 版本, Layer) 区分
+_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# 采样率表 (Hz)，按 MPEG 版本区分 (2.5 视为版本 2 的一半)
+_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    25: [11025, 12000, 8000],
+}
+
+# 读取头部时最多扫描的字节数
+_HEAD_SCAN_BYTES = 64 * 1024
+# 固定码率校验时在文件中部/尾部抽样读取的字节数
+_PROBE_BYTES = 4096
+
+
+def id3v2_size(header: bytes) -> int:
+    """返回 ID3v2 标签总长度 (含 10 字节头)，不存在时返回 0"""
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = 0
+    for b in header[6:10]:
+        size = (size << 7) | (b & 0x7F)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def parse_frame_header(data: bytes, pos: int = 0) -> Optional[Dict[str, int]]:
+    """解析 pos 处的 MPEG 音频帧头，不是合法帧头时返回 None"""
+    if pos + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[pos:pos + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_idx = (b2 >> 4) & 0x0F
+    sample_idx = (b2 >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_idx in (0, 15) or sample_idx == 3:
+        return None
+
+    version = {3: 1, 2: 2, 0: 25}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_idx]
+    padding = (b2 >> 1) & 0x01
+    channel_mode = (b3 >> 6) & 0x03
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or version == 1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "samples": samples,
+        "channel_mode": channel_mode,
+        "length": length,
+    }
+
+
+def find_first_frame(data: bytes, start: int = 0) -> Optional[int]:
+    """从 start 开始查找第一个后面紧跟合法帧的帧头 (两帧校验，避免误判)"""
+    pos = start
+    while True:
+        pos = data.find(b"\xFF", pos)
+        if pos < 0 or pos + 4 > len(data):
+            return None
+        frame = parse_frame_header(data, pos)
+        if frame and frame["length"] > 0:
+            nxt = pos + frame["length"]
+            if nxt + 4 > len(data) or parse_frame_header(data, nxt):
+                return pos
+        pos += 1
+
+
+def xing_tag_offset(frame: Dict[str, int]) -> int:
+    """Xing/Info 标签相对帧头的偏移 (帧头 4 字节 + side info)"""
+    mono = frame["channel_mode"] == 3
+    if frame["version"] == 1:
+        side = 17 if mono else 32
+    else:
+        side = 9 if mono else 17
+    return 4 + side
+
+
+def is_info_frame(data: bytes, pos: int, frame: Dict[str, int]) -> bool:
+    """pos 处的帧是否为 Xing/Info/VBRI 信息帧 (不含音频，仅描述单个文件)"""
+    offset = pos + xing_tag_offset(frame)
+    return data[offset:offset + 4] in (b"Xing", b"Info") or data[pos + 36:pos + 40] == b"VBRI"
+
+
+def info_frame_count(data: bytes, pos: int, frame: Dict[str, int]) -> Optional[int]:
+    """读取 Xing/Info/VBRI 信息帧中记录的音频帧数 (不含信息帧本身)，没有记录时返回 None"""
+    offset = pos + xing_tag_offset(frame)
+    if data[offset:offset + 4] in (b"Xing", b"Info"):
+        flags = int.from_bytes(data[offset + 4:offset + 8], "big")
+        if flags & 0x01 and len(data) >= offset + 12:
+            return int.from_bytes(data[offset + 8:offset + 12], "big")
+        return None
+    if data[pos + 36:pos + 40] == b"VBRI" and len(data) >= pos + 54:
+        return int.from_bytes(data[pos + 50:pos + 54], "big")
+    return None
+
+
+@dataclass
+class FrameScan:
+    """逐帧扫描结果"""
+    # 连续音频帧区间 [(start, end)]，正常文件只有一段，遇到垃圾数据重新同步时会分段
+    segments: List[Tuple[int, int]] = field(default_factory=list)
+    frames: int = 0
+    samples: int = 0
+    sample_rate: int = 0
+    channel_mode: int = 0
+
+    @property
+    def audio_bytes(self) -> int:
+        return sum(end - start for start, end in self.segments)
+
+    @property
+    def duration_ms(self) -> int:
+        return self.samples * 1000 // self.sample_rate if self.sample_rate else 0
+
+
+def scan_frames(data: bytes) -> FrameScan:
+    """
+    逐帧扫描完整文件内容
+    跳过 ID3v2/ID3v1 标签与开头的 Xing/Info 信息帧，统计帧数与采样数
+    """
+    result = FrameScan()
+    limit = len(data)
+    if limit >= 128 and data[limit - 128:limit - 125] == b"TAG":
+        limit -= 128
+    data = data[:limit] if limit != len(data) else data
+
+    pos = find_first_frame(data, id3v2_size(data[:10]))
+    if pos is None:
+        return result
+    first = parse_frame_header(data, pos)
+    result.sample_rate = first["sample_rate"]
+    result.channel_mode = first["channel_mode"]
+    if is_info_frame(data, pos, first):
+        pos += first["length"]
+
+    seg_start = pos
+    while pos is not None and pos + 4 <= limit:
+        frame = parse_frame_header(data, pos)
+        if not frame or frame["length"] <= 0 or pos + frame["length"] > limit:
+            if pos > seg_start:
+                result.segments.append((seg_start, pos))
+            pos = find_first_frame(data, pos + 1)
+            seg_start = pos
+            continue
+        result.frames += 1
+        result.samples += frame["samples"]
+        pos += frame["length"]
+    if pos is not None and pos > seg_start:
+        result.segments.append((seg_start, pos))
+    return result
+
+
+def scan_file(path: pathlib.Path) -> FrameScan:
+    """读取并逐帧扫描文件"""
+    with open(path, "rb") as f:
+        return scan_frames(f.read())
+
+
+def _audio_end(f, size: int) -> int:
+    """音频数据结束位置 (排除末尾 128 字节的 ID3v1 标签)"""
+    if size > 128:
+        f.seek(size - 128)
+        if f.read(3) == b"TAG":
+            return size - 128
+    return size
+
+
+def _bitrate_near(f, offset: int) -> Optional[int]:
+    """读取 offset 附近第一个可确认的帧的比特率"""
+    f.seek(offset)
+    window = f.read(_PROBE_BYTES)
+    pos = find_first_frame(window)
+    if pos is None:
+        return None
+    return parse_frame_header(window, pos)["bitrate"]
+
+
+def measure_duration_ms(path: pathlib.Path) -> Optional[int]:
+    """
+    测量 MP3 时长 (毫秒)，无法识别时返回 None
+
+    1. 首帧为 Xing/Info/VBRI 信息帧且记录了帧数: 帧数 × 每帧采样数，只读文件头
+    2. 文件头、中部、尾部抽样的比特率一致 (固定码率，edge-tts 的输出即是): 按音频字节数换算
+    3. 其余情况 (VBR 且无信息帧): 逐帧扫描
+    """
+    try:
+        size = path.stat().st_size
+        with open(path, "rb") as f:
+            head = f.read(_HEAD_SCAN_BYTES)
+            pos = find_first_frame(head, id3v2_size(head))
+            if pos is None:
+                return None
+            frame = parse_frame_header(head, pos)
+
+            frames = info_frame_count(head, pos, frame)
+            if frames is not None:
+                return frames * frame["samples"] * 1000 // frame["sample_rate"]
+
+            if size <= len(head):
+                # 小文件已完整读入，直接逐帧统计
+                return scan_frames(head).duration_ms or None
+
+            audio_start = pos + frame["length"] if is_info_frame(head, pos, frame) else pos
+            audio_end = _audio_end(f, size)
+            audio_bytes = audio_end - audio_start
+            probes = [audio_start + audio_bytes // 2, max(audio_start, audio_end - _PROBE_BYTES)]
+            if all(_bitrate_near(f, probe) in (None, frame["bitrate"]) for probe in probes):
+                return int(audio_bytes * 8 * 1000 / frame["bitrate"])
+        return scan_file(path).duration_ms or None
+    except OSError:
+        return None
+
@@ -0,0 +1,33 @@
+"""
+启动耗时剖析
+记录启动各阶段 (配置加载、路由导入、启动事件) 的耗时，启动完成后输出一行汇总，
+也可通过 /api/system/startup 查看
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+
+# 以本模块首次导入的时间为起点 (app.main 的第一个导入)
+_START = time.perf_counter()
+_stages: List[Tuple[str, float]] = []
+
+
+def mark(stage: str):
+    """记录一个阶段的结束时间"""
+    _stages.append((stage, time.perf_counter()))
+
+
+def summary() -> Dict[str, Any]:
+    """各阶段耗时 (毫秒) 与总耗时"""
+    stages = []
+    last = _START
+    for stage, at in _stages:
+        stages.append({"stage": stage, "ms": round((at - last) * 1000, 1)})
+        last = at
+    return {"total_ms": round((last - _START) * 1000, 1), "stages": stages}
+
+
+def format_summary() -> str:
+    result = summary()
+    detail = ", ".join(f"{s['stage']} {s['ms']:.0f}ms" for s in result["stages"])
+    return f"{result['total_ms']:.0f}ms ({detail})"
@@ -9,9 +9,8 @@ if TYPE_CHECKING:
     from app.services.tts_engine import TTSProcessor
 
 class GlobalState:
+    # 本进程中运行的合成任务 (跨进程的任务状态见 app.db.jobs)
     active_processors: Dict[str, Any] = {} # Key: book_name, Value: TTSProcessor instance
-    active_packers: Dict[str, str] = {} # Key: book_name, Value: status ("packing", "cancelling")
-    cancel_events: Dict[str, Any] = {} # Key: book_name, Value: threading.Event
-    concurrency: int = 2
+    concurrency: int = 2 # 由任务心跳与 meta.concurrency 同步
 
 state = GlobalState()
@@ -9,6 +9,15 @@ from app.core.config import APP_DATA_DIR, DB_DIR, DATA_DIR
 
 DB_PATH = DB_DIR / "novelvoice.db"
 
+# 数据库结构版本 (v2: books 表 + 整数主键)
+SCHEMA_VERSION = 2
+
+# tasks 中影响展示的列 (更新时递增版本号)，章节租约列不在其中
+_TASK_REVISION_COLUMNS = (
+    "book_id", "chapter_index", "title", "content", "status", "audio_path",
+    "audio_bytes", "audio_mtime", "audio_duration_ms", "audio_crc32",
+)
+
 class Database:
     _instance = None
 
@@ -40,57 +49,495 @@ class Database:
                     except Exception as e:
                         logger.error(f"❌ 数据库文件迁移失败: {e}")
 
-            self.conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            # 多进程共享 (任务控制表): WAL 允许读写并发，写锁冲突时等待而非立即报错
+            from app.core.config import config
+            self.conn = sqlite3.connect(DB_PATH, timeout=config.get("jobs.busy_timeout", 10),
+                                        check_same_thread=False)
             self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA journal_mode=WAL")
             self._init_db()
     
     def _init_db(self):
         cursor = self.conn.cursor()
-        # 创建任务表
+        # 元数据表 (schema 版本等)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+        # v2 之前的 tasks 以 "{book_name}_{idx}" 字符串为主键，启动时在线迁移
+        if self._table_has_column("tasks", "book_name"):
+            self._migrate_to_v2()
+
+        # 书籍表 v2 (整数主键，记录源文件与导入参数)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS books (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE,
+                dir_name TEXT NOT NULL,
+                source_file TEXT,
+                source_size INTEGER,
+                source_mtime REAL,
+                import_params TEXT,
+                revision INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # 创建任务表 (book_id, chapter_index) 复合主键
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tasks (
-                id TEXT PRIMARY KEY,
-                book_name TEXT NOT NULL,
+                book_id INTEGER NOT NULL,
                 chapter_index INTEGER NOT NULL,
                 title TEXT NOT NULL,
                 content TEXT,
                 status TEXT DEFAULT 'pending',
                 audio_path TEXT,
+                audio_bytes INTEGER DEFAULT 0,
+                audio_mtime REAL,
+                audio_duration_ms INTEGER,
+                audio_crc32 INTEGER,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (book_id, chapter_index)
             )
         """)
-        
+        # 音频文件索引 (合成完成时写入，文件列表/下载不再扫描目录)
+        self._ensure_column("tasks", "audio_mtime", "REAL")
+        self._ensure_column("tasks", "audio_duration_ms", "INTEGER")
+        self._ensure_column("tasks", "audio_crc32", "INTEGER")
+        # 章节认领 (多个合成节点共享数据库时按租约分配章节，见 app/db/jobs.py)
+        # 状态流转: pending -> processing (已认领) -> completed / failed，租约过期的 processing 退回 pending
+        self._ensure_column("tasks", "claimed_by", "TEXT")
+        self._ensure_column("tasks", "lease_until", "REAL")
+
         # 创建资产表 v1.4.0 (支持多版本打包下载)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS book_assets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                book_name TEXT NOT NULL,
+                book_id INTEGER NOT NULL,
                 filename TEXT NOT NULL,
                 description TEXT,
                 size_str TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        # 导出选择键 (书籍 + 章节 ID + 章节音频大小/修改时间的哈希)，相同选择直接复用已有导出
+        self._ensure_column("book_assets", "selection_key", "TEXT")
+
+        # 资产内容表: 记录每个导出包含的章节文件及其 CRC，用于增量追加打包
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS asset_entries (
+                asset_id INTEGER NOT NULL,
+                chapter_index INTEGER,
+                arcname TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                crc32 INTEGER NOT NULL,
+                PRIMARY KEY (asset_id, arcname)
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_asset_entries_delete AFTER DELETE ON book_assets
+            BEGIN
+                DELETE FROM asset_entries WHERE asset_id = OLD.id;
+            END
+        """)
         
-        # 创建索引以加速查询
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_book_name ON tasks (book_name)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON tasks (status)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_asset_book ON book_assets (book_name)")
+        # 创建索引以加速查询 ((book_id, status) 覆盖按状态计数)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_book_status ON tasks (book_id, status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks (lease_until) WHERE lease_until IS NOT NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_asset_book ON book_assets (book_id, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_asset_selection ON book_assets (book_id, selection_key)")
+        cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
         self.conn.commit()
-        
-        # 尝试迁移旧数据
+
+        # 书籍统计表 (由触发器维护，书籍列表无需再对 tasks 做 GROUP BY)
+        self._init_book_stats()
+
+        # 数据版本号 (用于 ETag / 条件请求)
+        self._init_revisions()
+
+        # 尝试迁移旧数据 (只在首次成功后记录标记，之后启动不再遍历书籍目录；删除该标记可重新执行)
+        cursor.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'")
+        if cursor.fetchone() is None:
+            try:
+                self.migrate_legacy_data()
+                cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_migrated', '1')")
+                self.conn.commit()
+            except Exception as e:
+                logger.warning(f"Migration warning: {e}")
+
+    def _table_has_column(self, table: str, column: str) -> bool:
+        cursor = self.conn.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        return column in [row['name'] for row in cursor.fetchall()]
+
+    def _ensure_column(self, table: str, column: str, ddl: str):
+        """为旧版本数据库补充缺失的列"""
+        if not self._table_has_column(table, column):
+            self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            self.conn.commit()
+
+    def _migrate_to_v2(self):
+        """
+        将 v1 结构 (tasks/book_assets 重复存储 book_name) 迁移为整数 book_id
+        在单个事务内完成，失败时整体回滚，旧表保持不变
+        """
+        logger.info("📦 正在迁移数据库结构到 v2 (books 表 + 整数主键)...")
+        if not self._table_has_column("tasks", "audio_bytes"):
+            self.conn.execute("ALTER TABLE tasks ADD COLUMN audio_bytes INTEGER DEFAULT 0")
+            self.conn.commit()
+        has_assets = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_assets'"
+        ).fetchone() is not None
+
         try:
-            self.migrate_legacy_data()
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN")
+            for trigger in ("trg_tasks_stats_insert", "trg_tasks_stats_delete", "trg_tasks_stats_update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE IF EXISTS book_stats")
+
+            cursor.execute("""
+                CREATE TABLE books (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    dir_name TEXT NOT NULL,
+                    source_file TEXT,
+                    source_size INTEGER,
+                    source_mtime REAL,
+                    import_params TEXT,
+                    revision INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # UNION 去重; 没有资产表时同样需要 DISTINCT (每本书有多个章节行)
+            asset_names = "UNION SELECT book_name FROM book_assets" if has_assets else ""
+            cursor.execute(f"""
+                INSERT INTO books (name, dir_name)
+                SELECT book_name, book_name || '_audio' FROM (
+                    SELECT DISTINCT book_name FROM tasks {asset_names}
+                ) ORDER BY book_name
+            """)
+
+            cursor.execute("""
+                CREATE TABLE tasks_v2 (
+                    book_id INTEGER NOT NULL,
+                    chapter_index INTEGER NOT NULL,
+                    title TEXT NOT NULL,
+                    content TEXT,
+                    status TEXT DEFAULT 'pending',
+                    audio_path TEXT,
+                    audio_bytes INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (book_id, chapter_index)
+                )
+            """)
+            cursor.execute("""
+                INSERT OR IGNORE INTO tasks_v2
+                    (book_id, chapter_index, title, content, status, audio_path, audio_bytes, created_at, updated_at)
+                SELECT b.id, t.chapter_index, t.title, t.content, t.status, t.audio_path,
+                       coalesce(t.audio_bytes, 0), t.created_at, t.updated_at
+                FROM tasks t JOIN books b ON b.name = t.book_name
+            """)
+            cursor.execute("DROP TABLE tasks")
+            cursor.execute("ALTER TABLE tasks_v2 RENAME TO tasks")
+
+            if has_assets:
+                cursor.execute("""
+                    CREATE TABLE book_assets_v2 (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        book_id INTEGER NOT NULL,
+                        filename TEXT NOT NULL,
+                        description TEXT,
+                        size_str TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute("""
+                    INSERT INTO book_assets_v2 (id, book_id, filename, description, size_str, created_at)
+                    SELECT a.id, b.id, a.filename, a.description, a.size_str, a.created_at
+                    FROM book_assets a JOIN books b ON b.name = a.book_name
+                """)
+                cursor.execute("DROP TABLE book_assets")
+                cursor.execute("ALTER TABLE book_assets_v2 RENAME TO book_assets")
+
+            cursor.execute("DROP INDEX IF EXISTS idx_book_name")
+            cursor.execute("DROP INDEX IF EXISTS idx_status")
+            cursor.execute("DROP INDEX IF EXISTS idx_asset_book")
+            self.conn.commit()
+            logger.info("✅ 数据库结构迁移完成")
         except Exception as e:
-            logger.warning(f"Migration warning: {e}")
+            self.conn.rollback()
+            logger.error(f"❌ 数据库结构迁移失败，已回滚: {e}")
+            raise
+
+    def get_book_id(self, book_name: str) -> Optional[int]:
+        """按书名查找整数 ID"""
+        cursor = self.get_cursor()
+        cursor.execute("SELECT id FROM books WHERE name = ?", (book_name,))
+        row = cursor.fetchone()
+        return row['id'] if row else None
+
+    def ensure_book(self, book_name: str, dir_name: Optional[str] = None, **metadata) -> int:
+        """
+        获取或创建书籍记录，并更新源文件元数据
+
+        Args:
+            book_name: 书名
+            dir_name: 音频目录名，默认为 "{book_name}_audio"
+            metadata: source_file / source_size / source_mtime / import_params
+        """
+        import json
+
+        cursor = self.get_cursor()
+        cursor.execute(
+            "INSERT OR IGNORE INTO books (name, dir_name) VALUES (?, ?)",
+            (book_name, dir_name or f"{book_name}_audio")
+        )
+        fields = {k: v for k, v in metadata.items()
+                  if k in ("source_file", "source_size", "source_mtime", "import_params")}
+        if "import_params" in fields and not isinstance(fields["import_params"], str):
+            fields["import_params"] = json.dumps(fields["import_params"], ensure_ascii=False)
+        if dir_name:
+            fields["dir_name"] = dir_name
+        if fields:
+            assignments = ", ".join(f"{k} = ?" for k in fields)
+            cursor.execute(
+                f"UPDATE books SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE name = ?",
+                (*fields.values(), book_name)
+            )
+        self.conn.commit()
+        return self.get_book_id(book_name)
+
+    def _init_book_stats(self):
+        """创建 book_stats 表及维护触发器，首次创建时从 tasks 回填"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_stats'")
+        is_new = cursor.fetchone() is None
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS book_stats (
+                book_id INTEGER PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                chars_total INTEGER NOT NULL DEFAULT 0,
+                chars_done INTEGER NOT NULL DEFAULT 0,
+                audio_bytes INTEGER NOT NULL DEFAULT 0,
+                audio_duration_ms INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # 旧版统计表缺少时长列: 补列并重建触发器
+        if not is_new and not self._table_has_column("book_stats", "audio_duration_ms"):
+            self._ensure_column("book_stats", "audio_duration_ms", "INTEGER NOT NULL DEFAULT 0")
+            for trigger in ("trg_tasks_stats_insert", "trg_tasks_stats_delete", "trg_tasks_stats_update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            needs_rebuild = True
+        else:
+            needs_rebuild = is_new
+
+        # 每个触发器只做增量加减，单次写入的代价与书籍规模无关
+        cursor.executescript("""
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_stats_insert AFTER INSERT ON tasks
+            BEGIN
+                INSERT OR IGNORE INTO book_stats (book_id) VALUES (NEW.book_id);
+                UPDATE book_stats SET
+                    total = total + 1,
+                    completed = completed + (NEW.status = 'completed'),
+                    failed = failed + (NEW.status = 'failed'),
+                    chars_total = chars_total + length(coalesce(NEW.content, '')),
+                    chars_done = chars_done + CASE WHEN NEW.status = 'completed'
+                        THEN length(coalesce(NEW.content, '')) ELSE 0 END,
+                    audio_bytes = audio_bytes + coalesce(NEW.audio_bytes, 0),
+                    audio_duration_ms = audio_duration_ms + coalesce(NEW.audio_duration_ms, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE book_id = NEW.book_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_stats_delete AFTER DELETE ON tasks
+            BEGIN
+                UPDATE book_stats SET
+                    total = total - 1,
+                    completed = completed - (OLD.status = 'completed'),
+                    failed = failed - (OLD.status = 'failed'),
+                    chars_total = chars_total - length(coalesce(OLD.content, '')),
+                    chars_done = chars_done - CASE WHEN OLD.status = 'completed'
+                        THEN length(coalesce(OLD.content, '')) ELSE 0 END,
+                    audio_bytes = audio_bytes - coalesce(OLD.audio_bytes, 0),
+                    audio_duration_ms = audio_duration_ms - coalesce(OLD.audio_duration_ms, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE book_id = OLD.book_id;
+                DELETE FROM book_stats WHERE book_id = OLD.book_id AND total <= 0;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_tasks_stats_update
+            AFTER UPDATE OF book_id, status, content, audio_bytes, audio_duration_ms ON tasks
+            BEGIN
+                UPDATE book_stats SET
+                    total = total - 1,
+                    completed = completed - (OLD.status = 'completed'),
+                    failed = failed - (OLD.status = 'failed'),
+                    chars_total = chars_total - length(coalesce(OLD.content, '')),
+                    chars_done = chars_done - CASE WHEN OLD.status = 'completed'
+                        THEN length(coalesce(OLD.content, '')) ELSE 0 END,
+                    audio_bytes = audio_bytes - coalesce(OLD.audio_bytes, 0),
+                    audio_duration_ms = audio_duration_ms - coalesce(OLD.audio_duration_ms, 0)
+                WHERE book_id = OLD.book_id;
+                INSERT OR IGNORE INTO book_stats (book_id) VALUES (NEW.book_id);
+                UPDATE book_stats SET
+                    total = total + 1,
+                    completed = completed + (NEW.status = 'completed'),
+                    failed = failed + (NEW.status = 'failed'),
+                    chars_total = chars_total + length(coalesce(NEW.content, '')),
+                    chars_done = chars_done + CASE WHEN NEW.status = 'completed'
+                        THEN length(coalesce(NEW.content, '')) ELSE 0 END,
+                    audio_bytes = audio_bytes + coalesce(NEW.audio_bytes, 0),
+                    audio_duration_ms = audio_duration_ms + coalesce(NEW.audio_duration_ms, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE book_id = NEW.book_id;
+                DELETE FROM book_stats WHERE book_id = OLD.book_id AND total <= 0;
+            END;
+        """)
+        self.conn.commit()
+
+        if is_new:
+            self._backfill_audio_bytes()
+        if needs_rebuild:
+            self.rebuild_book_stats()
+
+    def _backfill_audio_bytes(self):
+        """一次性回填旧库中已完成章节的音频大小 (仅在 book_stats 首次创建时执行)"""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT t.book_id, t.chapter_index, t.audio_path, b.dir_name FROM tasks t JOIN books b ON b.id = t.book_id "
+            "WHERE t.status = 'completed' AND t.audio_path IS NOT NULL AND coalesce(t.audio_bytes, 0) = 0"
+        )
+        updates = []
+        for row in cursor.fetchall():
+            audio_file = APP_DATA_DIR / row['dir_name'] / row['audio_path']
+            try:
+                updates.append((audio_file.stat().st_size, row['book_id'], row['chapter_index']))
+            except OSError:
+                continue
+        if updates:
+            cursor.executemany("UPDATE tasks SET audio_bytes = ? WHERE book_id = ? AND chapter_index = ?", updates)
+            self.conn.commit()
+            logger.info(f"Backfilled audio size for {len(updates)} chapters")
+
+    def _init_revisions(self):
+        """
+        数据版本号: books.revision 记录单本书的变更次数，meta.revision 记录全库变更次数
+        任何 tasks / book_assets / books 写入都会通过触发器递增，轮询接口据此生成 ETag
+        """
+        self._ensure_column("books", "revision", "INTEGER NOT NULL DEFAULT 0")
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0)")
+
+        # 章节租约 (claimed_by / lease_until) 按心跳续期，不计入版本号: 旧版监听全部列的触发器需要重建
+        row = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_rev_tasks_update'"
+        ).fetchone()
+        if row and "UPDATE OF" not in row[0]:
+            cursor.execute("DROP TRIGGER trg_rev_tasks_update")
+
+        bump_library = "UPDATE meta SET value = value + 1 WHERE key = 'revision';"
+        statements = []
+        for table, events in (("tasks", ("INSERT", "UPDATE", "DELETE")),
+                              ("book_assets", ("INSERT", "UPDATE", "DELETE"))):
+            for event in events:
+                row = "OLD" if event == "DELETE" else "NEW"
+                when = event
+                if table == "tasks" and event == "UPDATE":
+                    when = f"UPDATE OF {', '.join(_TASK_REVISION_COLUMNS)}"
+                statements.append(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_rev_{table}_{event.lower()} AFTER {when} ON {table}
+                    BEGIN
+                        UPDATE books SET revision = revision + 1 WHERE id = {row}.book_id;
+                        {bump_library}
+                    END;
+                """)
+        # books 自身只关心增删与改名 (不监听 revision 列，避免级联递增)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_rev_books_insert AFTER INSERT ON books
+            BEGIN {bump_library} END;
+            CREATE TRIGGER IF NOT EXISTS trg_rev_books_delete AFTER DELETE ON books
+            BEGIN {bump_library} END;
+            CREATE TRIGGER IF NOT EXISTS trg_rev_books_rename AFTER UPDATE OF name, dir_name ON books
+            BEGIN {bump_library} END;
+        """)
+        cursor.executescript("".join(statements))
+        self.conn.commit()
+
+    def get_revision(self, book_name: Optional[str] = None) -> int:
+        """获取全库或单本书的数据版本号"""
+        cursor = self.get_cursor()
+        if book_name is None:
+            cursor.execute("SELECT value FROM meta WHERE key = 'revision'")
+        else:
+            cursor.execute("SELECT revision FROM books WHERE name = ?", (book_name,))
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    def get_book_dir_name(self, book_name: str) -> Optional[str]:
+        """书籍音频目录名 (相对 APP_DATA_DIR)，未登记时返回 None"""
+        cursor = self.get_cursor()
+        cursor.execute("SELECT dir_name FROM books WHERE name = ?", (book_name,))
+        row = cursor.fetchone()
+        return row['dir_name'] if row else None
+
+    def get_book_stats(self, book_name: str) -> Dict[str, Any]:
+        """读取单本书的统计 (book_stats 行)，无记录时返回全 0"""
+        cursor = self.get_cursor()
+        cursor.execute(
+            "SELECT s.total, s.completed, s.failed, s.chars_total, s.chars_done, s.audio_bytes, s.audio_duration_ms "
+            "FROM books b JOIN book_stats s ON s.book_id = b.id WHERE b.name = ?",
+            (book_name,)
+        )
+        row = cursor.fetchone()
+        if row:
+            return dict(row)
+        return {"total": 0, "completed": 0, "failed": 0, "chars_total": 0, "chars_done": 0, "audio_bytes": 0,
+                "audio_duration_ms": 0}
+
+    def rebuild_book_stats(self):
+        """根据 tasks 全量重建 book_stats (触发器失效或手动修复时使用)"""
+        cursor = self.conn.cursor()
+        cursor.execute("DELETE FROM book_stats")
+        cursor.execute("""
+            INSERT INTO book_stats (book_id, total, completed, failed, chars_total, chars_done, audio_bytes, audio_duration_ms)
+            SELECT
+                book_id,
+                count(*),
+                sum(status = 'completed'),
+                sum(status = 'failed'),
+                sum(length(coalesce(content, ''))),
+                sum(CASE WHEN status = 'completed' THEN length(coalesce(content, '')) ELSE 0 END),
+                sum(coalesce(audio_bytes, 0)),
+                sum(coalesce(audio_duration_ms, 0))
+            FROM tasks
+            GROUP BY book_id
+        """)
+        self.conn.commit()
 
     def delete_book_tasks(self, book_name: str):
-        """删除书籍的所有任务记录"""
+        """删除书籍的所有任务、资产记录及书籍本身"""
         if self.conn is None:
             self.connect()
+        book_id = self.get_book_id(book_name)
+        if book_id is None:
+            return
         cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM tasks WHERE book_name = ?", (book_name,))
+        cursor.execute("DELETE FROM tasks WHERE book_id = ?", (book_id,))
+        cursor.execute("DELETE FROM book_assets WHERE book_id = ?", (book_id,))
+        cursor.execute("DELETE FROM book_stats WHERE book_id = ?", (book_id,))
+        cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
         self.conn.commit()
 
     def migrate_legacy_data(self):
@@ -136,7 +583,10 @@ class Database:
                     continue
                     
                 # 检查数据库是否已有记录
-                cursor.execute("SELECT 1 FROM tasks WHERE book_name = ? LIMIT 1", (book_name,))
+                cursor.execute(
+                    "SELECT 1 FROM tasks WHERE book_id = (SELECT id FROM books WHERE name = ?) LIMIT 1",
+                    (book_name,)
+                )
                 if cursor.fetchone():
                     continue
                     
@@ -145,6 +595,7 @@ class Database:
                     with open(tasks_file, 'r', encoding='utf-8') as f:
                         tasks = json.load(f)
                         
+                    book_id = self.ensure_book(book_name, dir_name=book_dir.name)
                     data_to_insert = []
                     for t in tasks:
                         # 兼容旧数据的 id 及字段
@@ -156,8 +607,7 @@ class Database:
                         audio_path = t.get('audio_path')
                         
                         data_to_insert.append((
-                            f"{book_name}_{task_id}",
-                            book_name,
+                            book_id,
                             task_id,
                             title,
                             content,
@@ -167,8 +617,8 @@ class Database:
                     
                     if data_to_insert:
                         cursor.executemany("""
-                            INSERT OR IGNORE INTO tasks (id, book_name, chapter_index, title, content, status, audio_path)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                            INSERT OR IGNORE INTO tasks (book_id, chapter_index, title, content, status, audio_path)
+                            VALUES (?, ?, ?, ?, ?, ?)
                         """, data_to_insert)
                         self.conn.commit()
                         logger.info(f"Migrated {len(data_to_insert)} tasks for {book_name}")
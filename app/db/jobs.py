@@ -0,0 +1,585 @@
+"""
+任务队列与控制状态
+任务 (含参数与优先级)、暂停/取消标记、全局并发数与跨进程事件保存在 SQLite (与业务库同一文件) 中，
+任意进程都能入队、查询与控制任意任务:
+
+- API 只负责入队 (queued，无 owner)，执行进程 (合成进程或内嵌执行器) 按优先级领取
+- 执行任务的进程按心跳续租 (owner + lease_until)，租约过期即视为该进程已退出；
+  未被停止的合成任务随之重新排队 (jobs.auto_resume)，由任一执行进程接着合成剩余章节
+- 暂停/取消只写标记，由持有任务的进程在下一次心跳时应用；尚未被领取的任务直接取消
+- 执行进程发布的进度事件写入 events 表，由 API 进程转发给 SSE / WebSocket 订阅者
+- 章节按租约认领 (tasks.claimed_by + lease_until)，多个节点可协作合成同一本书，租约过期的章节自动退回
+- 各节点的合成吞吐累计在 nodes 表中
+- 使用独立的自动提交连接，写操作以 BEGIN IMMEDIATE 串行化，不与业务连接的隐式事务交错
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import config
+from app.db.database import DB_PATH, db
+
+# 未结束的任务状态 (SQL 片段)
+_ACTIVE = "('queued', 'running')"
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER NOT NULL,
+        kind TEXT NOT NULL DEFAULT 'tts',
+        status TEXT NOT NULL DEFAULT 'queued',
+        paused INTEGER NOT NULL DEFAULT 0,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        owner TEXT,
+        lease_until REAL,
+        heartbeat_at REAL,
+        params TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        current TEXT,
+        message TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_book_status ON jobs (book_id, status);
+    CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs (owner, status);
+    CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (kind, status, priority);
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        node TEXT NOT NULL,
+        type TEXT NOT NULL,
+        data TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+    CREATE TABLE IF NOT EXISTS nodes (
+        node TEXT PRIMARY KEY,
+        started_at REAL NOT NULL,
+        last_seen REAL NOT NULL,
+        chapters_done INTEGER NOT NULL DEFAULT 0,
+        chapters_failed INTEGER NOT NULL DEFAULT 0,
+        chars_done INTEGER NOT NULL DEFAULT 0,
+        audio_bytes INTEGER NOT NULL DEFAULT 0,
+        synth_ms INTEGER NOT NULL DEFAULT 0
+    );
+"""
+
+def make_worker_id() -> str:
+    """进程标识 (主机名:PID)，写入任务的 owner"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_exited(owner: str, worker_id: str) -> bool:
+    """
+    owner 是否为本机已退出的进程: 与本进程同名 (容器重启后 PID 相同) 或 PID 已不存在；
+    其他主机的进程无法判断，返回 False (等待租约过期)
+    """
+    if owner == worker_id:
+        return True
+    host, _, pid = owner.rpartition(":")
+    if host != worker_id.rpartition(":")[0] or not pid.isdigit() or os.name == "nt":
+        # Windows 上 os.kill(pid, 0) 会终止目标进程，不做探测
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+class JobStore:
+    """任务表读写"""
+
+    def __init__(self, path=DB_PATH, lease_seconds: float = 30, busy_timeout: float = 10,
+                 node_retention: float = 7 * 86400, auto_resume: bool = True):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.busy_timeout = busy_timeout
+        # 持有进程退出后，未被停止的合成任务重新排队 (否则标记为中断)
+        self.auto_resume = auto_resume
+        # 超过该时长未心跳的节点从 nodes 表移除
+        self.node_retention = node_retention
+        self.worker_id = make_worker_id()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # 先经业务连接完成建库/迁移 (books 表等)
+            db.connect()
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, func):
+        """在 BEGIN IMMEDIATE 事务中执行 func(conn)，跨进程互斥"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(conn)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    # ==================== 任务生命周期 ====================
+
+    def _expire_stale(self, conn: sqlite3.Connection, now: float) -> tuple:
+        """
+        持有进程已退出 (租约过期) 的任务: 合成任务重新排队 (auto_resume)，其余标记为中断；
+        认领的章节退回待合成。返回 (重新排队的任务数, 退回的章节数)
+        """
+        requeued = 0
+        if self.auto_resume:
+            requeued = conn.execute(
+                f"UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, current = NULL, "
+                f"started_at = NULL WHERE kind = 'tts' AND status IN {_ACTIVE} AND cancel_requested = 0 "
+                f"AND owner IS NOT NULL AND lease_until < ?",
+                (now,)
+            ).rowcount
+        conn.execute(
+            f"UPDATE jobs SET status = 'interrupted', finished_at = ?, owner = NULL "
+            f"WHERE status IN {_ACTIVE} AND owner IS NOT NULL AND lease_until < ?",
+            (now, now)
+        )
+        released = conn.execute(
+            "UPDATE tasks SET claimed_by = NULL, lease_until = NULL, "
+            "status = CASE WHEN status = 'processing' THEN 'pending' ELSE status END "
+            "WHERE lease_until < ?",
+            (now,)
+        ).rowcount
+        return requeued, released
+
+    def recover(self) -> Dict[str, int]:
+        """
+        启动时恢复上次退出遗留的任务与章节 (任务执行器开始领取前调用):
+
+        - 本机已退出的进程持有的任务与章节不再等待租约过期，立即回收
+        - auto_resume 时，每本书最近一次被中断的合成任务重新排队 (保留参数、优先级与暂停标记)
+        - 没有认领记录的 processing 章节退回待合成
+
+        返回 {"jobs": 重新排队的任务数, "chapters": 退回待合成的章节数}
+        """
+        def op(conn):
+            now = time.time()
+            owners = {row["owner"] for row in conn.execute(
+                f"SELECT owner FROM jobs WHERE status IN {_ACTIVE} AND owner IS NOT NULL "
+                f"UNION SELECT claimed_by FROM tasks WHERE lease_until IS NOT NULL AND claimed_by IS NOT NULL"
+            )}
+            for owner in owners:
+                if _owner_exited(owner, self.worker_id):
+                    conn.execute(f"UPDATE jobs SET lease_until = 0 WHERE owner = ? AND status IN {_ACTIVE}", (owner,))
+                    conn.execute("UPDATE tasks SET lease_until = 0 WHERE lease_until IS NOT NULL AND claimed_by = ?",
+                                 (owner,))
+            requeued, released = self._expire_stale(conn, now)
+            if self.auto_resume:
+                requeued += conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, current = NULL, "
+                    "started_at = NULL, finished_at = NULL WHERE status = 'interrupted' AND cancel_requested = 0 "
+                    "AND id IN (SELECT MAX(id) FROM jobs WHERE kind = 'tts' GROUP BY book_id) "
+                    "AND book_id IN (SELECT id FROM books)"
+                ).rowcount
+            released += conn.execute(
+                "UPDATE tasks SET status = 'pending' WHERE status = 'processing' AND claimed_by IS NULL"
+            ).rowcount
+            return {"jobs": requeued, "chapters": released}
+
+        return self._write(op)
+
+    def enqueue(self, book_name: str, kind: str = "tts", params: Optional[Dict[str, Any]] = None,
+                priority: int = 0) -> Optional[int]:
+        """
+        任务入队 (等待执行进程领取)，返回任务 ID；
+        书籍不存在或同一本书已有同类未结束任务时返回 None
+        """
+        book_id = db.get_book_id(book_name)
+        if book_id is None:
+            return None
+
+        def op(conn):
+            now = time.time()
+            self._expire_stale(conn, now)
+            if conn.execute(
+                f"SELECT 1 FROM jobs WHERE book_id = ? AND kind = ? AND status IN {_ACTIVE}",
+                (book_id, kind)
+            ).fetchone():
+                return None
+            return conn.execute(
+                "INSERT INTO jobs (book_id, kind, status, params, priority, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (book_id, kind, json.dumps(params or {}, ensure_ascii=False), priority, now)
+            ).lastrowid
+
+        return self._write(op)
+
+    def claim(self, kind: str) -> Optional[Dict[str, Any]]:
+        """
+        领取一个排队中的任务 (优先级高者优先，同优先级先入先出) 并开始租约，
+        返回任务 (含书名与解析后的参数)；没有可领取的任务时返回 None
+        """
+        def op(conn):
+            now = time.time()
+            self._expire_stale(conn, now)
+            row = conn.execute(
+                "SELECT j.*, b.name AS book FROM jobs j JOIN books b ON b.id = j.book_id "
+                "WHERE j.kind = ? AND j.status = 'queued' AND j.owner IS NULL "
+                "ORDER BY j.priority DESC, j.id LIMIT 1",
+                (kind,)
+            ).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, heartbeat_at = ?, started_at = ? "
+                "WHERE id = ?",
+                (self.worker_id, now + self.lease_seconds, now, now, row["id"])
+            )
+            job = dict(row)
+            job["params"] = json.loads(job["params"] or "{}")
+            return job
+
+        return self._write(op)
+
+    def finish_job(self, job_id: int, status: str = "completed", message: Optional[str] = None):
+        """结束任务 (completed / failed / cancelled)"""
+        def op(conn):
+            conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, finished_at = ?, lease_until = NULL, current = NULL "
+                "WHERE id = ?",
+                (status, message, time.time(), job_id)
+            )
+        self._write(op)
+
+    def requeue_job(self, job_id: int) -> Optional[str]:
+        """
+        交还本进程执行中的任务 (进程退出前排空): 重新排队 (auto_resume) 或标记为中断，
+        已请求取消的任务直接结束；返回任务的新状态
+        """
+        def op(conn):
+            now = time.time()
+            status = "queued" if self.auto_resume else "interrupted"
+            conn.execute(
+                f"UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE ? END, "
+                f"owner = NULL, lease_until = NULL, current = NULL, started_at = NULL, "
+                f"finished_at = CASE WHEN cancel_requested OR ? = 'interrupted' THEN ? END "
+                f"WHERE id = ? AND status IN {_ACTIVE}",
+                (status, status, now, job_id)
+            )
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return row["status"] if row else None
+
+        return self._write(op)
+
+    def active_job(self, book_name: str, kind: str = "tts") -> Optional[Dict[str, Any]]:
+        """书籍当前的未结束任务 (已被进程持有的任务须租约有效)"""
+        rows = self._read(
+            f"SELECT j.* FROM jobs j JOIN books b ON b.id = j.book_id "
+            f"WHERE b.name = ? AND j.kind = ? AND j.status IN {_ACTIVE} "
+            f"AND (j.owner IS NULL OR j.lease_until >= ?) ORDER BY j.id DESC LIMIT 1",
+            (book_name, kind, time.time())
+        )
+        return rows[0] if rows else None
+
+    def active_jobs(self) -> List[Dict[str, Any]]:
+        """全部未结束任务 (含书名)"""
+        return self._read(
+            f"SELECT j.*, b.name AS book FROM jobs j JOIN books b ON b.id = j.book_id "
+            f"WHERE j.status IN {_ACTIVE} AND (j.owner IS NULL OR j.lease_until >= ?) "
+            f"ORDER BY j.id",
+            (time.time(),)
+        )
+
+    def is_active(self, book_name: str, kind: str = "tts") -> bool:
+        return self.active_job(book_name, kind) is not None
+
+    def queue_position(self, job: Dict[str, Any]) -> Optional[int]:
+        """排队中的任务在同类任务中的位置 (1 起)，执行中返回 0"""
+        if job["status"] == "running":
+            return 0
+        if job["status"] != "queued":
+            return None
+        rows = self._read(
+            "SELECT COUNT(*) AS ahead FROM jobs WHERE kind = ? AND status = 'queued' AND owner IS NULL "
+            "AND (priority > ? OR (priority = ? AND id < ?))",
+            (job["kind"], job["priority"], job["priority"], job["id"])
+        )
+        return rows[0]["ahead"] + 1
+
+    def find_selection(self, selection_key: str) -> Optional[Dict[str, Any]]:
+        """查找相同导出选择的未结束打包任务 (用于合并重复请求)"""
+        for job in self.active_jobs():
+            if job["kind"] == "pack" and json.loads(job["params"] or "{}").get("selection_key") == selection_key:
+                return job
+        return None
+
+    def queue_snapshot(self, kind: str) -> Dict[str, List[Dict[str, Any]]]:
+        """同类任务的运行中与排队中列表 (含排队位置)"""
+        running, queued = [], []
+        for job in self.active_jobs():
+            if job["kind"] != kind:
+                continue
+            params = json.loads(job["params"] or "{}")
+            item = {
+                "job_id": job["id"],
+                "book": job["book"],
+                "description": params.get("description", ""),
+                "priority": job["priority"],
+                "owner": job["owner"],
+                "submitted_at": job["created_at"],
+                "started_at": job["started_at"],
+            }
+            (running if job["status"] == "running" else queued).append(item)
+        queued.sort(key=lambda item: (-item["priority"], item["job_id"]))
+        for index, item in enumerate(queued, 1):
+            item["position"] = index
+        return {"running": running, "queued": queued}
+
+    def joinable(self, exclude: Optional[List[int]] = None) -> Optional[Dict[str, Any]]:
+        """
+        其他节点执行中、仍有未认领的待合成章节的合成任务 (供空闲节点协助合成)，
+        返回任务 (含书名与解析后的参数)；没有时返回 None
+        """
+        exclude = set(exclude or [])
+        now = time.time()
+        jobs = self._read(
+            "SELECT j.*, b.name AS book FROM jobs j JOIN books b ON b.id = j.book_id "
+            "WHERE j.kind = 'tts' AND j.status = 'running' AND j.owner != ? AND j.lease_until >= ? "
+            "AND j.paused = 0 AND j.cancel_requested = 0 ORDER BY j.priority DESC, j.id",
+            (self.worker_id, now)
+        )
+        for job in jobs:
+            if job["id"] in exclude:
+                continue
+            job["params"] = json.loads(job["params"] or "{}")
+            free = {row["chapter_index"] for row in self._read(
+                "SELECT chapter_index FROM tasks WHERE book_id = ? AND status = 'pending' "
+                "AND (claimed_by IS NULL OR lease_until < ?)",
+                (job["book_id"], now)
+            )}
+            selection = job["params"].get("chapter_ids")
+            if selection:
+                free &= {int(i) for i in selection}
+            if free:
+                return job
+        return None
+
+    # ==================== 控制标记 ====================
+
+    def _set_flag(self, book_name: str, kind: str, column: str, value: int) -> bool:
+        job = self.active_job(book_name, kind)
+        if not job:
+            return False
+
+        def op(conn):
+            return conn.execute(f"UPDATE jobs SET {column} = ? WHERE id = ?", (value, job["id"])).rowcount
+        return bool(self._write(op))
+
+    def set_paused(self, book_name: str, paused: bool, kind: str = "tts") -> bool:
+        return self._set_flag(book_name, kind, "paused", int(paused))
+
+    def cancel(self, book_name: str, kind: str = "tts") -> Optional[str]:
+        """
+        取消任务: 尚未被领取的任务直接结束 (返回 cancelled)，执行中的任务写入取消标记 (返回 cancelling)；
+        没有未结束任务时返回 None
+        """
+        job = self.active_job(book_name, kind)
+        if not job:
+            return None
+
+        def op(conn):
+            now = time.time()
+            if conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued' AND owner IS NULL",
+                (now, job["id"])
+            ).rowcount:
+                return "cancelled"
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job["id"],))
+            return "cancelling"
+
+        return self._write(op)
+
+    # ==================== 心跳 ====================
+
+    def heartbeat(self, current: Optional[Dict[int, List[str]]] = None,
+                  joined: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        为本进程持有的未结束任务与认领的章节续租，并返回这些任务 (含协助合成的任务) 的控制标记
+
+        Args:
+            current: {job_id: 正在处理的章节标题}，写入任务供其他进程查询
+            joined: 本进程协助合成的其他节点的任务 ID (不论是否已结束都返回其状态)
+        """
+        current = current or {}
+        joined = [int(job_id) for job_id in joined or []]
+
+        def op(conn):
+            now = time.time()
+            lease_until = now + self.lease_seconds
+            conn.execute(
+                f"UPDATE jobs SET lease_until = ?, heartbeat_at = ? WHERE owner = ? AND status IN {_ACTIVE}",
+                (lease_until, now, self.worker_id)
+            )
+            conn.execute("UPDATE tasks SET lease_until = ? WHERE lease_until IS NOT NULL AND claimed_by = ?",
+                         (lease_until, self.worker_id))
+            conn.execute("UPDATE nodes SET last_seen = ? WHERE node = ?", (now, self.worker_id))
+            conn.execute("DELETE FROM nodes WHERE last_seen < ?", (now - self.node_retention,))
+            for job_id, chapters in current.items():
+                conn.execute("UPDATE jobs SET current = ? WHERE id = ?",
+                             (json.dumps(chapters, ensure_ascii=False), job_id))
+            joined_sql = f" OR j.id IN ({', '.join('?' * len(joined))})" if joined else ""
+            return [dict(row) for row in conn.execute(
+                f"SELECT j.id, j.kind, j.status, j.paused, j.cancel_requested, b.name AS book "
+                f"FROM jobs j JOIN books b ON b.id = j.book_id "
+                f"WHERE (j.owner = ? AND j.status IN {_ACTIVE}){joined_sql}",
+                (self.worker_id, *joined)
+            ).fetchall()]
+
+        return self._write(op)
+
+    # ==================== 章节认领 ====================
+
+    def claim_chapter(self, book_id: int, chapter_index: int) -> Optional[Dict[str, Any]]:
+        """
+        认领章节并开始租约 (随心跳续租)，未完成的章节标记为 processing；
+        返回章节的最新记录，其中 claimed_by 不是本节点即表示章节正由其他节点合成；章节不存在时返回 None
+        """
+        def op(conn):
+            now = time.time()
+            conn.execute(
+                "UPDATE tasks SET claimed_by = ?, lease_until = ?, "
+                "status = CASE WHEN status = 'completed' THEN status ELSE 'processing' END "
+                "WHERE book_id = ? AND chapter_index = ? "
+                "AND (claimed_by IS NULL OR claimed_by = ? OR lease_until < ?)",
+                (self.worker_id, now + self.lease_seconds, book_id, chapter_index, self.worker_id, now)
+            )
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE book_id = ? AND chapter_index = ?", (book_id, chapter_index)
+            ).fetchone()
+            return dict(row) if row else None
+
+        return self._write(op)
+
+    def release_chapter(self, book_id: int, chapter_index: int):
+        """释放本节点认领的章节 (未写回结果的章节退回待合成)"""
+        def op(conn):
+            conn.execute(
+                "UPDATE tasks SET claimed_by = NULL, lease_until = NULL, "
+                "status = CASE WHEN status = 'processing' THEN 'pending' ELSE status END "
+                "WHERE book_id = ? AND chapter_index = ? AND claimed_by = ?",
+                (book_id, chapter_index, self.worker_id)
+            )
+        self._write(op)
+
+    # ==================== 节点吞吐 ====================
+
+    def register_node(self):
+        """登记本节点 (任务执行器启动时调用)，吞吐统计从零开始累计"""
+        def op(conn):
+            now = time.time()
+            conn.execute("INSERT OR REPLACE INTO nodes (node, started_at, last_seen) VALUES (?, ?, ?)",
+                         (self.worker_id, now, now))
+        self._write(op)
+
+    def record_chapter(self, ok: bool, chars: int = 0, audio_bytes: int = 0, synth_ms: int = 0):
+        """累计本节点合成的一个章节"""
+        def op(conn):
+            now = time.time()
+            conn.execute("INSERT OR IGNORE INTO nodes (node, started_at, last_seen) VALUES (?, ?, ?)",
+                         (self.worker_id, now, now))
+            conn.execute(
+                "UPDATE nodes SET last_seen = ?, chapters_done = chapters_done + ?, "
+                "chapters_failed = chapters_failed + ?, chars_done = chars_done + ?, "
+                "audio_bytes = audio_bytes + ?, synth_ms = synth_ms + ? WHERE node = ?",
+                (now, int(ok), int(not ok), chars if ok else 0, audio_bytes if ok else 0, synth_ms, self.worker_id)
+            )
+        self._write(op)
+
+    def nodes(self) -> List[Dict[str, Any]]:
+        """
+        各节点的累计吞吐 (最近心跳在前)；alive 表示心跳未超过租约时长，
+        速率按节点启动至最近一次心跳的时长计算
+        """
+        now = time.time()
+        rows = self._read("SELECT * FROM nodes ORDER BY last_seen DESC")
+        for row in rows:
+            minutes = max(row["last_seen"] - row["started_at"], 60) / 60
+            row["alive"] = row["last_seen"] >= now - self.lease_seconds
+            row["chapters_per_hour"] = round(row["chapters_done"] / minutes * 60, 1)
+            row["chars_per_minute"] = round(row["chars_done"] / minutes, 1)
+            row["avg_chapter_ms"] = (row["synth_ms"] // (row["chapters_done"] + row["chapters_failed"])
+                                     if row["chapters_done"] + row["chapters_failed"] else None)
+        return rows
+
+    # ==================== 全局设置 ====================
+
+    def get_concurrency(self, default: int = 2) -> int:
+        rows = self._read("SELECT value FROM meta WHERE key = 'concurrency'")
+        try:
+            return int(rows[0]["value"]) if rows else default
+        except (TypeError, ValueError):
+            return default
+
+    def set_concurrency(self, limit: int):
+        def op(conn):
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('concurrency', ?)", (str(limit),))
+        self._write(op)
+
+    # ==================== 跨进程事件 ====================
+
+    def append_events(self, events: List[tuple]):
+        """写入一批事件 [(类型, 数据)]"""
+        def op(conn):
+            now = time.time()
+            conn.executemany(
+                "INSERT INTO events (ts, node, type, data) VALUES (?, ?, ?, ?)",
+                [(now, self.worker_id, event_type, json.dumps(data, ensure_ascii=False)) for event_type, data in events]
+            )
+        self._write(op)
+
+    def last_event_id(self) -> int:
+        rows = self._read("SELECT MAX(id) AS id FROM events")
+        return rows[0]["id"] or 0
+
+    def events_after(self, last_id: int, limit: int = 500) -> List[Dict[str, Any]]:
+        """ID 大于 last_id 的事件 (按写入顺序)"""
+        rows = self._read(
+            "SELECT id, node, type, data FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+        )
+        for row in rows:
+            row["data"] = json.loads(row["data"] or "{}")
+        return rows
+
+    def purge_events(self, before: float):
+        def op(conn):
+            conn.execute("DELETE FROM events WHERE ts < ?", (before,))
+        self._write(op)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+job_store = JobStore(
+    lease_seconds=config.get("jobs.lease_seconds", 30),
+    busy_timeout=config.get("jobs.busy_timeout", 10),
+    node_retention=config.get("jobs.node_retention", 7 * 86400),
+    auto_resume=config.get("jobs.auto_resume", True),
+)
@@ -0,0 +1,177 @@
+"""
+结构化日志存储
+日志记录 (时间、级别、书籍、章节、事件、耗时) 批量写入独立的 SQLite 库 (logs.db)，
+与业务库分离避免写入争用；按时间保留，支持按条件检索
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import DB_DIR, config
+
+LOG_DB_PATH = DB_DIR / "logs.db"
+
+# 日志级别数值 (与 logging 一致，success 介于 INFO 与 WARNING 之间)
+LEVELS = {"debug": 10, "info": 20, "success": 25, "warning": 30, "error": 40, "critical": 50}
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts REAL NOT NULL,
+        level TEXT NOT NULL,
+        levelno INTEGER NOT NULL,
+        logger TEXT,
+        category TEXT,
+        book TEXT,
+        chapter INTEGER,
+        event TEXT,
+        latency_ms INTEGER,
+        message TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs (ts);
+    CREATE INDEX IF NOT EXISTS idx_logs_book_ts ON logs (book, ts);
+    CREATE INDEX IF NOT EXISTS idx_logs_level_ts ON logs (levelno, ts);
+    CREATE INDEX IF NOT EXISTS idx_logs_event_ts ON logs (event, ts);
+"""
+
+_COLUMNS = ("ts", "level", "levelno", "logger", "category", "book", "chapter", "event", "latency_ms", "message")
+
+
+class LogStore:
+    """日志库读写 (写入由日志写入线程独占一个连接，查询每次使用独立连接)"""
+
+    def __init__(self, path=LOG_DB_PATH, retention_days: float = 7):
+        self.path = path
+        self.retention_days = retention_days
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def write_many(self, records: List[Dict[str, Any]]):
+        """批量写入 (单个事务)"""
+        if not records:
+            return
+        with self._lock:
+            if self._write_conn is None:
+                self._write_conn = self._connect()
+            self._write_conn.executemany(
+                f"INSERT INTO logs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [tuple(record.get(col) for col in _COLUMNS) for record in records]
+            )
+            self._write_conn.commit()
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """删除超过保留期的记录，返回删除条数"""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        with self._lock:
+            if self._write_conn is None:
+                self._write_conn = self._connect()
+            deleted = self._write_conn.execute("DELETE FROM logs WHERE ts < ?", (cutoff,)).rowcount
+            self._write_conn.commit()
+        return deleted
+
+    def search(self, book: Optional[str] = None, chapter: Optional[int] = None, level: Optional[str] = None,
+               event: Optional[str] = None, category: Optional[str] = None, q: Optional[str] = None,
+               since: Optional[float] = None, until: Optional[float] = None,
+               before_id: Optional[int] = None, limit: int = 200) -> List[Dict[str, Any]]:
+        """按条件检索，按时间倒序返回 (before_id 用于向前翻页)"""
+        clauses, params = [], []
+        for column, value in (("book", book), ("chapter", chapter), ("event", event), ("category", category)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if level:
+            clauses.append("levelno >= ?")
+            params.append(LEVELS.get(level.lower(), 0))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        if q:
+            clauses.append("message LIKE ?")
+            params.append(f"%{q}%")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        if not self.path.exists():
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT id, {', '.join(_COLUMNS)} FROM logs {where} ORDER BY ts DESC, id DESC LIMIT ?",
+                (*params, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+
+
+class LogStoreHandler(logging.Handler):
+    """
+    写入日志库的 handler
+    emit 只追加到缓冲区，flush (日志写入线程每批结束时调用) 时一次性写入；每小时清理一次过期记录
+    """
+
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, store: LogStore, level=logging.NOTSET):
+        super().__init__(level)
+        self.store = store
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_purge = 0.0
+
+    def emit(self, record: logging.LogRecord):
+        self._buffer.append({
+            "ts": record.created,
+            "level": record.levelname.lower(),
+            "levelno": record.levelno,
+            "logger": record.name,
+            "category": getattr(record, "category", None),
+            "book": getattr(record, "book", None),
+            "chapter": getattr(record, "chapter", None),
+            "event": getattr(record, "event", None),
+            "latency_ms": getattr(record, "latency_ms", None),
+            "message": record.getMessage(),
+        })
+
+    def flush(self):
+        buffer, self._buffer = self._buffer, []
+        try:
+            self.store.write_many(buffer)
+            now = time.time()
+            if now - self._last_purge > self.PURGE_INTERVAL:
+                self._last_purge = now
+                self.store.purge(now)
+        except Exception:
+            # 日志库不可用时不影响其他输出
+            pass
+
+    def close(self):
+        self.flush()
+        self.store.close()
+        super().close()
+
+
+log_store = LogStore(retention_days=config.get("logging.store_retention_days", 7))
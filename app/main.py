@@ -1,14 +1,20 @@
 
+from app.core import startup_profile
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 import pathlib
 import asyncio
+startup_profile.mark("fastapi")
 
-from app.api.api import api_router
 # Ensure dirs created
 from app.core.config import APP_DATA_DIR, CACHE_DIR
+startup_profile.mark("config")
+
+from app.api.api import api_router
+startup_profile.mark("routers")
 
 app = FastAPI(title="NovelVoice - AI Audiobook Generator")
 
@@ -46,38 +52,101 @@ async def startup_event():
     # 初始化日志系统
     from app.core.logger import setup_logger
     setup_logger()
+    startup_profile.mark("logger")
     
     import logging
-    logging.info("🚀 NovelVoice 启动完成")
 
-    # [Patch] Startup Reset: 清理残留的临时打包文件
-    try:
-        from app.core.config import EXPORT_DIR
-        if EXPORT_DIR.exists():
-            cleaned_count = 0
-            for temp_file in EXPORT_DIR.glob("*_temp.zip"):
-                try:
-                    temp_file.unlink()
-                    cleaned_count += 1
-                except Exception as e:
-                    logging.error(f"Failed to clean temp file {temp_file}: {e}")
-            if cleaned_count > 0:
-                logging.info(f"🧹 Startup: Cleaned {cleaned_count} interrupted packing tasks.")
-    except Exception as e:
-        logging.error(f"Startup cleanup failed: {e}")
-    
+    # 配置文件监视 (修改后自动重载并通知运行中的任务)
+    from app.core.config import CONFIG_WATCH_INTERVAL, config
+    app.state.config_watcher = None
+    if CONFIG_WATCH_INTERVAL and CONFIG_WATCH_INTERVAL > 0:
+        app.state.config_watcher = asyncio.create_task(config.watch(CONFIG_WATCH_INTERVAL))
+
+    # 创建共享 HTTP 连接池 (Bark 推送、版本检查)
+    from app.services.http_client import http_client
+    await http_client.start()
+
     # 后台检查版本更新
     asyncio.create_task(check_version_on_startup())
+
+    # 后台回填旧章节的音频时长索引
+    asyncio.create_task(backfill_audio_index_on_startup())
     
     # 启动日志广播
     from app.core.log_manager import log_manager
     asyncio.create_task(log_manager.start_broadcasting())
 
+    # 任务心跳 (续租、应用其他进程写入的暂停/取消标记、同步并发数)
+    from app.services.job_control import job_control
+    job_control.start()
+
+    # 转发其他进程的事件与日志: external 模式下任务全部由合成进程执行；
+    # embedded 模式下其他节点也可能领取任务或协助合成 (worker.join_running)
+    from app.services.event_relay import event_relay
+    asyncio.create_task(event_relay.relay())
+
+    # 任务执行: 内嵌执行器，或由独立的合成进程执行
+    from app.core.config import WORKER_MODE
+    if WORKER_MODE == "external":
+        logging.info("⚙️ 任务由独立的合成进程执行 (python -m app.worker)，本进程只负责入队与查询")
+    else:
+        from app.services.job_runner import job_runner
+        job_runner.clean_interrupted_packs()
+        asyncio.create_task(job_runner.run())
+
+    startup_profile.mark("startup_event")
+    logging.info(f"🚀 NovelVoice 启动完成，耗时 {startup_profile.format_summary()}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭事件"""
+    # 停止配置文件监视
+    watcher = getattr(app.state, "config_watcher", None)
+    if watcher:
+        watcher.cancel()
+
+    # 内嵌执行器排空: 不再开始新章节，进行中的章节最多再合成 shutdown_grace_seconds 秒，未完成的任务交还队列
+    from app.core.config import WORKER_MODE, config
+    if WORKER_MODE != "external":
+        from app.services.job_runner import job_runner
+        await job_runner.drain(config.get("worker.shutdown_grace_seconds", 20))
+
+    # 停止任务心跳 (仍未交还的任务在租约过期后由其他进程回收)
+    from app.services.job_control import job_control
+    await job_control.stop()
+
+    # 发出排队中的通知后关闭发件箱 (停止后台发送并释放 HTTP 会话)
+    from app.services.notifier import notification_outbox
+    await notification_outbox.flush()
+    await notification_outbox.close()
+
+    # 释放共享 HTTP 连接池
+    from app.services.http_client import http_client
+    await http_client.close()
+
+    # 提交业务连接上未提交的写入
+    from app.db.database import db
+    db.commit()
+
+
+async def backfill_audio_index_on_startup():
+    """启动时回填音频时长索引"""
+    # 与版本检查一样延后执行，避免影响启动速度
+    await asyncio.sleep(3)
+
+    import logging
+    from app.services.audio_index import backfill_audio_index
+    try:
+        await asyncio.to_thread(backfill_audio_index)
+    except Exception as e:
+        logging.error(f"Audio index backfill failed: {e}")
+
 
 async def check_version_on_startup():
     """启动时检查版本"""
     # 延迟 5 秒,避免影响启动速度
     await asyncio.sleep(5)
-    
+
     from app.services.version_checker import version_checker
     await version_checker.check_update("edge-tts")
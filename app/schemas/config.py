@@ -12,6 +12,8 @@ class GenerateRequest(BaseModel):
     book_name: str
     config: TTSConfig
     chapter_ids: Optional[List[int]] = None
+    # 排队优先级，数值越大越先执行 (与打包任务一致)
+    priority: int = 0
 
 class PreviewRequest(BaseModel):
     book_name: str
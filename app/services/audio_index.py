@@ -0,0 +1,71 @@
+"""
+音频索引后台回填
+旧版本生成的章节缺少时长/大小/修改时间时，启动后在后台分批测量并写回，不阻塞启动
+"""
+
+import logging
+import time
+from typing import Set
+
+from app.core.config import APP_DATA_DIR
+from app.core.event_bus import event_bus
+from app.core.mp3_info import measure_duration_ms
+
+logger = logging.getLogger(__name__)
+
+# 每批处理的章节数 (每批单独提交，批间让出 CPU/磁盘)
+BATCH_SIZE = 200
+BATCH_PAUSE = 0.05
+
+
+def backfill_audio_index(batch_size: int = BATCH_SIZE) -> int:
+    """测量索引不完整的已完成章节，返回更新的章节数"""
+    from app.db.database import db
+    cursor = db.get_cursor()
+    last = (0, -1)
+    updated = 0
+    books: Set[str] = set()
+    while True:
+        # 按主键分页，无法测量的章节 (文件缺失/损坏) 不会被重复选中
+        cursor.execute(
+            "SELECT t.book_id, t.chapter_index, t.audio_path, t.audio_bytes, b.name, b.dir_name "
+            "FROM tasks t JOIN books b ON b.id = t.book_id "
+            "WHERE t.status = 'completed' AND t.audio_path IS NOT NULL "
+            "AND (t.audio_duration_ms IS NULL OR t.audio_mtime IS NULL OR coalesce(t.audio_bytes, 0) = 0) "
+            "AND (t.book_id, t.chapter_index) > (?, ?) "
+            "ORDER BY t.book_id, t.chapter_index LIMIT ?",
+            (*last, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last = (rows[-1]['book_id'], rows[-1]['chapter_index'])
+
+        updates = []
+        for row in rows:
+            audio_file = APP_DATA_DIR / row['dir_name'] / row['audio_path']
+            try:
+                file_stat = audio_file.stat()
+            except OSError:
+                continue
+            duration = measure_duration_ms(audio_file)
+            # 大小变化说明文件已被替换，已记录的 CRC 一并作废
+            updates.append((file_stat.st_size, file_stat.st_mtime, duration, file_stat.st_size,
+                            row['book_id'], row['chapter_index']))
+            books.add(row['name'])
+        if updates:
+            cursor.executemany(
+                "UPDATE tasks SET audio_bytes = ?, audio_mtime = ?, audio_duration_ms = ?, "
+                "audio_crc32 = CASE WHEN audio_bytes = ? THEN audio_crc32 END "
+                "WHERE book_id = ? AND chapter_index = ?",
+                updates
+            )
+            db.commit()
+            updated += len(updates)
+        time.sleep(BATCH_PAUSE)
+
+    if updated:
+        logger.info(f"⏱️ 已回填 {updated} 个章节的音频时长索引")
+        for book_name in books:
+            event_bus.publish("book_stats", {"book": book_name, **db.get_book_stats(book_name)})
+    return updated
@@ -0,0 +1,163 @@
+"""
+整本书虚拟音频流
+将按章节顺序排列的 MP3 文件视为一个连续的虚拟文件，通过预先计算的偏移索引
+把 HTTP Range 请求映射到 (文件, 文件内偏移)，无需 ffmpeg 合并、不占额外磁盘空间
+"""
+
+import bisect
+import os
+import pathlib
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 单次读取块大小
+CHUNK_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Range 请求超出虚拟文件范围"""
+
+
+def parse_range(header: Optional[str], total_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 头，返回闭区间 (start, end)
+    无 Range 或格式无法识别时返回 None (按完整内容响应)，越界时抛出 RangeNotSatisfiable
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    # 多段 Range 较少见，按完整内容响应
+    if "," in spec or "-" not in spec:
+        return None
+
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if first == "":
+            # 后缀形式: bytes=-500 表示最后 500 字节
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            start = max(0, total_size - length)
+            end = total_size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else total_size - 1
+    except ValueError:
+        return None
+
+    if start >= total_size or start > end:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, total_size - 1)
+
+
+class VirtualAudioStream:
+    """
+    多个文件拼接而成的只读虚拟文件
+
+    entries: [(path, size, chapter_index, title), ...] 按播放顺序排列
+    """
+
+    def __init__(self, entries: List[Tuple[pathlib.Path, int, int, str]]):
+        self.entries = entries
+        # starts[i] 为第 i 个文件在虚拟流中的起始偏移
+        self.starts: List[int] = []
+        offset = 0
+        for _, size, _, _ in entries:
+            self.starts.append(offset)
+            offset += size
+        self.total_size = offset
+
+    @classmethod
+    def from_files(cls, files: List[Tuple[pathlib.Path, int, str]]) -> "VirtualAudioStream":
+        """由 [(path, chapter_index, title)] 构建索引，跳过不存在或为空的文件"""
+        entries = []
+        for path, chapter_index, title in files:
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            if size > 0:
+                entries.append((path, size, chapter_index, title))
+        return cls(entries)
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        """虚拟偏移 -> (文件序号, 文件内偏移)"""
+        if offset < 0 or offset >= self.total_size:
+            raise RangeNotSatisfiable(offset)
+        idx = bisect.bisect_right(self.starts, offset) - 1
+        return idx, offset - self.starts[idx]
+
+    def chapters(self) -> List[Dict]:
+        """章节偏移表 (供播放器按章节跳转)"""
+        return [
+            {"id": chapter_index, "title": title, "offset": start, "size": size}
+            for (_, size, chapter_index, title), start in zip(self.entries, self.starts)
+        ]
+
+    def parse_range(self, header: Optional[str]) -> Optional[Tuple[int, int]]:
+        return parse_range(header, self.total_size)
+
+    def iter_range(self, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """按块读取虚拟区间 [start, end]，跨文件边界时自动切换到下一个文件"""
+        if self.total_size == 0:
+            return
+        idx, inner = self.locate(start)
+        remaining = end - start + 1
+        while remaining > 0 and idx < len(self.entries):
+            path, size = self.entries[idx][0], self.entries[idx][1]
+            with open(path, "rb") as f:
+                fd = f.fileno()
+                while remaining > 0 and inner < size:
+                    n = min(chunk_size, size - inner, remaining)
+                    chunk = _pread(f, fd, n, inner)
+                    if not chunk:
+                        # 文件在索引建立后被截断，提前结束
+                        return
+                    yield chunk
+                    inner += len(chunk)
+                    remaining -= len(chunk)
+            idx += 1
+            inner = 0
+
+
+def _pread(f, fd: int, n: int, offset: int) -> bytes:
+    """
+    按偏移读取 (支持 os.pread 的平台上不移动文件指针)
+
+    这里不是零拷贝: ASGI 应用拿不到 socket，无法调用 sendfile；Starlette 的 FileResponse 只在服务器支持
+    http.response.pathsend 扩展时整文件零拷贝发送 (uvicorn 不支持)，Range 请求同样是读入内存后发送。
+    因此每块经 os.pread 读取一次 (无 seek、不共享文件指针)，块大小 CHUNK_SIZE 摊薄系统调用开销
+    """
+    if hasattr(os, "pread"):
+        return os.pread(fd, n, offset)
+    f.seek(offset)
+    return f.read(n)
+
+
+class StreamIndexCache:
+    """
+    每本书的偏移索引缓存
+    以数据库版本号为键，章节完成/清理后自动失效
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[int, VirtualAudioStream]] = {}
+
+    def get(self, book_name: str, revision: int) -> Optional[VirtualAudioStream]:
+        with self._lock:
+            cached = self._cache.get(book_name)
+        if cached and cached[0] == revision:
+            return cached[1]
+        return None
+
+    def put(self, book_name: str, revision: int, stream: VirtualAudioStream):
+        with self._lock:
+            self._cache[book_name] = (revision, stream)
+
+    def invalidate(self, book_name: str):
+        with self._lock:
+            self._cache.pop(book_name, None)
+
+
+stream_index_cache = StreamIndexCache()
@@ -0,0 +1,158 @@
+"""
+单文件有声书导出
+按帧拼接各章节 MP3 (不重新编码、不依赖 ffmpeg)，并写入 ID3v2.3 章节标记 (CTOC/CHAP)，
+播放器可直接按章节跳转
+
+标签中所有字段均为定长 (时间/偏移各 4 字节)，长度只取决于标题，
+因此先写入占位标签、拼接音频后再原位回填真实的章节时间与偏移，只需一次顺序写入
+"""
+
+import logging
+import os
+import pathlib
+import struct
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from app.core.mp3_info import scan_file
+
+logger = logging.getLogger(__name__)
+
+# 单个 CTOC 最多 255 个子项，超出时分组为二级目录
+_CTOC_MAX_ENTRIES = 255
+_NO_OFFSET = 0xFFFFFFFF
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ChapterMark:
+    """导出文件中的一个章节"""
+    element_id: str
+    title: str
+    start_ms: int = 0
+    end_ms: int = 0
+    start_offset: int = 0
+    end_offset: int = 0
+
+
+# ==================== ID3v2.3 编码 ====================
+
+def _syncsafe(n: int) -> bytes:
+    return bytes(((n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F))
+
+
+def _frame(frame_id: str, payload: bytes) -> bytes:
+    return frame_id.encode("ascii") + struct.pack(">IH", len(payload), 0) + payload
+
+
+def _text_frame(frame_id: str, text: str) -> bytes:
+    # 编码 1: 带 BOM 的 UTF-16，兼容中文标题
+    return _frame(frame_id, b"\x01\xff\xfe" + text.encode("utf-16-le"))
+
+
+def _offset(n: int) -> int:
+    return n if n < _NO_OFFSET else _NO_OFFSET
+
+
+def _chap_frame(mark: ChapterMark) -> bytes:
+    payload = (
+        mark.element_id.encode("ascii") + b"\x00"
+        + struct.pack(">IIII", mark.start_ms, mark.end_ms, _offset(mark.start_offset), _offset(mark.end_offset))
+        + _text_frame("TIT2", mark.title)
+    )
+    return _frame("CHAP", payload)
+
+
+def _ctoc_frame(element_id: str, children: List[str], top_level: bool, title: Optional[str] = None) -> bytes:
+    flags = 0x01 | (0x02 if top_level else 0)  # 有序 (+ 顶层)
+    payload = (
+        element_id.encode("ascii") + b"\x00" + bytes((flags, len(children)))
+        + b"".join(child.encode("ascii") + b"\x00" for child in children)
+    )
+    if title:
+        payload += _text_frame("TIT2", title)
+    return _frame("CTOC", payload)
+
+
+def build_chapter_tag(title: str, marks: List[ChapterMark]) -> bytes:
+    """生成包含书名与章节目录的 ID3v2.3 标签"""
+    frames = [_text_frame("TIT2", title), _text_frame("TALB", title)]
+    ids = [mark.element_id for mark in marks]
+    if len(ids) <= _CTOC_MAX_ENTRIES:
+        frames.append(_ctoc_frame("toc", ids, top_level=True, title=title))
+    else:
+        groups = [ids[i:i + _CTOC_MAX_ENTRIES] for i in range(0, len(ids), _CTOC_MAX_ENTRIES)]
+        group_ids = [f"toc{n}" for n in range(1, len(groups) + 1)]
+        frames.append(_ctoc_frame("toc", group_ids, top_level=True, title=title))
+        for group_id, group in zip(group_ids, groups):
+            frames.append(_ctoc_frame(group_id, group, top_level=False))
+    frames.extend(_chap_frame(mark) for mark in marks)
+
+    body = b"".join(frames)
+    return b"ID3" + bytes((3, 0, 0)) + _syncsafe(len(body)) + body
+
+
+# ==================== 拼接 ====================
+
+def export_audiobook(output_path: pathlib.Path, title: str, chapters: List[Tuple[pathlib.Path, str]],
+                     on_chapter: Optional[Callable[[int, int], None]] = None,
+                     on_write: Optional[Callable[[int], None]] = None) -> List[ChapterMark]:
+    """
+    将 [(mp3 路径, 章节标题)] 按顺序拼接为带章节标记的单个 MP3
+
+    on_chapter(done, total): 每完成一个章节回调 (可抛出异常中止导出)
+    on_write(nbytes): 每写出一块数据回调 (用于限速)
+    先写入同目录临时文件，完成后原子替换；失败时删除临时文件
+    """
+    marks = [ChapterMark(f"ch{i}", chapter_title) for i, (_, chapter_title) in enumerate(chapters, 1)]
+    tag_len = len(build_chapter_tag(title, marks))
+    temp_path = output_path.with_name(output_path.name + ".part")
+
+    try:
+        with open(temp_path, "wb") as out:
+            out.write(b"\x00" * tag_len)
+            offset = tag_len
+            samples_total = 0
+            sample_rate = None
+            for i, ((path, _), mark) in enumerate(zip(chapters, marks), 1):
+                scan = scan_file(path)
+                if not scan.frames:
+                    logger.warning(f"⚠️ 跳过无有效音频帧的文件: {path.name}")
+                if sample_rate is None and scan.sample_rate:
+                    sample_rate = scan.sample_rate
+                elif scan.sample_rate and scan.sample_rate != sample_rate:
+                    logger.warning(f"⚠️ {path.name} 采样率 {scan.sample_rate}Hz 与前文 {sample_rate}Hz 不一致，部分播放器可能无法无缝播放")
+
+                # 章节时间按累计采样数换算，避免逐章取整误差累积
+                mark.start_offset = offset
+                mark.start_ms = samples_total * 1000 // sample_rate if sample_rate else 0
+                with open(path, "rb") as src:
+                    for start, end in scan.segments:
+                        src.seek(start)
+                        remaining = end - start
+                        while remaining > 0:
+                            chunk = src.read(min(CHUNK_SIZE, remaining))
+                            if not chunk:
+                                break
+                            out.write(chunk)
+                            remaining -= len(chunk)
+                            offset += len(chunk)
+                            if on_write:
+                                on_write(len(chunk))
+                if scan.sample_rate:
+                    samples_total += scan.samples * sample_rate // scan.sample_rate
+                mark.end_offset = offset
+                mark.end_ms = samples_total * 1000 // sample_rate if sample_rate else 0
+                if on_chapter:
+                    on_chapter(i, len(chapters))
+
+            # 回填真实章节时间与偏移 (标签长度不变)
+            tag = build_chapter_tag(title, marks)
+            assert len(tag) == tag_len
+            out.seek(0)
+            out.write(tag)
+        os.replace(temp_path, output_path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return marks
@@ -60,6 +60,7 @@ class BookProcessor:
         # 这里演示直接存 DB
         
         from app.db.database import db
+        from app.core.config import CHUNK_SIZE
         safe_book_name = self._sanitize_path(self.book_name).strip()
         
         try:
@@ -70,18 +71,31 @@ class BookProcessor:
                 
             cursor = conn.cursor()
             
+            # 书籍记录 (整数 ID + 源文件元数据与导入参数)
+            source_stat = self.file_path.stat()
+            book_id = db.ensure_book(
+                safe_book_name,
+                dir_name=book_dir.name,
+                source_file=self.filename,
+                source_size=source_stat.st_size,
+                source_mtime=source_stat.st_mtime,
+                import_params={
+                    "parser": self.file_path.suffix.lower().lstrip("."),
+                    "chunk_size": CHUNK_SIZE
+                }
+            )
+
             # 检查是否已存在，如果存在则跳过或覆盖？
             # 简单起见，如果书籍已存在，应该先清理旧记录或只有增量更新
             # 这里假设重新导入是全量覆盖
-            cursor.execute("DELETE FROM tasks WHERE book_name = ?", (safe_book_name,))
+            cursor.execute("DELETE FROM tasks WHERE book_id = ?", (book_id,))
             
             # 批量插入
             data_to_insert = []
             for t in tasks:
                 # task struct: {'id': 1, 'title': '...', 'content': '...', 'status': 'pending'}
                 data_to_insert.append((
-                    f"{safe_book_name}_{t['id']}", # task_id (unique string)
-                    safe_book_name,
+                    book_id,
                     t['id'],
                     t['title'],
                     t['content'],
@@ -90,8 +104,8 @@ class BookProcessor:
                 ))
                 
             cursor.executemany("""
-                INSERT INTO tasks (id, book_name, chapter_index, title, content, status, audio_path)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO tasks (book_id, chapter_index, title, content, status, audio_path)
+                VALUES (?, ?, ?, ?, ?, ?)
             """, data_to_insert)
             
             conn.commit()
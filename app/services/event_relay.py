@@ -0,0 +1,111 @@
+"""
+跨进程事件转发
+独立合成进程 (worker.mode: external) 中发布的进度事件与日志不在 API 进程的事件总线上:
+
+- 合成进程: forward() 把事件总线与日志广播的输出放入队列，由后台线程批量写入 events 表
+- API 进程: relay() 轮询 events 表，把新事件重新发布到本进程的事件总线 (SSE) 与日志广播 (WebSocket)
+
+events 表只保留最近 retention_seconds 秒的记录，由写入方定期清理
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import config
+from app.core.event_bus import event_bus
+from app.db.jobs import job_store
+
+logger = logging.getLogger(__name__)
+
+# 日志批次在 events 表中的类型名
+LOG_EVENT = "_logs"
+# 写入线程单批最多处理的事件数 / 接收端单次读取的事件数
+_BATCH_SIZE = 200
+_RELAY_BATCH = 500
+_STOP = object()
+
+
+class EventRelay:
+
+    def __init__(self, poll_interval: float = 0.5, retention_seconds: float = 600):
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+
+    # ==================== 发送端 (合成进程) ====================
+
+    def forward(self):
+        """把本进程的事件与日志转发到 events 表 (幂等)"""
+        if self._thread is not None:
+            return
+        from app.core.log_manager import log_manager
+
+        event_bus.add_sink(lambda event_type, data: self._queue.put((event_type, data)))
+        log_manager.add_sink(lambda batch: self._queue.put((LOG_EVENT, {"entries": batch})))
+        self._thread = threading.Thread(target=self._writer, name="event-forwarder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """写完队列中剩余的事件后退出"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            events = [item for item in batch if item is not _STOP]
+            try:
+                if events:
+                    job_store.append_events(events)
+                now = time.time()
+                if now - self._last_purge > 60:
+                    self._last_purge = now
+                    job_store.purge_events(now - self.retention_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ 事件转发失败 ({len(events)} 条): {e}")
+            if stop:
+                return
+
+    # ==================== 接收端 (API 进程) ====================
+
+    async def relay(self):
+        """轮询 events 表并重新发布 (从启动时的最新事件之后开始)"""
+        from app.core.log_manager import log_manager
+
+        last_id = await asyncio.to_thread(job_store.last_event_id)
+        while True:
+            try:
+                rows: List[Dict[str, Any]] = await asyncio.to_thread(job_store.events_after, last_id, _RELAY_BATCH)
+                for row in rows:
+                    last_id = row["id"]
+                    if row["type"] == LOG_EVENT:
+                        log_manager.publish_remote(row["data"].get("entries", []))
+                    else:
+                        event_bus.publish(row["type"], row["data"])
+                if len(rows) == _RELAY_BATCH:
+                    # 积压较多时不等待，继续读取
+                    continue
+            except Exception as e:
+                logger.warning(f"⚠️ 读取转发事件失败: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+event_relay = EventRelay(
+    poll_interval=config.get("worker.event_poll_interval", 0.5),
+    retention_seconds=config.get("worker.event_retention", 600),
+)
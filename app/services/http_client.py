@@ -0,0 +1,69 @@
+"""
+共享 HTTP 客户端
+应用级的单个 aiohttp 会话 (进程启动时创建、关闭时释放)，所有对外请求 (Bark 推送、版本检查) 复用同一连接池：
+总连接数与单主机连接数受限，DNS 解析结果缓存，默认带连接/总超时
+"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Optional
+
+from app.core.config import config
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """共享 aiohttp 会话的持有者"""
+
+    def __init__(self, limit: int = 20, limit_per_host: int = 5, dns_cache_ttl: int = 300,
+                 connect_timeout: float = 5, total_timeout: float = 15):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.connect_timeout = connect_timeout
+        self.total_timeout = total_timeout
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """创建会话 (幂等)"""
+        await self.get_session()
+
+    async def get_session(self) -> "aiohttp.ClientSession":
+        """获取共享会话；尚未创建或已关闭时重新创建"""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        # aiohttp 导入较慢，延迟到创建会话时加载
+        import aiohttp
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout),
+                )
+                logger.debug(f"🌐 HTTP 连接池已创建 (总连接 {self.limit}, 单主机 {self.limit_per_host})")
+        return self._session
+
+    async def close(self):
+        """关闭会话与连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+http_client = HttpClient(
+    limit=config.get("http.pool_size", 20),
+    limit_per_host=config.get("http.pool_size_per_host", 5),
+    dns_cache_ttl=config.get("http.dns_cache_ttl", 300),
+    connect_timeout=config.get("http.connect_timeout", 5),
+    total_timeout=config.get("http.timeout", 15),
+)
@@ -0,0 +1,171 @@
+"""
+任务控制
+本进程持有的任务 (合成、打包) 登记在这里，后台心跳协程定期:
+
+- 为这些任务及其认领的章节续租，并写入正在处理的章节 (供其他进程的状态查询)
+- 读取其他进程写入的暂停/取消标记并在本地应用
+- 同步全局并发数 (meta.concurrency)
+
+接口层的暂停/恢复/停止/取消打包都经由这里: 写入任务表，任务在本进程时立即生效，
+在其他进程时由其下一次心跳应用，尚未被领取的任务直接取消
+"""
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.core.config import config
+from app.core.event_bus import event_bus
+from app.core.state import state
+from app.db.jobs import job_store
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobHandle:
+    """本进程持有的任务"""
+    job_id: int
+    book: str
+    kind: str
+    processor: Any = None
+    cancel_event: Optional[threading.Event] = None
+    # 协助其他节点执行的合成任务 (任务本身不归本进程持有)
+    joined: bool = False
+
+
+class JobControl:
+
+    def __init__(self, heartbeat_interval: float = 2.0):
+        self.heartbeat_interval = heartbeat_interval
+        self.handles: Dict[int, JobHandle] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    # ==================== 本地登记 ====================
+
+    def register(self, handle: JobHandle):
+        self.handles[handle.job_id] = handle
+
+    def unregister(self, job_id: int):
+        self.handles.pop(job_id, None)
+
+    def local(self, book: str, kind: str) -> Optional[JobHandle]:
+        for handle in list(self.handles.values()):
+            if handle.book == book and handle.kind == kind:
+                return handle
+        return None
+
+    # ==================== 心跳 ====================
+
+    def start(self):
+        """启动心跳协程 (幂等，需在事件循环中调用)"""
+        if self._task is None or self._task.done():
+            state.concurrency = job_store.get_concurrency(state.concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.beat()
+            except Exception as e:
+                logger.warning(f"⚠️ 任务心跳失败: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def beat(self):
+        handles = list(self.handles.values())
+        current = {
+            handle.job_id: sorted(handle.processor.processing_chapters)
+            for handle in handles if handle.processor is not None and not handle.joined
+        }
+        joined = [handle.job_id for handle in handles if handle.joined]
+        flags = await asyncio.to_thread(job_store.heartbeat, current, joined)
+        concurrency = await asyncio.to_thread(job_store.get_concurrency, state.concurrency)
+        if concurrency != state.concurrency:
+            state.concurrency = concurrency
+            for handle in list(self.handles.values()):
+                if handle.processor is not None:
+                    await handle.processor.semaphore.refresh()
+        for row in flags:
+            handle = self.handles.get(row["id"])
+            if handle:
+                self._apply(handle, row)
+
+    def _apply(self, handle: JobHandle, row: Dict[str, Any]):
+        """应用任务表中的控制标记"""
+        processor = handle.processor
+        # 协助的任务已被其持有节点停止
+        if row["cancel_requested"] or (handle.joined and row["status"] == "cancelled"):
+            if processor is not None and not processor.cancelled:
+                processor.cancel()
+            elif handle.cancel_event is not None:
+                handle.cancel_event.set()
+            return
+        if processor is not None:
+            paused = not processor.pause_event.is_set()
+            if row["paused"] and not paused:
+                processor.pause()
+            elif not row["paused"] and paused:
+                processor.resume()
+
+    # ==================== 合成任务控制 ====================
+
+    def set_paused(self, book: str, paused: bool) -> bool:
+        """暂停/恢复合成任务 (含排队中的任务)，任务不存在时返回 False"""
+        if not job_store.set_paused(book, paused):
+            return False
+        handle = self.local(book, "tts")
+        if handle and handle.processor is not None:
+            handle.processor.pause() if paused else handle.processor.resume()
+        else:
+            event_bus.publish("task_state", {"book": book, "status": "paused" if paused else "processing"})
+        return True
+
+    def stop_task(self, book: str) -> bool:
+        """停止合成任务 (进行中的章节完成后结束)，任务不存在时返回 False"""
+        result = job_store.cancel(book)
+        if result is None:
+            return False
+        handle = self.local(book, "tts")
+        if handle and handle.processor is not None:
+            handle.processor.cancel()
+        elif result == "cancelled":
+            event_bus.publish("task_state", {"book": book, "status": "idle"})
+        return True
+
+    def set_concurrency(self, limit: int):
+        job_store.set_concurrency(limit)
+        state.concurrency = limit
+
+    # ==================== 打包任务控制 ====================
+
+    def pack_status(self, job: Optional[Dict[str, Any]]) -> Optional[str]:
+        """打包任务在书籍状态中的显示: queued / packing / cancelling"""
+        if not job:
+            return None
+        if job["cancel_requested"]:
+            return "cancelling"
+        return "packing" if job["status"] == "running" else "queued"
+
+    def cancel_pack(self, book: str) -> Optional[str]:
+        """
+        取消打包任务，返回 cancelled (排队中，已移除) / cancelling (执行中，等待中止)；
+        没有打包任务时返回 None
+        """
+        result = job_store.cancel(book, "pack")
+        if result == "cancelled":
+            event_bus.publish("pack_finished", {"book": book, "status": "cancelled"})
+        elif result == "cancelling":
+            handle = self.local(book, "pack")
+            if handle and handle.cancel_event is not None:
+                handle.cancel_event.set()
+        return result
+
+
+job_control = JobControl(heartbeat_interval=config.get("jobs.heartbeat_interval", 2))
@@ -0,0 +1,327 @@
+"""
+任务执行器
+从任务表领取合成与打包任务并在本进程执行:
+
+- worker.mode 为 embedded (默认) 时内嵌在 API 进程中运行，与单进程部署行为一致
+- external 时由独立的合成进程 (python -m app.worker) 运行，API 进程只负责入队与查询状态
+
+多个执行进程 (可在不同主机上，共享数据目录) 同时运行时，空闲的进程会协助合成其他进程执行中的书籍，
+章节经 tasks 表的租约认领，不会重复合成 (worker.join_running)
+
+进程退出时 drain() 排空: 停止领取、等待进行中的章节完成 (worker.shutdown_grace_seconds)，
+超时后中止剩余章节，未完成的任务交还队列由下一个执行进程继续
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import APP_DATA_DIR, BARK_ENABLED, BARK_SERVER_URL, BARK_API_KEY, WEB_BASE_URL, config
+from app.core.event_bus import event_bus
+from app.core.state import state
+from app.db.database import db
+from app.db.jobs import job_store
+from app.services.job_control import JobHandle, job_control
+from app.services.pack_queue import pack_queue
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+
+    def __init__(self, poll_interval: float = 1.0, max_jobs: int = 4, join_running: bool = True):
+        self.poll_interval = poll_interval
+        # 同时执行的合成任务 (书籍) 数，章节并发仍由全局并发数控制
+        self.max_jobs = max(1, int(max_jobs))
+        self.join_running = join_running
+        # 排空中 (进程即将退出): 不再领取任务
+        self.draining = False
+        # 排空期间交还队列的任务 (书名)
+        self._requeued: List[str] = []
+        self.tasks: Dict[int, asyncio.Task] = {}
+        # 打包任务处理函数: action -> func(book_name, params, cancel_event)
+        self.pack_handlers: Dict[str, Callable[[str, Dict[str, Any], threading.Event], Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def clean_interrupted_packs(self):
+        """清理上次退出时残留的临时打包文件 (启动执行器前调用)"""
+        from app.core.config import EXPORT_DIR
+        try:
+            if EXPORT_DIR.exists():
+                cleaned_count = 0
+                for temp_file in EXPORT_DIR.glob("*_temp.zip"):
+                    try:
+                        temp_file.unlink()
+                        cleaned_count += 1
+                    except Exception as e:
+                        logger.error(f"Failed to clean temp file {temp_file}: {e}")
+                if cleaned_count > 0:
+                    logger.info(f"🧹 Startup: Cleaned {cleaned_count} interrupted packing tasks.")
+        except Exception as e:
+            logger.error(f"Startup cleanup failed: {e}")
+
+    def pack_handler(self, action: str):
+        """注册打包任务处理函数 (装饰器)"""
+        def decorator(func):
+            self.pack_handlers[action] = func
+            return func
+        return decorator
+
+    def wake(self):
+        """有任务入队或结束时立即尝试领取 (线程安全，执行器未运行时忽略)"""
+        if self._loop is not None and self._wakeup is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+    async def run(self):
+        """领取循环: 被唤醒或每隔 poll_interval 秒领取一次"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(job_store.register_node)
+        recovered = await asyncio.to_thread(job_store.recover)
+        if recovered["jobs"] or recovered["chapters"]:
+            logger.info(f"♻️ 恢复上次退出时中断的任务: {recovered['jobs']} 个合成任务重新排队，"
+                        f"{recovered['chapters']} 个章节退回待合成")
+        logger.info(f"⚙️ 任务执行器已启动 (节点 {job_store.worker_id}，最多 {self.max_jobs} 个合成任务)")
+        while not self.draining:
+            self._wakeup.clear()
+            try:
+                await self._claim_available()
+            except Exception as e:
+                logger.warning(f"⚠️ 领取任务失败: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim_available(self):
+        while len(self.tasks) < self.max_jobs and not self.draining:
+            job = await asyncio.to_thread(job_store.claim, "tts")
+            if not job:
+                break
+            self.tasks[job["id"]] = asyncio.create_task(self._run_tts(job))
+        # 没有排队的任务时协助其他节点 (每轮最多加入一本)
+        if self.join_running and len(self.tasks) < self.max_jobs and not self.draining:
+            job = await asyncio.to_thread(job_store.joinable, list(self.tasks))
+            if job:
+                self.tasks[job["id"]] = asyncio.create_task(self._run_tts(job, joined=True))
+        while pack_queue.has_capacity() and not self.draining:
+            job = await asyncio.to_thread(job_store.claim, "pack")
+            if not job:
+                break
+            await self._start_pack(job)
+
+    # ==================== 合成任务 ====================
+
+    async def _run_tts(self, job: Dict[str, Any], joined: bool = False):
+        """
+        执行合成任务；joined 为 True 时协助其他节点执行的任务: 只合成未被认领的待合成章节，
+        不发送通知、不结束任务 (由持有任务的节点结束)
+        """
+        from app.services.notifier import BarkNotifier
+        from app.services.tts_engine import TTSProcessor
+
+        book_name = job["book"]
+        params = job["params"]
+        tts_config = params.get("config") or {}
+        chapter_ids = params.get("chapter_ids")
+        job_status, job_message = "failed", None
+        processor = None
+        try:
+            # 音频目录以 books.dir_name 为准 (导入时可能与书名不同)
+            dir_name = await asyncio.to_thread(db.get_book_dir_name, book_name)
+            book_dir = APP_DATA_DIR / (dir_name or f"{book_name}_audio")
+            if not book_dir.exists():
+                logger.error(f"Directory not found for {book_name}")
+                job_message = "Book directory not found"
+                return
+
+            # Initialize Bark Notifier with configuration
+            notifier = None if joined else BarkNotifier(
+                server_url=BARK_SERVER_URL,
+                api_key=BARK_API_KEY,
+                enabled=BARK_ENABLED,
+                web_base_url=WEB_BASE_URL,
+                silent_hours_config=config.get_section("bark.silent_hours"),
+                http_timeout=config.get("bark.http_timeout", 5)
+            )
+
+            processor = TTSProcessor(
+                str(book_dir),
+                voice=tts_config.get("voice", "zh-CN-XiaoxiaoNeural"),
+                rate=tts_config.get("rate", "+0%"),
+                volume=tts_config.get("volume", "+0%"),
+                pitch=tts_config.get("pitch", "+0Hz"),
+                concurrency_limit=lambda: state.concurrency,
+                notifier=notifier
+            )
+            # 入队后、领取前被暂停的任务以暂停状态开始
+            if job["paused"]:
+                processor.pause_event.clear()
+
+            state.active_processors[book_name] = processor
+            job_control.register(JobHandle(job["id"], book_name, "tts", processor=processor, joined=joined))
+            if joined:
+                logger.info(f"🤝 协助合成 {book_name} (任务 {job['id']}，节点 {job['owner']})")
+            else:
+                event_bus.publish("task_state", {"book": book_name, "status": "paused" if job["paused"] else "processing"})
+
+            ids_str = [str(i) for i in chapter_ids] if chapter_ids else None
+            logger.info(f"Starting TTS task for {book_name} with voice {processor.voice}")
+            await processor.process(chapter_ids=ids_str, assist=joined)
+            if processor.cancelled:
+                job_status = "cancelled"
+            else:
+                job_status = "requeue" if processor.drained else "completed"
+
+        except asyncio.CancelledError:
+            # 排空超时被中止
+            job_status = "requeue"
+            raise
+        except Exception as e:
+            logger.error(f"Error processing {book_name}: {e}", exc_info=True)
+            job_message = str(e)
+        finally:
+            if state.active_processors.get(book_name) is processor:
+                state.active_processors.pop(book_name, None)
+            job_control.unregister(job["id"])
+            if not joined and job_status == "requeue":
+                await asyncio.to_thread(job_store.requeue_job, job["id"])
+                self._requeued.append(book_name)
+            elif not joined:
+                await asyncio.to_thread(job_store.finish_job, job["id"], job_status, job_message)
+            self.tasks.pop(job["id"], None)
+            if not joined:
+                event_bus.publish("task_state", {"book": book_name, "status": "idle"})
+            self.wake()
+
+    # ==================== 打包任务 ====================
+
+    async def _start_pack(self, job: Dict[str, Any]):
+        params = job["params"]
+        handler = self.pack_handlers.get(params.get("action"))
+        if handler is None:
+            logger.error(f"❌ 未知的打包任务类型: {params.get('action')}")
+            await asyncio.to_thread(job_store.finish_job, job["id"], "failed",
+                                    f"Unknown pack action: {params.get('action')}")
+            return
+        cancel_event = threading.Event()
+        job_control.register(JobHandle(job["id"], job["book"], "pack", cancel_event=cancel_event))
+        pack_queue.submit(self._run_pack, job, handler, cancel_event)
+
+    def _run_pack(self, job: Dict[str, Any], handler: Callable, cancel_event: threading.Event):
+        """打包线程中执行 (处理函数抛出异常即为失败，取消时正常返回)"""
+        event_bus.publish("task_state", {"book": job["book"], "kind": "pack", "status": "packing"})
+        event_bus.publish("pack_queue", job_store.queue_snapshot("pack"))
+        job_status, job_message = "completed", None
+        try:
+            handler(job["book"], job["params"], cancel_event)
+        except Exception as e:
+            job_status, job_message = "failed", str(e)
+            event_bus.publish("pack_finished", {"book": job["book"], "status": "failed", "error": job_message,
+                                                "kind": job["params"].get("action")})
+        finally:
+            if cancel_event.is_set() and self.draining:
+                # 排空超时被中止的打包任务交还队列
+                job_store.requeue_job(job["id"])
+                self._requeued.append(job["book"])
+            else:
+                job_store.finish_job(job["id"], "cancelled" if cancel_event.is_set() else job_status, job_message)
+            job_control.unregister(job["id"])
+            event_bus.publish("pack_queue", job_store.queue_snapshot("pack"))
+            self.wake()
+
+    # ==================== 排空 ====================
+
+    async def drain(self, grace: float) -> Dict[str, Any]:
+        """
+        进程退出前排空: 停止领取任务与开始新章节，最多等待 grace 秒让进行中的章节与打包完成，
+        超时后中止剩余工作 (章节退回待合成，长文本已完成的分段保留)；
+        未完成的任务重新排队 (jobs.auto_resume) 或标记为中断。返回排空摘要 (同时写入日志并发布 worker_drained 事件)
+        """
+        self.draining = True
+        self.wake()
+        started = time.monotonic()
+        handles = list(job_control.handles.values())
+        processors = [handle.processor for handle in handles if handle.processor is not None]
+        in_flight = sum(len(processor.in_flight) for processor in processors)
+        finished_before = sum(processor.finished_count for processor in processors)
+        packs = sum(1 for handle in handles if handle.kind == "pack")
+        if processors or packs:
+            logger.info(f"⏳ 正在排空: {in_flight} 个章节合成中、{packs} 个打包任务，最多等待 {grace:g}s")
+        for processor in processors:
+            processor.drain()
+
+        # 等待合成任务 (不再开始新章节) 与打包线程结束
+        deadline = started + grace
+        tasks = list(self.tasks.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+        while self._running_packs() and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+
+        # 超时: 中止剩余工作并等待其释放章节、交还任务
+        aborted = sum(len(processor.in_flight) for processor in processors)
+        aborted_packs = 0
+        remaining = [task for task in self.tasks.values() if not task.done()]
+        for task in remaining:
+            task.cancel()
+        for handle in self._running_packs():
+            handle.cancel_event.set()
+            aborted_packs += 1
+        if remaining:
+            await asyncio.wait(remaining, timeout=10)
+        wait_until = time.monotonic() + 10
+        while self._running_packs() and time.monotonic() < wait_until:
+            await asyncio.sleep(0.2)
+
+        summary = {
+            "node": job_store.worker_id,
+            "grace_seconds": grace,
+            "elapsed_seconds": round(time.monotonic() - started, 1),
+            "chapters_in_flight": in_flight,
+            "chapters_finished": sum(processor.finished_count for processor in processors) - finished_before,
+            "chapters_aborted": aborted,
+            "packs_aborted": aborted_packs,
+            "requeued": list(self._requeued),
+        }
+        if not (processors or packs):
+            return summary
+        logger.info(
+            f"🛑 排空完成 ({summary['elapsed_seconds']}s): 进行中的 {in_flight} 个章节完成 "
+            f"{summary['chapters_finished']} 个、中止 {aborted} 个 (退回待合成，分段进度保留)，"
+            f"中止打包 {aborted_packs} 个，{len(self._requeued)} 个任务交还队列"
+        )
+        event_bus.publish("worker_drained", summary)
+        return summary
+
+    def _running_packs(self) -> List[JobHandle]:
+        return [handle for handle in list(job_control.handles.values())
+                if handle.kind == "pack" and handle.cancel_event is not None]
+
+
+job_runner = JobRunner(
+    poll_interval=config.get("worker.poll_interval", 1),
+    max_jobs=config.get("worker.max_jobs", 4),
+    join_running=config.get("worker.join_running", True),
+)
+
+
+# 随本模块注册 (API 进程经路由、合成进程启动时即导入)，首个合成任务开始前的重载同样生效
+@config.subscribe
+async def apply_config_to_processors(changes: Dict[str, Any]):
+    """配置重载后同步全局并发数，并通知所有运行中的任务"""
+    if "tts" in changes:
+        old_limit = (changes["tts"].get("old") or {}).get("concurrency_limit")
+        new_limit = config.get("tts.concurrency_limit", 2)
+        if new_limit != old_limit and isinstance(new_limit, int) and new_limit >= 1:
+            state.concurrency = new_limit
+            # 写入共享设置，其他进程经心跳同步
+            await asyncio.to_thread(job_store.set_concurrency, new_limit)
+    for processor in list(state.active_processors.values()):
+        await processor.apply_config(changes)
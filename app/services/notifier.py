@@ -1,11 +1,19 @@
 
-import aiohttp
 import asyncio
-from typing import Optional
+import time as time_module
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
 from datetime import datetime, time
 import os
 import logging
 
+from app.core.config import config
+from app.services.http_client import http_client
+
+if TYPE_CHECKING:
+    import aiohttp
+
 logger = logging.getLogger(__name__)
 
 class BarkNotifier:
@@ -54,24 +62,30 @@ class BarkNotifier:
             return now >= self.silent_start or now <= self.silent_end
         return self.silent_start <= now <= self.silent_end
     
-    async def send(
+    def send(
         self, 
         title: str, 
         content: str, 
         group: Optional[str] = None,
-        url: Optional[str] = None
+        url: Optional[str] = None,
+        digest_key: Optional[str] = None,
+        digest_summary: Optional[str] = None,
+        digest_item: Optional[str] = None
     ) -> bool:
         """
-        发送 Bark 通知
+        将 Bark 通知放入发件箱 (立即返回，由后台发送协程投递)
         
         Args:
             title: 通知标题
             content: 通知内容
             group: 分组名称（用于折叠通知）
             url: 点击跳转的 URL
+            digest_key: 摘要键，窗口期内相同键的通知合并为一条
+            digest_summary: 合并后的内容模板 (可含 {count})
+            digest_item: 合并时列出的条目
             
         Returns:
-            bool: 是否发送成功
+            bool: 是否已入队 (未启用、静默时段或重复时为 False)
         """
         if not self.enabled:
             return False
@@ -79,7 +93,17 @@ class BarkNotifier:
         if self.is_silent_period():
             logger.info(f"[Bark] 静默时间段，跳过推送: {title}")
             return False
-        
+
+        return notification_outbox.put(Notification(
+            notifier=self, title=title, content=content, group=group, url=url,
+            digest_key=digest_key, digest_summary=digest_summary, digest_item=digest_item
+        ))
+
+    async def deliver(self, session: "aiohttp.ClientSession", title: str, content: str,
+                      group: Optional[str] = None, url: Optional[str] = None) -> Tuple[bool, bool]:
+        """
+        实际发送一条通知，返回 (是否成功, 是否值得重试)
+        """
         try:
             # 构建 Bark URL
             # 格式: https://api.day.app/{key}/{title}/{content}?group=xxx&url=xxx
@@ -91,58 +115,62 @@ class BarkNotifier:
             if url:
                 params['url'] = url
             
-            # 发送异步请求（使用配置的超时时间）
+            # 使用配置的超时时间
+            import aiohttp
             timeout = aiohttp.ClientTimeout(total=self.http_timeout)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(bark_url, params=params) as resp:
-                    if resp.status == 200:
-                        logger.info(f"[Bark] ✅ 推送成功: {title}")
-                        return True
-                    else:
-                        logger.warning(f"[Bark] ❌ 推送失败 (HTTP {resp.status}): {title}")
-                        return False
+            async with session.get(bark_url, params=params, timeout=timeout) as resp:
+                if resp.status == 200:
+                    logger.info(f"[Bark] ✅ 推送成功: {title}")
+                    return True, False
+                else:
+                    logger.warning(f"[Bark] ❌ 推送失败 (HTTP {resp.status}): {title}")
+                    # 4xx 多为配置错误，重试无意义
+                    return False, resp.status >= 500 or resp.status == 429
                         
         except asyncio.TimeoutError:
             logger.warning(f"[Bark] ⏱️ 推送超时（不影响主流程）: {title}")
-            return False
+            return False, True
         except Exception as e:
             logger.error(f"[Bark] ⚠️ 推送异常（不影响主流程）: {e}")
-            return False
+            return False, True
     
-    async def send_task_start(self, book_name: str, total_chapters: int) -> bool:
+    def send_task_start(self, book_name: str, total_chapters: int) -> bool:
         """任务开始通知"""
-        return await self.send(
+        return self.send(
             title="📚 任务开始",
             content=f"《{book_name}》已加入队列，共 {total_chapters} 章",
             group=book_name,
             url=f"{self.web_base_url}/#book={book_name}"
         )
     
-    async def send_task_complete(self, book_name: str, elapsed_minutes: float) -> bool:
+    def send_task_complete(self, book_name: str, elapsed_minutes: float) -> bool:
         """任务完成通知"""
-        return await self.send(
+        return self.send(
             title="✅ 生成完成",
             content=f"《{book_name}》已完成！耗时 {elapsed_minutes:.0f} 分钟",
             group=book_name,
             url=f"{self.web_base_url}/#book={book_name}"
         )
     
-    async def send_task_error(self, book_name: str, chapter_id: int, error_msg: str = "") -> bool:
-        """任务错误通知"""
+    def send_task_error(self, book_name: str, chapter_id: int, error_msg: str = "") -> bool:
+        """任务错误通知 (同一本书短时间内的多个失败合并为一条)"""
         msg = f"《{book_name}》章节 {chapter_id} 重试失败"
         if error_msg:
             msg += f": {error_msg}"
-        return await self.send(
+        return self.send(
             title="⚠️ 生成失败",
             content=msg,
             group=book_name,
-            url=f"{self.web_base_url}/#book={book_name}"
+            url=f"{self.web_base_url}/#book={book_name}",
+            digest_key=f"error:{self.api_key}:{book_name}",
+            digest_summary=f"《{book_name}》{{count}} 个章节重试失败",
+            digest_item=str(chapter_id)
         )
     
-    async def send_task_progress(self, book_name: str, completed: int, total: int) -> bool:
+    def send_task_progress(self, book_name: str, completed: int, total: int) -> bool:
         """任务进度通知（可选）"""
         progress = int(completed / total * 100)
-        return await self.send(
+        return self.send(
             title="📊 进度更新",
             content=f"《{book_name}》已完成 {progress}% ({completed}/{total})",
             group=book_name,
@@ -150,9 +178,172 @@ class BarkNotifier:
         )
     
     async def send_test(self) -> bool:
-        """发送测试通知"""
-        return await self.send(
+        """发送测试通知 (直接发送，不经过发件箱，以便返回结果)"""
+        if not self.enabled:
+            return False
+        session = await http_client.get_session()
+        ok, _ = await self.deliver(
+            session,
             title="🔔 测试通知",
             content="Bark 配置正确，推送服务正常！",
             url=self.web_base_url
         )
+        return ok
+
+
+@dataclass
+class Notification:
+    """发件箱中的一条通知"""
+    notifier: BarkNotifier
+    title: str
+    content: str
+    group: Optional[str] = None
+    url: Optional[str] = None
+    digest_key: Optional[str] = None
+    digest_summary: Optional[str] = None
+    digest_item: Optional[str] = None
+    attempts: int = 0
+    not_before: float = 0.0
+    created_at: float = field(default_factory=time_module.monotonic)
+
+    @property
+    def key(self) -> tuple:
+        return (self.notifier.server_url, self.notifier.api_key, self.title, self.content)
+
+
+class NotificationOutbox:
+    """
+    通知发件箱
+    合成流程只负责入队，后台协程通过共享 HTTP 客户端投递；
+    失败按指数退避重试，重复通知去重；同一摘要键 (如同一本书的章节失败) 的首条通知立即发送，
+    其后窗口期内的通知在窗口结束时合并为一条
+    """
+
+    def __init__(self, max_retries: int = 3, dedup_window: float = 60, digest_window: float = 30,
+                 queue_size: int = 200, retry_backoff: float = 2):
+        self.max_retries = max_retries
+        self.dedup_window = dedup_window
+        self.digest_window = digest_window
+        # 第 n 次重试前等待 retry_backoff * 2^(n-1) 秒
+        self.retry_backoff = retry_backoff
+        self._queue: Deque[Notification] = deque(maxlen=queue_size)
+        # 摘要键 -> 窗口开始时间 / 窗口内暂缓发送的通知
+        self._digest_started: Dict[str, float] = {}
+        self._digests: Dict[str, List[Notification]] = {}
+        self._recent: Dict[tuple, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._delivering = False
+
+    def put(self, note: Notification) -> bool:
+        """入队 (需在事件循环中调用)，重复通知返回 False"""
+        now = time_module.monotonic()
+        self._prune_recent(now)
+        self._collect_digests(now)
+        if note.key in self._recent or any(pending.key == note.key for pending in self._queue):
+            logger.debug(f"[Bark] 重复通知已忽略: {note.title}")
+            return False
+        if note.digest_key and note.digest_key in self._digest_started:
+            self._digests.setdefault(note.digest_key, []).append(note)
+        else:
+            if note.digest_key:
+                self._digest_started[note.digest_key] = now
+            self._queue.append(note)
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def _prune_recent(self, now: float):
+        for key, sent_at in list(self._recent.items()):
+            if now - sent_at >= self.dedup_window:
+                del self._recent[key]
+
+    def _collect_digests(self, now: float, force: bool = False):
+        """摘要窗口到期后，窗口内暂缓的通知合并为一条放入发送队列"""
+        for digest_key, started in list(self._digest_started.items()):
+            if not force and now - started < self.digest_window:
+                continue
+            del self._digest_started[digest_key]
+            notes = self._digests.pop(digest_key, None)
+            if not notes:
+                continue
+            if len(notes) == 1:
+                self._queue.append(notes[0])
+                continue
+            first = notes[0]
+            items = [n.digest_item for n in notes if n.digest_item]
+            listed = ", ".join(items[:10]) + (" …" if len(items) > 10 else "")
+            summary = (first.digest_summary or first.title).format(count=len(notes))
+            self._queue.append(Notification(
+                notifier=first.notifier, title=first.title,
+                content=f"{summary}: {listed}" if listed else summary,
+                group=first.group, url=first.url
+            ))
+
+    def _next_deadline(self, now: float) -> Optional[float]:
+        deadlines = [n.not_before for n in self._queue]
+        deadlines += [self._digest_started[key] + self.digest_window for key in self._digests]
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    async def _run(self):
+        while True:
+            now = time_module.monotonic()
+            self._collect_digests(now)
+            note = next((n for n in self._queue if n.not_before <= now), None)
+            if note is None:
+                self._wakeup.clear()
+                timeout = self._next_deadline(now)
+                if timeout is None and not self._queue and not self._digests:
+                    await self._wakeup.wait()
+                else:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+
+            self._queue.remove(note)
+            self._delivering = True
+            try:
+                session = await http_client.get_session()
+                ok, retryable = await note.notifier.deliver(session, note.title, note.content, note.group, note.url)
+            finally:
+                self._delivering = False
+            if ok:
+                self._recent[note.key] = time_module.monotonic()
+            elif retryable and note.attempts < self.max_retries:
+                note.attempts += 1
+                delay = self.retry_backoff * 2 ** (note.attempts - 1)
+                note.not_before = time_module.monotonic() + delay
+                self._queue.append(note)
+                logger.info(f"[Bark] {delay:g}s 后重试 ({note.attempts}/{self.max_retries}): {note.title}")
+
+    async def flush(self, timeout: float = 5):
+        """立即发出排队中的通知 (含未到摘要窗口的通知，不再等待重试间隔)，最多等待 timeout 秒"""
+        self._collect_digests(time_module.monotonic(), force=True)
+        if not self._queue and not self._delivering:
+            return
+        for note in self._queue:
+            note.not_before = 0.0
+        self._ensure_worker()
+        deadline = time_module.monotonic() + timeout
+        while (self._queue or self._delivering) and time_module.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    async def close(self):
+        """停止发送协程 (未发出的通知丢弃，需要送达时先调用 flush)"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+notification_outbox = NotificationOutbox(
+    max_retries=config.get("bark.max_retries", 3),
+    dedup_window=config.get("bark.dedup_window", 60),
+    digest_window=config.get("bark.digest_window", 30),
+)
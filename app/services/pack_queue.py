@@ -0,0 +1,99 @@
+"""
+打包任务队列
+独立的打包线程池 (数量可配置)，不再占用 FastAPI 共享线程池；跨书籍的排队与优先级由任务表负责
+(见 app.db.jobs)，任务执行器仅在有空闲线程时领取打包任务并交给线程池执行；
+打包读写按令牌桶限速，避免与 TTS 合成争抢磁盘
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Tuple
+
+from app.core.config import config
+from app.core.state import state
+
+logger = logging.getLogger(__name__)
+
+
+class IOThrottle:
+    """
+    令牌桶限速 (所有打包线程共享)
+    busy_only 为真时仅在有 TTS 任务运行时限速
+    """
+
+    def __init__(self, rate_mb: float, busy_only: bool = True):
+        self.rate = max(0.0, rate_mb) * 1024 * 1024
+        self.busy_only = busy_only
+        self._lock = threading.Lock()
+        self._allowance = self.rate
+        self._last = time.monotonic()
+
+    def consume(self, nbytes: int):
+        if self.rate <= 0 or (self.busy_only and not state.active_processors):
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+            self._last = now
+            self._allowance -= nbytes
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class PackQueue:
+    """打包线程池 (领取顺序由任务表决定，这里只按提交顺序交给空闲线程)"""
+
+    def __init__(self, workers: int = 1, io_limit_mb: float = 0, throttle_busy_only: bool = True):
+        self.workers = max(1, int(workers))
+        self.throttle = IOThrottle(io_limit_mb, throttle_busy_only)
+        self._pending: Deque[Tuple[Callable[..., Any], tuple]] = deque()
+        self._running = 0
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """启动打包线程 (幂等)"""
+        with self._cond:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f"pack-worker-{len(self._threads) + 1}", daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    def submit(self, func: Callable[..., Any], *args):
+        """交给空闲的打包线程执行 func(*args)"""
+        self.start()
+        with self._cond:
+            self._pending.append((func, args))
+            self._cond.notify()
+
+    def has_capacity(self) -> bool:
+        """是否有空闲的打包线程 (任务执行器据此从任务表领取打包任务)"""
+        with self._cond:
+            return self._running + len(self._pending) < self.workers
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                func, args = self._pending.popleft()
+                self._running += 1
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"❌ 打包任务异常: {e}", exc_info=True)
+            finally:
+                with self._cond:
+                    self._running -= 1
+
+
+pack_queue = PackQueue(
+    workers=config.get("packing.workers", 1),
+    io_limit_mb=config.get("packing.io_limit_mb", 50),
+    throttle_busy_only=config.get("packing.throttle_busy_only", True),
+)
@@ -1,7 +1,4 @@
 import pathlib
-import ebooklib
-from ebooklib import epub
-from bs4 import BeautifulSoup
 from typing import List, Dict, Any, Optional
 from .base import BaseParser
 import logging
@@ -13,6 +10,11 @@ class EpubParser(BaseParser):
         """
         Parse EPUB using structural metadata (Spine + TOC) to ensure correct ordering.
         """
+        # ebooklib / bs4 导入较慢，延迟到首次解析时加载
+        import ebooklib
+        from ebooklib import epub
+        from bs4 import BeautifulSoup
+
         tasks = []
         try:
             book = epub.read_epub(str(file_path))
@@ -95,6 +97,7 @@ class EpubParser(BaseParser):
 
     def _flatten_toc(self, toc, parent_title: Optional[str] = None) -> Dict[str, str]:
         """Flatten nested TOC to a dict of {href: title}."""
+        from ebooklib import epub
         mapping = {}
         for node in toc:
             # node can be epub.Link or tuple/list
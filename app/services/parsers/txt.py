@@ -1,6 +1,5 @@
 import re
 import pathlib
-import chardet
 from typing import List, Dict, Any
 from .base import BaseParser
 
@@ -95,6 +94,7 @@ class TxtParser(BaseParser):
     def _detect_encoding(self, file_path: pathlib.Path) -> str:
         with open(file_path, 'rb') as f:
             rawdata = f.read(20000)
+        import chardet
         result = chardet.detect(rawdata)
         encoding = result['encoding']
         return encoding if encoding else 'utf-8'
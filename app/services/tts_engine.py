@@ -1,14 +1,27 @@
 
 import asyncio
+import glob
+import hashlib
 import json
 import os
 import pathlib
+import socket
 import math
+import time
 import aiofiles
-import edge_tts
 from typing import List, Dict, Any, Optional, Union, Callable
 import logging
 
+from app.core.config import config
+from app.core.mp3_info import measure_duration_ms
+from app.db.jobs import job_store
+from app.services.zip_stream import file_crc32
+
+def _temp_path(path: pathlib.Path) -> pathlib.Path:
+    """同目录下的临时文件 (含主机名与 PID，共享目录的多个节点互不冲突)"""
+    return path.with_name(f".{path.name}.{socket.gethostname()}-{os.getpid()}.tmp")
+
+
 class DynamicSemaphore:
     """支持动态调整限制的信号量"""
     def __init__(self, limit_provider: Union[int, Callable[[], int]]):
@@ -27,6 +40,11 @@ class DynamicSemaphore:
             self.current_count -= 1
             self.condition.notify_all()
 
+    async def refresh(self):
+        """限制变化后唤醒等待者重新检查 (调大限制时无需等到有章节完成)"""
+        async with self.condition:
+            self.condition.notify_all()
+
 class TTSProcessor:
     def __init__(self, book_dir: str, voice: str = "zh-CN-XiaoxiaoNeural", 
                  rate: str = "+0%", volume: str = "+0%", pitch: str = "+0Hz",
@@ -36,6 +54,7 @@ class TTSProcessor:
                  timeout: Optional[int] = None,
                  max_logs: Optional[int] = None):
         self.book_dir = pathlib.Path(book_dir)
+        self.book_name = self.book_dir.name.replace("_audio", "")
 
         # 移除 tasks.json 相关初始化
         # self.tasks_file = self.book_dir / "tasks.json" # DELETED
@@ -93,6 +112,11 @@ class TTSProcessor:
         self.volume = clean_param(volume, "%")
         self.pitch = clean_param(pitch, "Hz")
         
+        # 显式传入的参数不随配置热更新
+        self._fixed = {name for name, value in
+                       (("max_chars", max_chars), ("timeout", timeout), ("max_logs", max_logs))
+                       if value is not None}
+
         # 长文本阈值（从配置读取）
         from app.core.config import MAX_CHARS
         self.max_chars = max_chars if max_chars is not None else MAX_CHARS
@@ -108,9 +132,20 @@ class TTSProcessor:
         # 暂停控制 (默认运行)
         self.pause_event = asyncio.Event()
         self.pause_event.set()
+
+        # 停止控制 (已开始的章节完成后结束，未开始的章节跳过)
+        self.cancelled = False
+        # 进程退出前排空: 同样不再开始新章节，但任务随后重新排队; drained 表示确有章节因此未处理
+        self.draining = False
+        self.drained = False
         
         # 状态追踪
         self.processing_chapters = set()
+        # 本轮因其他节点正在合成而跳过的章节 (process 结束前等待其完成或租约过期)
+        self.claimed_elsewhere = set()
+        # 已认领、正在合成的章节号，及写回结果的章节数 (排空时统计)
+        self.in_flight = set()
+        self.finished_count = 0
         
         # Bark 通知服务
         self.notifier = notifier
@@ -123,8 +158,31 @@ class TTSProcessor:
         self.logs = deque(maxlen=log_limit)
         
         self.logger = logging.getLogger("app.tts")
+
+    async def apply_config(self, changes: Dict[str, Any]):
+        """
+        配置重载后更新运行中任务的参数 (进行中的章节不受影响，后续章节使用新值)
+        """
+        from app.core import config as app_config
+        updated = []
+        if "tts" in changes:
+            if "max_chars" not in self._fixed and self.max_chars != app_config.MAX_CHARS:
+                self.max_chars = app_config.MAX_CHARS
+                updated.append(f"max_chars={self.max_chars}")
+            if "timeout" not in self._fixed and self.timeout != app_config.TTS_TIMEOUT:
+                self.timeout = app_config.TTS_TIMEOUT
+                updated.append(f"timeout={self.timeout}s")
+        if "logging" in changes and "max_logs" not in self._fixed and self.logs.maxlen != app_config.MAX_LOGS:
+            from collections import deque
+            self.logs = deque(self.logs, maxlen=app_config.MAX_LOGS)
+            updated.append(f"max_logs={app_config.MAX_LOGS}")
+        # 并发上限由 limit_provider 动态读取，这里只需唤醒等待者
+        await self.semaphore.refresh()
+        if updated:
+            self.log(f"配置已热更新: {', '.join(updated)}")
         
-    def log(self, message: str, level: str = "INFO"):
+    def log(self, message: str, level: str = "INFO", chapter: Optional[int] = None,
+            event: Optional[str] = None, latency_ms: Optional[int] = None):
         from datetime import datetime
         timestamp = datetime.now().strftime("%H:%M:%S")
         
@@ -133,41 +191,64 @@ class TTSProcessor:
         
         log_msg = f"[{self.book_dir.name}] {message}"
         
+        # 附带书籍归属等结构化字段，供 /ws/logs 订阅过滤与日志库检索
+        extra = {"book": self.book_name, "category": "tts", "chapter": chapter, "event": event, "latency_ms": latency_ms}
         level = level.upper()
         if level == "ERROR":
-            self.logger.error(log_msg)
+            self.logger.error(log_msg, extra=extra)
         elif level == "WARNING":
-            self.logger.warning(log_msg)
+            self.logger.warning(log_msg, extra=extra)
         elif level == "DEBUG":
-            self.logger.debug(log_msg)
+            self.logger.debug(log_msg, extra=extra)
         else:
-            self.logger.info(log_msg)
+            self.logger.info(log_msg, extra=extra)
         
     def pause(self):
+        from app.core.event_bus import event_bus
         self.log("任务暂停...")
         self.pause_event.clear()
+        event_bus.publish("task_state", {"book": self.book_name, "status": "paused"})
         
     def resume(self):
+        from app.core.event_bus import event_bus
         self.log("任务恢复...")
         self.pause_event.set()
+        event_bus.publish("task_state", {"book": self.book_name, "status": "processing"})
 
-    async def process(self, chapter_ids: Optional[List[str]] = None):
-        """主处理流程"""
-        
-        # 确保开始时是运行状态
-        if not self.pause_event.is_set():
-            self.pause_event.set()
+    def cancel(self):
+        from app.core.event_bus import event_bus
+        self.log("任务停止: 进行中的章节完成后结束...")
+        self.cancelled = True
+        # 唤醒暂停中的等待者，使其直接跳过
+        self.pause_event.set()
+        event_bus.publish("task_state", {"book": self.book_name, "status": "stopping"})
 
+    def drain(self):
+        """进程退出前排空: 不再开始新章节，进行中的章节继续完成"""
+        self.log("进程即将退出: 不再开始新章节，等待进行中的章节完成...")
+        self.draining = True
+        # 唤醒暂停中的等待者，使其直接返回
+        self.pause_event.set()
+
+    async def process(self, chapter_ids: Optional[List[str]] = None, assist: bool = False):
+        """
+        主处理流程
+
+        Args:
+            chapter_ids: 只处理这些章节 (默认全部)
+            assist: 协助其他节点合成，只处理待合成的章节，不等待其他节点的章节、不发送通知
+        """
+        
         # 读取任务 (从数据库)
         # 注意：这里我们使用同步的 database.py，为了不阻塞主循环，应该放到 thread pool 或者使用 aiosqlite
         # 既然前面 pip install aiosqlite 失败，我们先用 to_thread + sqlite3
         from app.db.database import db
         
-        book_name = self.book_dir.name.replace("_audio", "")
+        book_name = self.book_name
         
         def fetch_tasks():
             cursor = db.get_cursor()
-            query = "SELECT * FROM tasks WHERE book_name = ? ORDER BY chapter_index"
+            query = "SELECT * FROM tasks WHERE book_id = (SELECT id FROM books WHERE name = ?) ORDER BY chapter_index"
             cursor.execute(query, (book_name,))
             return [dict(row) for row in cursor.fetchall()]
             
@@ -177,13 +258,15 @@ class TTSProcessor:
         if chapter_ids:
             tasks = [t for t in tasks if str(t.get("chapter_index")) in map(str, chapter_ids)]
             self.log(f"筛选处理: {len(tasks)} 个章节")
+        if assist:
+            tasks = [t for t in tasks if t.get("status") == "pending"]
             
-        self.log(f"开始处理书籍: {book_name}, 共 {len(tasks)} 个章节")
+        self.log(f"开始处理书籍: {book_name}, 共 {len(tasks)} 个章节", event="book_started")
         self.log(f"参数: Voice={self.voice}, Rate={self.rate}, Volume={self.volume}, Pitch={self.pitch}")
 
-        # 📱 Bark 通知: 任务开始
-        if self.notifier:
-            await self.notifier.send_task_start(book_name, len(tasks))
+        # 📱 Bark 通知: 任务开始 (仅入队，由发件箱后台发送)
+        if self.notifier and not assist:
+            self.notifier.send_task_start(book_name, len(tasks))
         
         import time
         start_time = time.time()
@@ -193,27 +276,68 @@ class TTSProcessor:
         # 但我们使用 thread pool + 单连接或 WAL 模式应该还好
         coroutines = [self._process_task_wrapper(task) for task in tasks]
         await asyncio.gather(*coroutines)
-        
+
+        # 多节点协作: 其他节点认领的章节完成 (或租约过期后由本节点接手) 前不结束任务
+        retry_interval = config.get("jobs.claim_retry_interval", 5)
+        while self.claimed_elsewhere and not self.cancelled and not self.draining and not assist:
+            waiting = [t for t in tasks if t.get("chapter_index") in self.claimed_elsewhere]
+            self.claimed_elsewhere.clear()
+            await asyncio.sleep(retry_interval)
+            await asyncio.gather(*[self._process_task_wrapper(task) for task in waiting])
+
+        if self.drained:
+            self.log(f"书籍 {book_name} 因进程退出中断，剩余章节稍后继续。", event="book_drained")
+            return
+
+        if assist:
+            self.log(f"书籍 {book_name} 协助合成结束。")
+            return
+
+        if self.cancelled:
+            self.log(f"书籍 {book_name} 任务已停止。", event="book_stopped")
+            return
+
         elapsed_minutes = (time.time() - start_time) / 60
         if self.notifier:
-            await self.notifier.send_task_complete(book_name, elapsed_minutes)
+            self.notifier.send_task_complete(book_name, elapsed_minutes)
         
-        self.log(f"书籍 {book_name} 处理完成。")
+        self.log(f"书籍 {book_name} 处理完成。", event="book_finished")
 
     async def _process_task_wrapper(self, task: Dict[str, Any]):
         """任务包装器"""
+        from app.core.event_bus import event_bus
+
         await self.pause_event.wait()
+        if self.cancelled:
+            return
+        if self.draining:
+            self.drained = True
+            return
         
         title = task.get("title", "Unknown")
+        chapter = task.get("chapter_index")
         self.processing_chapters.add(title)
         try:
             updated_task = await self._synthesize_chapter(task)
             if updated_task:
-                await self._update_task_status_in_db(updated_task)
+                stats = await self._update_task_status_in_db(updated_task)
+                self.finished_count += 1
+                event_type = "chapter_completed" if updated_task["status"] == "completed" else "chapter_failed"
+                event_bus.publish(event_type, {
+                    "book": self.book_name,
+                    "chapter": chapter,
+                    "title": title,
+                    "audio_bytes": updated_task.get("audio_bytes", 0)
+                })
+                event_bus.publish("book_stats", {"book": self.book_name, **stats})
+                # 📱 Bark 通知: 章节失败 (同一本书短时间内的失败合并为一条)
+                if event_type == "chapter_failed" and self.notifier:
+                    self.notifier.send_task_error(self.book_name, chapter)
         finally:
             self.processing_chapters.discard(title)
 
-    async def _update_task_status_in_db(self, task: Dict[str, Any]):
+    async def _update_task_status_in_db(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """写回章节状态，返回更新后的书籍统计"""
         from app.db.database import db
         
         def update_db():
@@ -222,22 +346,27 @@ class TTSProcessor:
                 db.connect()
                 conn = db.conn
             cursor = conn.cursor()
+            # 写回结果的同时释放章节认领
             cursor.execute("""
                 UPDATE tasks 
-                SET status = ?, audio_path = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (task['status'], task.get('audio_path'), task['id']))
+                SET status = ?, audio_path = ?, audio_bytes = ?, audio_mtime = ?, audio_duration_ms = ?,
+                    audio_crc32 = ?, claimed_by = NULL, lease_until = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE book_id = ? AND chapter_index = ?
+            """, (task['status'], task.get('audio_path'), task.get('audio_bytes', 0),
+                  task.get('audio_mtime'), task.get('audio_duration_ms'), task.get('audio_crc32'),
+                  task['book_id'], task['chapter_index']))
             conn.commit()
+            job_store.record_chapter(task['status'] == "completed", len(task.get('content') or ""),
+                                     task.get('audio_bytes', 0), task.get('synth_ms', 0))
+            return db.get_book_stats(self.book_name)
             
-        await asyncio.to_thread(update_db)
+        return await asyncio.to_thread(update_db)
 
     async def _synthesize_chapter(self, task: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """单个章节合成逻辑"""
+        """单个章节合成逻辑 (认领章节后合成)，无需写回时返回 None"""
         # 适配 DB 字段名
-        task_id = task.get("id") # DB id is string "bookname_idx"
         chapter_index = task.get("chapter_index")
         title = task.get("title")
-        content = task.get("content")
         status = task.get("status")
         audio_path_db = task.get("audio_path")
         
@@ -257,75 +386,162 @@ class TTSProcessor:
         # 或者我们强制覆盖
         
         async with self.semaphore:
-            self.log(f"{context_info} 开始合成 (长度: {len(content)})")
-            
+            # 等待并发名额期间任务已停止
+            if self.cancelled:
+                return None
+            if self.draining:
+                self.drained = True
+                return None
+            # 认领章节: 多个节点协作时，章节可能已被其他节点认领或完成
+            claimed = await asyncio.to_thread(job_store.claim_chapter, task["book_id"], chapter_index)
+            if claimed is None:
+                return None
+            if claimed["claimed_by"] != job_store.worker_id:
+                self.claimed_elsewhere.add(chapter_index)
+                return None
+            result = None
+            self.in_flight.add(chapter_index)
             try:
-                if len(content) > self.max_chars:
-                    self.log(f"{context_info} 文本过长，执行切割处理...")
-                    await self._synthesize_long_text(content, output_path, context_info)
-                else:
-                    await self._synthesize_with_retry(content, output_path, context_info)
-                
-                # 3. 更新状态
-                newTask = dict(task) # shallow copy
-                newTask["status"] = "completed"
-                newTask["audio_path"] = str(output_path.name)
-                self.log(f"{context_info} 合成完成: {filename}")
-                return newTask
-                
-            except Exception as e:
-                self.log(f"{context_info} 合成失败: {e!r}", level="ERROR")
-                newTask = dict(task)
-                newTask["status"] = "failed"
-                return newTask
+                if claimed["status"] == "completed" and output_path.exists() and output_path.stat().st_size > 0:
+                    return None
+                result = await self._synthesize_claimed(task, output_path, context_info)
+                return result
+            except asyncio.CancelledError:
+                # 排空超时被中止: 章节退回待合成，长文本已完成的分段保留
+                self.drained = True
+                raise
+            finally:
+                self.in_flight.discard(chapter_index)
+                # 没有结果写回 (跳过或被中断) 时释放认领，章节退回待合成
+                if result is None:
+                    await asyncio.to_thread(job_store.release_chapter, task["book_id"], chapter_index)
+
+    async def _synthesize_claimed(self, task: Dict[str, Any], output_path: pathlib.Path,
+                                  context_info: str) -> Dict[str, Any]:
+        """合成已认领的章节，返回写回数据库的章节记录 (completed / failed)"""
+        from app.core.event_bus import event_bus
+
+        chapter_index = task.get("chapter_index")
+        title = task.get("title")
+        content = task.get("content")
+        filename = output_path.name
+        self.log(f"{context_info} 开始合成 (长度: {len(content)})", chapter=chapter_index, event="chapter_started")
+        started = time.monotonic()
+        event_bus.publish("chapter_started", {"book": self.book_name, "chapter": chapter_index, "title": title})
+        
+        try:
+            if len(content) > self.max_chars:
+                self.log(f"{context_info} 文本过长，执行切割处理...")
+                await self._synthesize_long_text(content, output_path, context_info)
+            else:
+                await self._synthesize_with_retry(content, output_path, context_info)
+            
+            # 3. 更新状态
+            newTask = dict(task) # shallow copy
+            newTask["status"] = "completed"
+            newTask["audio_path"] = str(output_path.name)
+            file_stat = output_path.stat()
+            newTask["audio_bytes"] = file_stat.st_size
+            newTask["audio_mtime"] = file_stat.st_mtime
+            newTask["audio_duration_ms"] = await asyncio.to_thread(measure_duration_ms, output_path)
+            # 流式 ZIP 导出需要 CRC，合成时顺带记录 (文件刚写完，通常仍在页缓存中)
+            newTask["audio_crc32"] = await asyncio.to_thread(file_crc32, output_path)
+            newTask["synth_ms"] = int((time.monotonic() - started) * 1000)
+            self.log(f"{context_info} 合成完成: {filename}", chapter=chapter_index, event="chapter_completed",
+                     latency_ms=newTask["synth_ms"])
+            return newTask
+            
+        except Exception as e:
+            synth_ms = int((time.monotonic() - started) * 1000)
+            self.log(f"{context_info} 合成失败: {e!r}", level="ERROR", chapter=chapter_index, event="chapter_failed",
+                     latency_ms=synth_ms)
+            newTask = dict(task)
+            newTask["synth_ms"] = synth_ms
+            newTask["status"] = "failed"
+            newTask["audio_bytes"] = 0
+            newTask["audio_mtime"] = None
+            newTask["audio_duration_ms"] = None
+            newTask["audio_crc32"] = None
+            return newTask
 
     async def _synthesize_with_retry(self, text: str, output_path: pathlib.Path, context_info: str = "", max_retries: int = 3):
         """带重试的合成 (Timeout + Exponential Backoff)"""
-        for attempt in range(max_retries):
-            try:
-                communicate = edge_tts.Communicate(
-                    text, 
-                    self.voice, 
-                    rate=self.rate, 
-                    volume=self.volume, 
-                    pitch=self.pitch
-                )
-                await asyncio.wait_for(communicate.save(str(output_path)), timeout=self.timeout)
-                
-                if output_path.exists() and output_path.stat().st_size > 0:
-                    return
-                else:
-                    raise Exception("生成的文件为空")
+        # edge_tts (连带 aiohttp) 导入较慢，延迟到首次合成时加载
+        import edge_tts
+        # 先写临时文件再原子替换，其他节点与下载不会读到写了一半的音频
+        temp_path = _temp_path(output_path)
+        try:
+            for attempt in range(max_retries):
+                try:
+                    communicate = edge_tts.Communicate(
+                        text, 
+                        self.voice, 
+                        rate=self.rate, 
+                        volume=self.volume, 
+                        pitch=self.pitch
+                    )
+                    await asyncio.wait_for(communicate.save(str(temp_path)), timeout=self.timeout)
                     
-            except Exception as e:
-                wait_time = 2 * (2 ** attempt) 
-                wait_time = min(wait_time, 30)
-                
-                if attempt < max_retries - 1:
-                    self.log(f"{context_info} 合成重试 ({attempt+1}/{max_retries}) 失败: {e!r}, 等待 {wait_time}s...", level="WARNING")
-                    await asyncio.sleep(wait_time)
-                else:
-                    self.log(f"{context_info} 最终失败: {e!r}", level="ERROR")
-                    raise e
+                    if temp_path.exists() and temp_path.stat().st_size > 0:
+                        os.replace(temp_path, output_path)
+                        return
+                    else:
+                        raise Exception("生成的文件为空")
+                        
+                except Exception as e:
+                    wait_time = 2 * (2 ** attempt) 
+                    wait_time = min(wait_time, 30)
+                    
+                    if attempt < max_retries - 1:
+                        self.log(f"{context_info} 合成重试 ({attempt+1}/{max_retries}) 失败: {e!r}, 等待 {wait_time}s...", level="WARNING")
+                        await asyncio.sleep(wait_time)
+                    else:
+                        self.log(f"{context_info} 最终失败: {e!r}", level="ERROR")
+                        raise e
+        finally:
+            temp_path.unlink(missing_ok=True)
 
     async def _synthesize_long_text(self, text: str, output_path: pathlib.Path, context_info: str = ""):
-        """长文本切割合成并合并"""
+        """
+        长文本切割合成并合并
+        已完成的分段保留到章节完成为止 (检查点): 合成被中断 (进程退出、失败) 后再次合成同一章节时，
+        语音参数与切分结果不变则直接复用已有分段
+        """
         from app.core.text_splitter import TextSplitter
         splitter = TextSplitter()
         chunks = splitter.split_text(text, self.max_chars)
         
         self.log(f"{context_info} 智能切分: {len(text)} 字符 -> {len(chunks)} 片段")
 
-        # 分别合成
-        temp_files = []
+        # 分段文件以 "." 开头且不以 .mp3 结尾，不会被打包或当作章节音频
+        temp_files = [output_path.with_name(f".{output_path.name}.part{i}") for i in range(len(chunks))]
+        manifest = output_path.with_name(f".{output_path.name}.parts.json")
+        signature = hashlib.sha1(json.dumps(
+            [self.voice, self.rate, self.volume, self.pitch, chunks], ensure_ascii=False
+        ).encode("utf-8")).hexdigest()
+        try:
+            reusable = json.loads(manifest.read_text(encoding="utf-8")).get("signature") == signature
+        except (OSError, ValueError):
+            reusable = False
+        if not reusable:
+            for stale in output_path.parent.glob(f".{glob.escape(output_path.name)}.part*"):
+                stale.unlink(missing_ok=True)
+            manifest.write_text(json.dumps({"signature": signature}), encoding="utf-8")
+
         list_file = output_path.with_suffix(".txt")
+        merged_path = _temp_path(output_path)
+        completed = False
         try:
+            # 分别合成 (分段经临时文件原子写入，存在即完整)
+            done = [f.exists() and f.stat().st_size > 0 for f in temp_files]
+            if any(done):
+                self.log(f"{context_info} 复用上次中断前已合成的 {sum(done)}/{len(chunks)} 个片段")
             for i, chunk in enumerate(chunks):
-                temp_file = output_path.with_name(f"{output_path.stem}_part{i}.mp3")
-                temp_files.append(temp_file)
+                if done[i]:
+                    continue
                 # Pass context info with part index
                 part_context = f"{context_info} [Part {i+1}/{len(chunks)}]"
-                await self._synthesize_with_retry(chunk, temp_file, context_info=part_context)
+                await self._synthesize_with_retry(chunk, temp_files[i], context_info=part_context)
             
             # 使用 FFmpeg 合并
             # 1. 生成文件列表内容
@@ -336,9 +552,10 @@ class TTSProcessor:
             # 2. 执行 FFmpeg 命令
             # -y 覆盖已存在文件, -f concat 指定合并模式, -safe 0 允许相对路径
             # -c copy 指直接流拷贝，不重新编码
+            # 输出到临时文件 (扩展名不是 .mp3，需用 -f 指定格式)，完成后原子替换
             cmd = [
                 "ffmpeg", "-y", "-f", "concat", "-safe", "0",
-                "-i", str(list_file), "-c", "copy", str(output_path)
+                "-i", str(list_file), "-c", "copy", "-f", "mp3", str(merged_path)
             ]
             
             self.log(f"{context_info} FFmpeg 合并开始: {output_path.name}")
@@ -347,25 +564,34 @@ class TTSProcessor:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
-            stdout, stderr = await process.communicate()
+            try:
+                stdout, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                raise
             
             if process.returncode != 0:
                 error_msg = stderr.decode().strip()
                 raise Exception(f"FFmpeg 合并失败 (code {process.returncode}): {error_msg}")
+            os.replace(merged_path, output_path)
+            completed = True
             
             self.log(f"{context_info} FFmpeg 合并完成: {output_path.name}")
                         
         finally:
-            # 清理临时文件
-            for f in temp_files:
-                if f.exists():
-                    f.unlink()
+            # 清理临时文件 (分段只在章节完成后清理)
+            if completed:
+                for f in temp_files:
+                    f.unlink(missing_ok=True)
+                manifest.unlink(missing_ok=True)
             if list_file.exists():
                 list_file.unlink()
+            merged_path.unlink(missing_ok=True)
 
     async def preview_speech(self, text: str, max_chars: int = 50) -> bytes:
         """生成预览音频 (仅内存)"""
         import io
+        import edge_tts
         preview_text = text[:max_chars]
         
         communicate = edge_tts.Communicate(
@@ -4,12 +4,13 @@
 """
 
 import asyncio
-import aiohttp
-from typing import Optional, Dict
+import time
+from typing import Optional, Dict, Tuple
 from packaging import version
 import importlib.metadata
 import logging
-from app.core.config import VERSION
+from app.core.config import VERSION, config
+from app.services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -23,13 +24,31 @@ class VersionChecker:
     - 从 PyPI 获取 edge-tts 最新版本
     - 从 GitHub 获取 NovelVoice 最新版本
     - 比较版本并记录更新信息
+    - 远程查询结果按 TTL 缓存 (失败结果缓存较短时间)，前端频繁检查时不会每次访问网络
     """
     
-    def __init__(self):
+    # 查询失败时的缓存时间 (秒)
+    FAILURE_TTL = 300
+
+    def __init__(self, cache_ttl: float = 3600):
         self.update_info: Optional[Dict] = None
         self.app_update_info: Optional[Dict] = None
         self.latest_app_version: Optional[str] = None
         self.checking = False
+        self.cache_ttl = cache_ttl
+        # url -> (过期时间, 版本号)
+        self._cache: Dict[str, Tuple[float, Optional[str]]] = {}
+
+    def _cached(self, url: str) -> Tuple[bool, Optional[str]]:
+        entry = self._cache.get(url)
+        if entry and entry[0] > time.monotonic():
+            return True, entry[1]
+        return False, None
+
+    def _remember(self, url: str, value: Optional[str]) -> Optional[str]:
+        ttl = self.cache_ttl if value else min(self.cache_ttl, self.FAILURE_TTL)
+        self._cache[url] = (time.monotonic() + ttl, value)
+        return value
     
     def get_installed_version(self, package: str) -> Optional[str]:
         """
@@ -49,38 +68,42 @@ class VersionChecker:
     
     async def get_latest_pypi_version(self, package: str) -> Optional[str]:
         """从 PyPI 获取最新版本"""
+        url = f"https://pypi.org/pypi/{package}/json"
+        hit, cached = self._cached(url)
+        if hit:
+            return cached
+        latest = None
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://pypi.org/pypi/{package}/json"
-                timeout = aiohttp.ClientTimeout(total=5)
-                async with session.get(url, timeout=timeout) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        return data['info']['version']
-                    return None
+            session = await http_client.get_session()
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    latest = data['info']['version']
         except Exception as e:
             logger.warning(f"⚠️  获取 {package} PyPI 版本失败: {e}")
-            return None
+        return self._remember(url, latest)
 
     async def get_latest_github_version(self, repo: str) -> Optional[str]:
         """从 GitHub 获取最新 Release 版本"""
+        url = f"https://api.github.com/repos/{repo}/releases/latest"
+        hit, cached = self._cached(url)
+        if hit:
+            return cached
+        latest = None
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"https://api.github.com/repos/{repo}/releases/latest"
-                headers = {"Accept": "application/vnd.github.v3+json"}
-                timeout = aiohttp.ClientTimeout(total=5)
-                async with session.get(url, headers=headers, timeout=timeout) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        tag = data['tag_name']
-                        # 移除 'v' 前缀
-                        if tag.startswith('v'):
-                            tag = tag[1:]
-                        return tag
-                    return None
+            session = await http_client.get_session()
+            headers = {"Accept": "application/vnd.github.v3+json"}
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    tag = data['tag_name']
+                    # 移除 'v' 前缀
+                    if tag.startswith('v'):
+                        tag = tag[1:]
+                    latest = tag
         except Exception as e:
             logger.warning(f"⚠️  获取 {repo} GitHub 版本失败: {e}")
-            return None
+        return self._remember(url, latest)
     
     async def check_update(self, package: str = "edge-tts", repo: str = "skyshenma/NovelVoice"):
         """检查更新"""
@@ -143,4 +166,4 @@ class VersionChecker:
 
 
 # 全局实例
-version_checker = VersionChecker()
+version_checker = VersionChecker(cache_ttl=config.get("http.version_cache_ttl", 3600))
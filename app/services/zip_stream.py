@@ -0,0 +1,228 @@
+"""
+流式 ZIP 生成
+在客户端下载的同时即时生成存储模式 (不压缩) 的 ZIP，不写临时文件
+
+- 条目一律使用数据描述符 (通用标志位 3)，本地文件头与 CRC 无关，可边读边算 CRC
+- 文件名使用 UTF-8 标志 (位 11)
+- 单个条目或偏移超过 4GB 时自动使用 ZIP64 扩展
+- 各部分长度只取决于文件大小与文件名，总长度可预先算出；CRC 已知时整个归档字节确定，
+  因此可以响应 Range 请求 (断点续传)
+"""
+
+import os
+import pathlib
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+# 单次读取块大小
+CHUNK_SIZE = 1024 * 1024
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_FLAGS = 0x0008 | 0x0800  # 数据描述符 + UTF-8 文件名
+
+
+def file_crc32(path: pathlib.Path, chunk_size: int = CHUNK_SIZE) -> int:
+    """计算文件 CRC32"""
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_time, dos_date
+
+
+@dataclass
+class ZipMember:
+    """归档中的一个文件"""
+    path: pathlib.Path
+    arcname: str
+    size: int
+    mtime: float
+    crc32: Optional[int] = None
+    chapter_index: Optional[int] = None
+
+    @property
+    def zip64(self) -> bool:
+        return self.size >= _ZIP64_LIMIT
+
+
+class StreamingZip:
+    """
+    存储模式 ZIP 的虚拟布局
+
+    segments: [(start, length, kind, member_index)]，kind 为 header / data / descriptor / central
+    """
+
+    def __init__(self, members: List[ZipMember]):
+        self.members = members
+        self._arcnames = [m.arcname.encode("utf-8") for m in members]
+        self.segments: List[Tuple[int, int, str, int]] = []
+        self.local_offsets: List[int] = []
+
+        offset = 0
+        for i, member in enumerate(members):
+            self.local_offsets.append(offset)
+            header_len = len(self._local_header(i))
+            descriptor_len = 24 if member.zip64 else 16
+            for kind, length in (("header", header_len), ("data", member.size), ("descriptor", descriptor_len)):
+                self.segments.append((offset, length, kind, i))
+                offset += length
+
+        self.central_offset = offset
+        self.central_size = sum(len(self._central_header(i, crc=0)) for i in range(len(members)))
+        self.segments.append((offset, self.central_size + len(self._end_records()), "central", -1))
+        self.total_size = offset + self.central_size + len(self._end_records())
+
+    # ==================== 各部分编码 ====================
+
+    def _local_header(self, i: int) -> bytes:
+        member = self.members[i]
+        name = self._arcnames[i]
+        dos_time, dos_date = _dos_datetime(member.mtime)
+        extra = b""
+        version = 20
+        if member.zip64:
+            # 大小记录在数据描述符中，这里只声明 ZIP64
+            extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+            version = 45
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, version, _FLAGS, 0, dos_time, dos_date,
+            0, 0xFFFFFFFF if member.zip64 else 0, 0xFFFFFFFF if member.zip64 else 0,
+            len(name), len(extra)
+        ) + name + extra
+
+    def _descriptor(self, i: int) -> bytes:
+        member = self.members[i]
+        if member.zip64:
+            return struct.pack("<IIQQ", 0x08074B50, member.crc32, member.size, member.size)
+        return struct.pack("<IIII", 0x08074B50, member.crc32, member.size, member.size)
+
+    def _central_header(self, i: int, crc: Optional[int] = None) -> bytes:
+        member = self.members[i]
+        name = self._arcnames[i]
+        offset = self.local_offsets[i]
+        dos_time, dos_date = _dos_datetime(member.mtime)
+
+        zip64_fields = []
+        size_field = member.size
+        offset_field = offset
+        if member.zip64:
+            zip64_fields += [member.size, member.size]
+            size_field = 0xFFFFFFFF
+        if offset >= _ZIP64_LIMIT:
+            zip64_fields.append(offset)
+            offset_field = 0xFFFFFFFF
+        extra = b""
+        if zip64_fields:
+            extra = struct.pack("<HH", 0x0001, 8 * len(zip64_fields)) + struct.pack(f"<{len(zip64_fields)}Q", *zip64_fields)
+        version = 45 if zip64_fields else 20
+
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, version, version, _FLAGS, 0, dos_time, dos_date,
+            member.crc32 if crc is None else crc, size_field, size_field,
+            len(name), len(extra), 0, 0, 0, 0, offset_field
+        ) + name + extra
+
+    def _end_records(self) -> bytes:
+        count = len(self.members)
+        central_size = self.central_size
+        needs_zip64 = (count >= 0xFFFF or self.central_offset >= _ZIP64_LIMIT
+                       or central_size >= _ZIP64_LIMIT)
+        records = b""
+        if needs_zip64:
+            zip64_end_offset = self.central_offset + central_size
+            records += struct.pack(
+                "<IQHHIIQQQQ", 0x06064B50, 44, 45, 45, 0, 0,
+                count, count, central_size, self.central_offset
+            )
+            records += struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+        records += struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0,
+            min(count, 0xFFFF), min(count, 0xFFFF),
+            min(central_size, _ZIP64_LIMIT), min(self.central_offset, _ZIP64_LIMIT), 0
+        )
+        return records
+
+    def _central_directory(self) -> bytes:
+        return b"".join(self._central_header(i) for i in range(len(self.members))) + self._end_records()
+
+    # ==================== 读取 ====================
+
+    @property
+    def crc_complete(self) -> bool:
+        return all(m.crc32 is not None for m in self.members)
+
+    def ensure_crc32(self) -> List[int]:
+        """补算缺失的 CRC (Range 响应前调用)，返回补算的条目序号"""
+        computed = []
+        for i, member in enumerate(self.members):
+            if member.crc32 is None:
+                member.crc32 = file_crc32(member.path)
+                computed.append(i)
+        return computed
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        生成区间 [start, end] 的字节
+        完整读取某个条目的数据时顺带计算 CRC；未知 CRC 的条目只能从头读取 (部分区间需先 ensure_crc32)
+        """
+        if end is None:
+            end = self.total_size - 1
+        for seg_start, length, kind, i in self.segments:
+            seg_end = seg_start + length - 1
+            if length == 0 or seg_end < start:
+                continue
+            if seg_start > end:
+                break
+            lo = max(start, seg_start) - seg_start
+            hi = min(end, seg_end) - seg_start + 1
+
+            if kind == "data":
+                yield from self._iter_member_data(i, lo, hi, chunk_size)
+                continue
+            if kind == "header":
+                blob = self._local_header(i)
+            elif kind == "descriptor":
+                blob = self._descriptor(i)
+            else:
+                blob = self._central_directory()
+            yield blob[lo:hi]
+
+    def _iter_member_data(self, i: int, lo: int, hi: int, chunk_size: int) -> Iterator[bytes]:
+        member = self.members[i]
+        compute_crc = member.crc32 is None
+        if compute_crc and (lo != 0 or hi != member.size):
+            raise ValueError(f"CRC32 unknown for partial read of {member.arcname}")
+
+        crc = 0
+        pos = lo
+        with open(member.path, "rb") as f:
+            fd = f.fileno()
+            while pos < hi:
+                n = min(chunk_size, hi - pos)
+                if hasattr(os, "pread"):
+                    chunk = os.pread(fd, n, pos)
+                else:
+                    f.seek(pos)
+                    chunk = f.read(n)
+                if not chunk:
+                    raise IOError(f"File truncated while streaming: {member.path}")
+                if compute_crc:
+                    crc = zlib.crc32(chunk, crc)
+                pos += len(chunk)
+                yield chunk
+        if compute_crc:
+            member.crc32 = crc & 0xFFFFFFFF
@@ -0,0 +1,82 @@
+"""
+独立合成进程
+
+    python -m app.worker
+
+从任务表领取合成与打包任务并执行，与 API 服务共享数据目录和数据库；
+API 服务配置 worker.mode: external (或环境变量 WORKER_MODE=external) 后只负责入队与查询，
+本进程的进度事件与日志经 events 表转发给 API 进程 (SSE / WebSocket)
+
+收到 SIGTERM / SIGINT 后排空: 不再领取任务与开始新章节，进行中的章节最多再合成
+worker.shutdown_grace_seconds 秒，未完成的任务交还队列，随后写完事件、日志与待发通知再退出
+"""
+
+import asyncio
+import logging
+import signal
+
+
+async def serve():
+    from app.core.config import CONFIG_WATCH_INTERVAL, config
+    from app.core.log_manager import log_manager
+    from app.services.event_relay import event_relay
+    from app.services.http_client import http_client
+    from app.services.job_control import job_control
+    from app.services.job_runner import job_runner
+    # 注册打包/合并任务的处理函数
+    import app.api.endpoints.books  # noqa: F401
+
+    asyncio.create_task(log_manager.start_broadcasting())
+    await http_client.start()
+    event_relay.forward()
+    watcher = None
+    if CONFIG_WATCH_INTERVAL and CONFIG_WATCH_INTERVAL > 0:
+        watcher = asyncio.create_task(config.watch(CONFIG_WATCH_INTERVAL))
+    job_control.start()
+    job_runner.clean_interrupted_packs()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows 不支持，退回 KeyboardInterrupt (不排空)
+            pass
+
+    runner = asyncio.create_task(job_runner.run())
+    try:
+        await stop.wait()
+        logging.info("🛑 收到退出信号，开始排空...")
+        # 排空期间心跳继续为进行中的任务与章节续租
+        await job_runner.drain(config.get("worker.shutdown_grace_seconds", 20))
+    finally:
+        runner.cancel()
+        if watcher:
+            watcher.cancel()
+        await job_control.stop()
+        from app.db.database import db
+        from app.db.jobs import job_store
+        from app.services.notifier import notification_outbox
+        await notification_outbox.flush()
+        await notification_outbox.close()
+        await http_client.close()
+        event_relay.stop()
+        db.close()
+        job_store.close()
+        logging.info("👋 合成进程已退出")
+
+
+def main():
+    from app.core.config import LOG_DIR
+    from app.core.logger import setup_logger
+    setup_logger(LOG_DIR / "worker.log", LOG_DIR / "worker-error.log")
+    logging.info("🚀 NovelVoice 合成进程启动")
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
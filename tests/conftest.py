@@ -0,0 +1,2 @@
+# pytest 先于所有测试模块加载本文件: 无论收集顺序如何，首次导入 app 前数据目录都已指向临时目录
+import support  # noqa: F401
@@ -0,0 +1,64 @@
+"""
+测试公共设置
+导入本模块即把数据、音频、缓存与数据库目录指向临时目录 (须在导入 app 之前)，
+配置目录与路径解析缓存随数据目录一并落在临时目录中，测试不会写入仓库的 data/
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP_DATA = tempfile.mkdtemp(prefix="novelvoice-test-")
+for _var, _name in (("NOVELVOICE_DATA_DIR", "data"), ("NOVELVOICE_APP_DATA_DIR", "audio"),
+                    ("NOVELVOICE_CACHE_DIR", "cache"), ("NOVELVOICE_DB_DIR", "db")):
+    os.environ[_var] = os.path.join(TMP_DATA, _name)
+
+_book_numbers = itertools.count(1)
+
+
+def make_book(chapters=3, completed=()):
+    """
+    登记一本新书并写入待合成章节 (completed 中的章节标记为已完成)
+    返回 (书名, book_id, 音频目录)
+    """
+    from app.core.config import APP_DATA_DIR
+    from app.db.database import db
+
+    book_name = f"测试书籍{next(_book_numbers)}"
+    book_id = db.ensure_book(book_name)
+    book_dir = APP_DATA_DIR / f"{book_name}_audio"
+    book_dir.mkdir(parents=True, exist_ok=True)
+    cursor = db.get_cursor()
+    for index in range(1, chapters + 1):
+        cursor.execute(
+            "INSERT INTO tasks (book_id, chapter_index, title, content, status) VALUES (?, ?, ?, ?, ?)",
+            (book_id, index, f"第{index}章", f"第{index}章正文", "completed" if index in completed else "pending")
+        )
+    db.commit()
+    return book_name, book_id, book_dir
+
+
+def add_book(book_name, chapters, start=1):
+    """登记书籍并写入已完成章节 (从第 start 章起) 的音频文件与索引"""
+    from app.core.config import APP_DATA_DIR
+    from app.db.database import db
+
+    book_id = db.ensure_book(book_name)
+    book_dir = APP_DATA_DIR / f"{book_name}_audio"
+    book_dir.mkdir(parents=True, exist_ok=True)
+    cursor = db.get_cursor()
+    for index, data in enumerate(chapters, start):
+        path = book_dir / f"{index:04d}-第{index}章.mp3"
+        path.write_bytes(data)
+        stat = path.stat()
+        cursor.execute(
+            "INSERT OR REPLACE INTO tasks (book_id, chapter_index, title, status, audio_path, audio_bytes, audio_mtime) "
+            "VALUES (?, ?, ?, 'completed', ?, ?, ?)",
+            (book_id, index, f"第{index}章", path.name, stat.st_size, stat.st_mtime)
+        )
+    db.commit()
+    return book_id
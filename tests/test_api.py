@@ -0,0 +1,110 @@
+
+import unittest
+import sys
+import os
+import io
+import zipfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import add_book  # 临时数据目录，须在导入 app 之前
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db.database import db
+
+
+class TestPackStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.chapters = [os.urandom(600), os.urandom(1300), os.urandom(50)]
+        add_book("流式打包", cls.chapters)
+        cls.client = TestClient(app)
+
+    def test_get_returns_zip(self):
+        r = self.client.get("/api/pack/流式打包/stream")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.headers["content-type"], "application/zip")
+        self.assertEqual(int(r.headers["content-length"]), len(r.content))
+        zf = zipfile.ZipFile(io.BytesIO(r.content))
+        self.assertEqual([zf.read(name) for name in zf.namelist()], self.chapters)
+
+    def test_head_matches_get(self):
+        head = self.client.head("/api/pack/流式打包/stream")
+        self.assertEqual(head.status_code, 200)
+        self.assertEqual(head.content, b"")
+        body = self.client.get("/api/pack/流式打包/stream")
+        self.assertEqual(head.headers["content-length"], body.headers["content-length"])
+
+    def test_file_ids_selects_chapters(self):
+        r = self.client.get("/api/pack/流式打包/stream", params={"file_ids": "1,3"})
+        zf = zipfile.ZipFile(io.BytesIO(r.content))
+        self.assertEqual([zf.read(name) for name in zf.namelist()], [self.chapters[0], self.chapters[2]])
+
+    def test_range_after_crc_known(self):
+        full = self.client.get("/api/pack/流式打包/stream", params={"precompute": "true"})
+        etag = full.headers["etag"]
+        r = self.client.get("/api/pack/流式打包/stream", headers={"Range": "bytes=100-299", "If-Range": etag})
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r.headers["content-range"], f"bytes 100-299/{len(full.content)}")
+        self.assertEqual(r.content, full.content[100:300])
+
+    def test_unsatisfiable_range(self):
+        r = self.client.get("/api/pack/流式打包/stream", headers={"Range": "bytes=999999-"})
+        self.assertEqual(r.status_code, 416)
+
+    def test_unknown_book(self):
+        r = self.client.get("/api/pack/不存在/stream")
+        self.assertEqual(r.status_code, 404)
+
+
+class TestConditionalGet(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.book_id = add_book("条件请求", [b"a" * 100, b"b" * 100])
+        cls.client = TestClient(app)
+
+    def touch_chapter(self):
+        db.get_cursor().execute(
+            "UPDATE tasks SET title = title || '.' WHERE book_id = ? AND chapter_index = 1", (self.book_id,))
+        db.commit()
+
+    def assert_revalidates(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["etag"]
+
+        cached = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.headers["etag"], etag)
+        self.assertEqual(cached.content, b"")
+
+        self.touch_chapter()
+        changed = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": changed.headers["etag"]}).status_code, 304)
+
+    def test_books(self):
+        self.assert_revalidates("/api/books")
+
+    def test_chapters(self):
+        self.assert_revalidates("/api/chapters/条件请求")
+
+    def test_status(self):
+        self.assert_revalidates("/api/status/条件请求")
+
+    def test_missing_book_is_404_before_304(self):
+        response = self.client.get("/api/chapters/不存在的书", headers={"If-None-Match": "*"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_book_write_keeps_chapters_etag(self):
+        etag = self.client.get("/api/chapters/条件请求").headers["etag"]
+        add_book("条件请求-其他", [b"c" * 10])
+        self.assertEqual(self.client.get("/api/chapters/条件请求", headers={"If-None-Match": etag}).status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
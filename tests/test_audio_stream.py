@@ -0,0 +1,55 @@
+
+import unittest
+import sys
+import os
+import pathlib
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.audio_stream import VirtualAudioStream, RangeNotSatisfiable
+
+class TestVirtualAudioStream(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp.name)
+        self.parts = [b"AAAA", b"BB", b"CCCCCC"]
+        files = []
+        for i, data in enumerate(self.parts, 1):
+            path = root / f"{i:04d}-ch{i}.mp3"
+            path.write_bytes(data)
+            files.append((path, i, f"ch{i}"))
+        # Missing file is skipped
+        files.append((root / "9999-missing.mp3", 99, "missing"))
+        self.stream = VirtualAudioStream.from_files(files)
+        self.whole = b"".join(self.parts)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, start, end, chunk_size=3):
+        return b"".join(self.stream.iter_range(start, end, chunk_size=chunk_size))
+
+    def test_index(self):
+        self.assertEqual(self.stream.total_size, 12)
+        self.assertEqual([c["offset"] for c in self.stream.chapters()], [0, 4, 6])
+        self.assertEqual(self.stream.locate(5), (1, 1))
+        self.assertEqual(self.stream.locate(6), (2, 0))
+
+    def test_read_across_files(self):
+        self.assertEqual(self.read(0, 11), self.whole)
+        self.assertEqual(self.read(3, 7), self.whole[3:8])
+        self.assertEqual(self.read(11, 11), b"C")
+
+    def test_parse_range(self):
+        self.assertIsNone(self.stream.parse_range(None))
+        self.assertEqual(self.stream.parse_range("bytes=2-"), (2, 11))
+        self.assertEqual(self.stream.parse_range("bytes=-3"), (9, 11))
+        self.assertEqual(self.stream.parse_range("bytes=5-100"), (5, 11))
+        self.assertIsNone(self.stream.parse_range("bytes=0-1,4-5"))
+        with self.assertRaises(RangeNotSatisfiable):
+            self.stream.parse_range("bytes=12-")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+
+import unittest
+import sys
+import os
+import pathlib
+import struct
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.mp3_info import scan_frames, scan_file
+from app.services.audiobook_export import export_audiobook
+
+# MPEG2 Layer III, 48kbps, 24kHz, 单声道: 每帧 144 字节 / 576 采样 (24ms)
+FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + b"\0" * 140
+INFO_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + b"\0" * 9 + b"Info" + b"\0" * 127
+
+
+def make_mp3(frames, id3=True, info=True, id3v1=True):
+    data = b""
+    if id3:
+        data += b"ID3\x04\x00\x00\x00\x00\x00\x0A" + b"\0" * 10
+    if info:
+        data += INFO_FRAME
+    data += FRAME * frames
+    if id3v1:
+        data += b"TAG" + b"\0" * 125
+    return data
+
+
+class TestFrameScan(unittest.TestCase):
+    def test_skips_tags_and_info_frame(self):
+        scan = scan_frames(make_mp3(50))
+        self.assertEqual(scan.frames, 50)
+        self.assertEqual(scan.audio_bytes, 50 * 144)
+        self.assertEqual(scan.duration_ms, 1200)
+        self.assertEqual(len(scan.segments), 1)
+
+    def test_resyncs_after_garbage(self):
+        scan = scan_frames(FRAME * 10 + b"\x01\x02junk" + FRAME * 5)
+        self.assertEqual(scan.frames, 15)
+        self.assertEqual(len(scan.segments), 2)
+
+
+class TestAudiobookExport(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_concat_with_chapter_frames(self):
+        chapters = []
+        for i, frames in enumerate((50, 25, 100), 1):
+            path = self.root / f"{i:04d}.mp3"
+            path.write_bytes(make_mp3(frames))
+            chapters.append((path, f"第{i}章"))
+        output = self.root / "book.mp3"
+        marks = export_audiobook(output, "测试书", chapters)
+
+        data = output.read_bytes()
+        self.assertEqual(data[:3], b"ID3")
+        self.assertFalse((self.root / "book.mp3.part").exists())
+        self.assertEqual([(m.start_ms, m.end_ms) for m in marks], [(0, 1200), (1200, 1800), (1800, 4200)])
+        # 拼接结果只包含音频帧 (标签/信息帧均已去除)
+        self.assertEqual(len(data) - marks[0].start_offset, 175 * 144)
+        self.assertEqual(marks[-1].end_offset, len(data))
+        self.assertEqual(scan_file(output).frames, 175)
+
+        # CHAP 帧中的时间与偏移已回填
+        pos = data.index(b"CHAP")
+        body = data[pos + 10:]
+        self.assertTrue(body.startswith(b"ch1\0"))
+        self.assertEqual(struct.unpack(">IIII", body[4:20]), (0, 1200, marks[0].start_offset, marks[0].end_offset))
+        self.assertIn("第2章".encode("utf-16-le"), data[:marks[0].start_offset])
+
+    def test_many_chapters_use_nested_toc(self):
+        path = self.root / "0001.mp3"
+        path.write_bytes(make_mp3(2))
+        output = self.root / "book.mp3"
+        marks = export_audiobook(output, "长篇", [(path, f"章{i}") for i in range(300)])
+        data = output.read_bytes()
+        self.assertEqual(len(marks), 300)
+        self.assertEqual(data.count(b"CTOC"), 3)
+        self.assertEqual(marks[-1].end_ms, 300 * 48)
+
+if __name__ == '__main__':
+    unittest.main()
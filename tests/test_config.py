@@ -0,0 +1,144 @@
+
+import unittest
+import sys
+import os
+import asyncio
+import copy
+import json
+import pathlib
+import tempfile
+import time
+from unittest import mock
+
+import yaml
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import TMP_DATA, make_book  # 临时数据目录，须在导入 app 之前
+
+import app.core.config as app_config
+from app.core.config import config
+from app.core.state import state
+import app.services.job_runner  # noqa: F401 (注册配置订阅，与应用启动时相同)
+from app.services.tts_engine import TTSProcessor
+
+
+class TestConfigReload(unittest.TestCase):
+    def setUp(self):
+        # 以当前内存配置为基线写入配置文件 (位于临时数据目录)，重载不产生变更
+        self.baseline = copy.deepcopy(config._config)
+        self.concurrency = state.concurrency
+        self.write_config(self.baseline)
+        asyncio.run(config.reload())
+
+    def tearDown(self):
+        self.write_config(self.baseline)
+        asyncio.run(config.reload())
+        state.active_processors.clear()
+        state.concurrency = self.concurrency
+
+    def write_config(self, data):
+        config.config_path.parent.mkdir(parents=True, exist_ok=True)
+        config.config_path.write_text(yaml.safe_dump(data, allow_unicode=True), encoding="utf-8")
+        # 保证修改时间与上次加载时不同 (文件系统时间精度)
+        mtime = max(time.time(), (config._mtime or 0) + 1)
+        os.utime(config.config_path, (mtime, mtime))
+
+    def changed_tts(self, **values):
+        data = copy.deepcopy(self.baseline)
+        data.setdefault("tts", {}).update(values)
+        return data
+
+    def test_subscribers_get_changed_sections(self):
+        received = []
+        callback = config.subscribe(received.append)
+        try:
+            self.write_config(self.changed_tts(max_chars=1234))
+            result = asyncio.run(config.reload())
+        finally:
+            config.unsubscribe(callback)
+        self.assertTrue(result["success"])
+        self.assertEqual(len(received), 1)
+        self.assertEqual(list(received[0]), ["tts"])
+
+    def test_watch_reloads_on_change(self):
+        received = []
+
+        async def run():
+            callback = config.subscribe(received.append)
+            watcher = asyncio.create_task(config.watch(0.02))
+            try:
+                self.write_config(self.changed_tts(max_chars=2345))
+                for _ in range(50):
+                    if received:
+                        break
+                    await asyncio.sleep(0.02)
+            finally:
+                watcher.cancel()
+                config.unsubscribe(callback)
+
+        asyncio.run(run())
+        self.assertEqual([list(changes) for changes in received], [["tts"]])
+
+    def test_reload_reaches_running_processor(self):
+        book_name, _, book_dir = make_book(chapters=1)
+        processor = TTSProcessor(str(book_dir), concurrency_limit=lambda: state.concurrency)
+        state.active_processors[book_name] = processor
+        new_limit = 5 if state.concurrency != 5 else 4
+
+        self.write_config(self.changed_tts(max_chars=3456, concurrency_limit=new_limit))
+        asyncio.run(config.reload())
+        self.assertEqual(processor.max_chars, 3456)
+        self.assertEqual(state.concurrency, new_limit)
+
+
+class TestPathsCache(unittest.TestCase):
+    def setUp(self):
+        app_config._save_paths_cache()
+
+    def tearDown(self):
+        app_config._save_paths_cache()
+
+    def cached(self):
+        return json.loads(app_config.PATHS_CACHE_FILE.read_text(encoding="utf-8"))
+
+    def test_cache_file_in_data_dir(self):
+        # 随数据目录位于临时目录，测试不写入仓库
+        self.assertTrue(app_config.PATHS_CACHE_FILE.is_relative_to(pathlib.Path(TMP_DATA)))
+
+    def test_fresh_cache_is_used(self):
+        paths = app_config._load_paths_cache()
+        self.assertEqual(paths["DATA_DIR"], app_config.DATA_DIR)
+        self.assertTrue(app_config.setup_adaptive_paths())
+        self.assertEqual(app_config.DB_DIR, paths["DB_DIR"])
+
+    def test_env_change_invalidates(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch.dict(os.environ, {"NOVELVOICE_CACHE_DIR": cache_dir}):
+                self.assertIsNone(app_config._load_paths_cache())
+
+    def test_missing_dir_invalidates(self):
+        cached = self.cached()
+        cached["paths"]["CACHE_DIR"] = os.path.join(TMP_DATA, "removed")
+        app_config.PATHS_CACHE_FILE.write_text(json.dumps(cached), encoding="utf-8")
+        self.assertIsNone(app_config._load_paths_cache())
+
+    def test_corrupt_cache_is_ignored(self):
+        app_config.PATHS_CACHE_FILE.write_text("{", encoding="utf-8")
+        self.assertIsNone(app_config._load_paths_cache())
+
+    def test_legacy_data_change_re_resolves(self):
+        self.assertIsNone(self.cached()["legacy_data"])
+        # 挂载了旧数据卷: 缓存失效，重新解析并记录新的检测结果
+        with mock.patch.object(app_config, "_legacy_data_probe", return_value="/srv/old-data"):
+            self.assertIsNone(app_config._load_paths_cache())
+            self.assertFalse(app_config.setup_adaptive_paths())
+            self.assertEqual(self.cached()["legacy_data"], "/srv/old-data")
+            self.assertIsNotNone(app_config._load_paths_cache())
+        # 旧数据移除后再次失效
+        self.assertIsNone(app_config._load_paths_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
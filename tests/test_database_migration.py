@@ -0,0 +1,177 @@
+
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import support  # noqa: F401 (临时数据目录，须在导入 app 之前)
+
+from app.db.database import Database, SCHEMA_VERSION
+
+# v1 结构: tasks / book_assets 以书名关联，tasks 以 "{book_name}_{idx}" 为主键
+V1_SCHEMA = """
+    CREATE TABLE tasks (
+        id TEXT PRIMARY KEY,
+        book_name TEXT NOT NULL,
+        chapter_index INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT,
+        status TEXT DEFAULT 'pending',
+        audio_path TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE book_assets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_name TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        description TEXT,
+        size_str TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_book_name ON tasks (book_name);
+    CREATE INDEX idx_status ON tasks (status);
+    CREATE INDEX idx_asset_book ON book_assets (book_name);
+"""
+
+# v1.4.0 之前没有 book_assets 表
+V1_SCHEMA_NO_ASSETS = """
+    CREATE TABLE tasks (
+        id TEXT PRIMARY KEY,
+        book_name TEXT NOT NULL,
+        chapter_index INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        content TEXT,
+        status TEXT DEFAULT 'pending',
+        audio_path TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_book_name ON tasks (book_name);
+"""
+
+V1_TASKS = [
+    ("甲_1", "甲", 1, "第一章", "正文一", "completed", "0001-第一章.mp3"),
+    ("甲_2", "甲", 2, "第二章", "正文二", "failed", None),
+    ("甲_3", "甲", 3, "第三章", "正文三", "pending", None),
+    ("乙_1", "乙", 1, "序章", "正文", "pending", None),
+    ("乙_2", "乙", 2, "第一章", "正文", "completed", "0002-第一章.mp3"),
+]
+
+
+def create_v1_database(path, schema=V1_SCHEMA):
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+    conn.executemany(
+        "INSERT INTO tasks (id, book_name, chapter_index, title, content, status, audio_path) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", V1_TASKS
+    )
+    return conn
+
+
+def open_database(path):
+    """在指定文件上初始化数据库 (绕过单例与全局 DB_PATH)"""
+    database = object.__new__(Database)
+    database.conn = sqlite3.connect(path)
+    database.conn.row_factory = sqlite3.Row
+    database._init_db()
+    return database
+
+
+class TestMigrateToV2(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "novelvoice.db")
+        conn = create_v1_database(self.path)
+        # 丙只剩导出文件，没有章节
+        conn.executemany(
+            "INSERT INTO book_assets (book_name, filename, description, size_str) VALUES (?, ?, ?, ?)",
+            [("甲", "甲.zip", "Full Pack", "1.0MB"), ("丙", "丙.zip", "Full Pack", "2.0MB")]
+        )
+        conn.commit()
+        conn.close()
+        self.database = open_database(self.path)
+
+    def tearDown(self):
+        self.database.conn.close()
+        self.tmp.cleanup()
+
+    def query(self, sql, params=()):
+        return [dict(row) for row in self.database.conn.execute(sql, params).fetchall()]
+
+    def book_ids(self):
+        return {row["name"]: row["id"] for row in self.query("SELECT id, name FROM books")}
+
+    def test_books_created(self):
+        books = self.query("SELECT name, dir_name FROM books ORDER BY name")
+        self.assertEqual({row["name"]: row["dir_name"] for row in books},
+                         {"甲": "甲_audio", "乙": "乙_audio", "丙": "丙_audio"})
+
+    def test_row_counts_preserved(self):
+        ids = self.book_ids()
+        self.assertEqual(self.query("SELECT count(*) AS n FROM tasks")[0]["n"], 5)
+        counts = {row["book_id"]: row["n"] for row in self.query(
+            "SELECT book_id, count(*) AS n FROM tasks GROUP BY book_id")}
+        self.assertEqual(counts, {ids["甲"]: 3, ids["乙"]: 2})
+        assets = {row["filename"]: row["book_id"] for row in self.query("SELECT filename, book_id FROM book_assets")}
+        self.assertEqual(assets, {"甲.zip": ids["甲"], "丙.zip": ids["丙"]})
+
+    def test_chapter_fields_preserved(self):
+        row = self.query("SELECT * FROM tasks WHERE book_id = ? AND chapter_index = 1", (self.book_ids()["甲"],))[0]
+        self.assertEqual((row["title"], row["content"], row["status"], row["audio_path"]),
+                         ("第一章", "正文一", "completed", "0001-第一章.mp3"))
+        self.assertEqual(row["audio_bytes"], 0)
+
+    def test_schema_is_v2(self):
+        columns = {row["name"] for row in self.query("PRAGMA table_info(tasks)")}
+        self.assertNotIn("book_name", columns)
+        self.assertNotIn("id", columns)
+        self.assertIn("book_id", columns)
+        self.assertNotIn("book_name", {row["name"] for row in self.query("PRAGMA table_info(book_assets)")})
+        meta = {row["key"]: row["value"] for row in self.query("SELECT key, value FROM meta")}
+        self.assertEqual(meta["schema_version"], str(SCHEMA_VERSION))
+        self.assertEqual(meta["legacy_migrated"], "1")
+
+    def test_stats_rebuilt(self):
+        stats = self.query("SELECT * FROM book_stats WHERE book_id = ?", (self.book_ids()["甲"],))[0]
+        self.assertEqual((stats["total"], stats["completed"], stats["failed"]), (3, 1, 1))
+
+    def test_reopen_is_idempotent(self):
+        self.database.conn.close()
+        with mock.patch.object(Database, "migrate_legacy_data") as migrate_legacy:
+            self.database = open_database(self.path)
+        # 已记录 legacy_migrated，不再遍历书籍目录
+        migrate_legacy.assert_not_called()
+        self.assertEqual(self.query("SELECT count(*) AS n FROM tasks")[0]["n"], 5)
+        self.assertEqual(self.query("SELECT count(*) AS n FROM books")[0]["n"], 3)
+
+
+class TestMigrateWithoutAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "novelvoice.db")
+        conn = create_v1_database(self.path, V1_SCHEMA_NO_ASSETS)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_books_created_once_per_book(self):
+        database = open_database(self.path)
+        try:
+            books = database.conn.execute("SELECT name FROM books ORDER BY name").fetchall()
+            self.assertEqual([row["name"] for row in books], ["乙", "甲"])
+            self.assertEqual(database.conn.execute("SELECT count(*) FROM tasks").fetchone()[0], 5)
+            self.assertEqual(database.conn.execute("SELECT count(*) FROM book_assets").fetchone()[0], 0)
+        finally:
+            database.conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+
+import unittest
+import sys
+import os
+import asyncio
+import threading
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import make_book  # 临时数据目录，须在导入 app 之前
+
+from app.core.event_bus import event_bus
+from app.core.state import state
+from app.db.jobs import job_store
+from app.services.job_runner import JobRunner
+from app.services.tts_engine import TTSProcessor
+
+
+def chapters(book_id):
+    return {row["chapter_index"]: (row["status"], row["claimed_by"]) for row in job_store._read(
+        "SELECT chapter_index, status, claimed_by FROM tasks WHERE book_id = ? ORDER BY chapter_index", (book_id,))}
+
+
+def job(job_id):
+    return job_store._read("SELECT * FROM jobs WHERE id = ?", (job_id,))[0]
+
+
+def fake_synthesis(delay):
+    """替代 edge-tts 的合成: 等待 delay 秒后写入音频文件"""
+    async def synthesize(self, text, output_path, context_info="", max_retries=3):
+        await asyncio.sleep(delay)
+        output_path.write_bytes(b"ID3" + text.encode("utf-8"))
+    return synthesize
+
+
+class TestDrain(unittest.TestCase):
+    def setUp(self):
+        # 各用例独占任务队列，合成并发为 2
+        job_store._write(lambda conn: conn.execute("DELETE FROM jobs"))
+        state.concurrency = 2
+        self.book_name, self.book_id, _ = make_book()
+        self.job_id = job_store.enqueue(self.book_name, "tts", {"config": {}, "chapter_ids": None})
+
+    def drain_after_start(self, delay, grace):
+        """开始合成，两个章节都在进行中时排空，返回排空摘要"""
+        async def run():
+            runner = JobRunner()
+            job = await asyncio.to_thread(job_store.claim, "tts")
+            runner.tasks[job["id"]] = asyncio.create_task(runner._run_tts(job))
+            # 等到并发数个章节都已认领，否则排空时进行中的章节数不确定
+            while sum(len(p.in_flight) for p in state.active_processors.values()) < state.concurrency:
+                await asyncio.sleep(0.01)
+            return await runner.drain(grace)
+
+        with mock.patch.object(TTSProcessor, "_synthesize_with_retry", fake_synthesis(delay)):
+            return asyncio.run(run())
+
+    def test_in_flight_chapters_finish_within_grace(self):
+        summary = self.drain_after_start(delay=0.3, grace=5)
+        self.assertEqual(summary["chapters_in_flight"], 2)
+        self.assertEqual(summary["chapters_finished"], 2)
+        self.assertEqual(summary["chapters_aborted"], 0)
+        self.assertEqual(summary["requeued"], [self.book_name])
+        # 进行中的章节完成，未开始的章节保持待合成
+        self.assertEqual(chapters(self.book_id), {
+            1: ("completed", None), 2: ("completed", None), 3: ("pending", None)
+        })
+        row = job(self.job_id)
+        self.assertEqual(row["status"], "queued")
+        self.assertIsNone(row["owner"])
+
+    def test_grace_timeout_aborts_and_releases_chapters(self):
+        summary = self.drain_after_start(delay=30, grace=0.2)
+        self.assertEqual(summary["chapters_finished"], 0)
+        self.assertEqual(summary["chapters_aborted"], 2)
+        self.assertEqual(summary["requeued"], [self.book_name])
+        # 中止的章节释放认领，退回待合成
+        self.assertEqual(chapters(self.book_id), {1: ("pending", None), 2: ("pending", None), 3: ("pending", None)})
+        self.assertEqual(job(self.job_id)["status"], "queued")
+        self.assertEqual(job_store.claim("tts")["id"], self.job_id)
+
+    def test_drain_without_auto_resume_interrupts(self):
+        with mock.patch.object(job_store, "auto_resume", False):
+            self.drain_after_start(delay=30, grace=0.2)
+        self.assertEqual(job(self.job_id)["status"], "interrupted")
+
+
+class TestRunPack(unittest.TestCase):
+    def setUp(self):
+        job_store._write(lambda conn: conn.execute("DELETE FROM jobs"))
+        self.book_name, _, _ = make_book(chapters=1)
+        self.job_id = job_store.enqueue(self.book_name, "pack", {"action": "zip"})
+        self.job = job_store.claim("pack")
+        self.runner = JobRunner()
+
+    def test_completed(self):
+        self.runner._run_pack(self.job, lambda book, params, cancel_event: None, threading.Event())
+        self.assertEqual(job(self.job_id)["status"], "completed")
+
+    def test_failed(self):
+        def handler(book, params, cancel_event):
+            raise OSError("disk full")
+        self.runner._run_pack(self.job, handler, threading.Event())
+        row = job(self.job_id)
+        self.assertEqual(row["status"], "failed")
+        self.assertEqual(row["message"], "disk full")
+
+    def test_queue_events_use_job_table(self):
+        with mock.patch.object(event_bus, "publish") as publish:
+            self.runner._run_pack(self.job, lambda book, params, cancel_event: None, threading.Event())
+        snapshots = [call.args[1] for call in publish.call_args_list if call.args[0] == "pack_queue"]
+        # 开始时为运行中 (任务表中的任务 ID)，结束后队列为空
+        self.assertEqual([item["job_id"] for item in snapshots[0]["running"]], [self.job_id])
+        self.assertEqual(snapshots[-1], {"running": [], "queued": []})
+
+    def test_cancelled(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+        self.runner._run_pack(self.job, lambda book, params, cancel_event: None, cancel_event)
+        self.assertEqual(job(self.job_id)["status"], "cancelled")
+
+    def test_cancel_while_draining_requeues(self):
+        cancel_event = threading.Event()
+
+        def handler(book, params, event):
+            # 排空超时: drain() 设置取消标记，处理函数中途返回
+            self.runner.draining = True
+            event.set()
+
+        self.runner._run_pack(self.job, handler, cancel_event)
+        row = job(self.job_id)
+        self.assertEqual(row["status"], "queued")
+        self.assertIsNone(row["owner"])
+        self.assertEqual(self.runner._requeued, [self.book_name])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import make_book  # 临时数据目录，须在导入 app 之前
+
+from app.db.database import DB_PATH, db
+from app.db.jobs import JobStore, make_worker_id
+
+
+def make_store(node, lease_seconds=30):
+    """模拟一个节点 (共享同一数据库文件)"""
+    store = JobStore(DB_PATH, lease_seconds=lease_seconds)
+    store.worker_id = node
+    return store
+
+
+def chapter(store, book_id, index):
+    return store._read("SELECT * FROM tasks WHERE book_id = ? AND chapter_index = ?", (book_id, index))[0]
+
+
+def job(store, job_id):
+    return store._read("SELECT * FROM jobs WHERE id = ?", (job_id,))[0]
+
+
+class TestChapterLeases(unittest.TestCase):
+    def setUp(self):
+        self.book_name, self.book_id, _ = make_book()
+        self.a = make_store("node-a:1")
+        self.b = make_store("node-b:1")
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def test_claim_marks_processing(self):
+        row = self.a.claim_chapter(self.book_id, 1)
+        self.assertEqual(row["claimed_by"], "node-a:1")
+        self.assertEqual(row["status"], "processing")
+        self.assertGreater(row["lease_until"], time.time())
+
+    def test_concurrent_claims_have_one_winner(self):
+        stores = [make_store(f"node-{i}:1") for i in range(6)]
+        results = {}
+        barrier = threading.Barrier(len(stores))
+
+        def claim(store):
+            barrier.wait()
+            results[store.worker_id] = store.claim_chapter(self.book_id, 2)["claimed_by"]
+
+        threads = [threading.Thread(target=claim, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for store in stores:
+            store.close()
+
+        winners = [node for node, claimed_by in results.items() if claimed_by == node]
+        self.assertEqual(len(winners), 1)
+        # 落败的节点都看到同一个持有者
+        self.assertEqual(set(results.values()), {winners[0]})
+
+    def test_claim_held_by_other_node(self):
+        self.a.claim_chapter(self.book_id, 1)
+        row = self.b.claim_chapter(self.book_id, 1)
+        self.assertEqual(row["claimed_by"], "node-a:1")
+        # 持有者重复认领只续租
+        row = self.a.claim_chapter(self.book_id, 1)
+        self.assertEqual(row["claimed_by"], "node-a:1")
+
+    def test_expired_lease_is_taken_over(self):
+        short = make_store("node-a:1", lease_seconds=0.05)
+        short.claim_chapter(self.book_id, 1)
+        short.close()
+        time.sleep(0.1)
+        row = self.b.claim_chapter(self.book_id, 1)
+        self.assertEqual(row["claimed_by"], "node-b:1")
+        self.assertEqual(row["status"], "processing")
+
+    def test_expired_lease_returns_to_pending(self):
+        short = make_store("node-a:1", lease_seconds=0.05)
+        short.claim_chapter(self.book_id, 1)
+        short.close()
+        time.sleep(0.1)
+        # 任一写操作都会先回收过期的章节租约
+        self.b._write(lambda conn: self.b._expire_stale(conn, time.time()))
+        row = chapter(self.b, self.book_id, 1)
+        self.assertIsNone(row["claimed_by"])
+        self.assertEqual(row["status"], "pending")
+
+    def test_heartbeat_renews_claimed_chapters(self):
+        short = make_store("node-a:1", lease_seconds=0.2)
+        short.claim_chapter(self.book_id, 1)
+        time.sleep(0.1)
+        short.heartbeat()
+        time.sleep(0.15)
+        row = self.b.claim_chapter(self.book_id, 1)
+        self.assertEqual(row["claimed_by"], "node-a:1")
+        short.close()
+
+    def test_release_on_failure(self):
+        self.a.claim_chapter(self.book_id, 3)
+        self.a.release_chapter(self.book_id, 3)
+        row = chapter(self.a, self.book_id, 3)
+        self.assertIsNone(row["claimed_by"])
+        self.assertEqual(row["status"], "pending")
+        self.assertEqual(self.b.claim_chapter(self.book_id, 3)["claimed_by"], "node-b:1")
+
+    def test_release_keeps_completed_status(self):
+        self.a.claim_chapter(self.book_id, 1)
+        self.a._write(lambda conn: conn.execute(
+            "UPDATE tasks SET status = 'completed' WHERE book_id = ? AND chapter_index = 1", (self.book_id,)))
+        self.a.release_chapter(self.book_id, 1)
+        self.assertEqual(chapter(self.a, self.book_id, 1)["status"], "completed")
+
+    def test_release_by_other_node_is_ignored(self):
+        self.a.claim_chapter(self.book_id, 1)
+        self.b.release_chapter(self.book_id, 1)
+        self.assertEqual(chapter(self.a, self.book_id, 1)["claimed_by"], "node-a:1")
+
+    def test_missing_chapter(self):
+        self.assertIsNone(self.a.claim_chapter(self.book_id, 99))
+
+
+class TestJobResume(unittest.TestCase):
+    def setUp(self):
+        self.book_name, self.book_id, _ = make_book(completed=(1,))
+        self.b = make_store("node-b:1")
+        # 各用例独占任务队列
+        self.b._write(lambda conn: conn.execute("DELETE FROM jobs"))
+
+    def tearDown(self):
+        self.b.close()
+
+    def start_job(self, node, lease_seconds=0.05, auto_resume=True):
+        """node 领取新入队的合成任务并认领第 2 章，随后"退出" (不再心跳)"""
+        store = make_store(node, lease_seconds)
+        store.auto_resume = auto_resume
+        job_id = store.enqueue(self.book_name, "tts", {"config": {"voice": "v"}, "chapter_ids": None}, priority=3)
+        self.assertEqual(store.claim("tts")["id"], job_id)
+        store.claim_chapter(self.book_id, 2)
+        store.close()
+        return job_id
+
+    def test_expired_running_job_is_requeued(self):
+        job_id = self.start_job("node-a:1")
+        time.sleep(0.1)
+        claimed = self.b.claim("tts")
+        self.assertEqual(claimed["id"], job_id)
+        self.assertEqual(job(self.b, job_id)["owner"], "node-b:1")
+        # 参数与优先级随任务保留
+        self.assertEqual(claimed["params"]["config"], {"voice": "v"})
+        self.assertEqual(claimed["priority"], 3)
+        row = chapter(self.b, self.book_id, 2)
+        self.assertEqual(row["status"], "pending")
+        self.assertIsNone(row["claimed_by"])
+
+    def test_live_lease_is_not_requeued(self):
+        self.start_job("node-a:1", lease_seconds=30)
+        self.assertIsNone(self.b.claim("tts"))
+
+    def test_cancelled_job_is_not_requeued(self):
+        job_id = self.start_job("node-a:1")
+        self.b._write(lambda conn: conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,)))
+        time.sleep(0.1)
+        self.assertIsNone(self.b.claim("tts"))
+        self.assertEqual(job(self.b, job_id)["status"], "interrupted")
+
+    def test_without_auto_resume_job_is_interrupted(self):
+        job_id = self.start_job("node-a:1")
+        self.b.auto_resume = False
+        time.sleep(0.1)
+        self.assertIsNone(self.b.claim("tts"))
+        self.assertEqual(job(self.b, job_id)["status"], "interrupted")
+        self.assertEqual(chapter(self.b, self.book_id, 2)["status"], "pending")
+
+    def test_recover_reclaims_own_jobs_immediately(self):
+        # 容器重启后主机名与 PID 相同: 不等待租约过期
+        node = make_worker_id()
+        job_id = self.start_job(node, lease_seconds=30)
+        store = make_store(node)
+        self.assertEqual(store.recover(), {"jobs": 1, "chapters": 1})
+        self.assertEqual(job(store, job_id)["status"], "queued")
+        self.assertEqual(chapter(store, self.book_id, 2)["status"], "pending")
+        store.close()
+
+    def test_recover_requeues_latest_interrupted_job(self):
+        first = self.b.enqueue(self.book_name, "tts", {})
+        self.b.finish_job(first, "interrupted")
+        second = self.b.enqueue(self.book_name, "tts", {})
+        self.b.finish_job(second, "interrupted")
+        self.assertEqual(self.b.recover()["jobs"], 1)
+        self.assertEqual(job(self.b, first)["status"], "interrupted")
+        self.assertEqual(job(self.b, second)["status"], "queued")
+
+    def test_recover_resets_orphan_processing_chapters(self):
+        db.get_cursor().execute("UPDATE tasks SET status = 'processing' WHERE book_id = ? AND chapter_index = 3",
+                                (self.book_id,))
+        db.commit()
+        self.assertEqual(self.b.recover()["chapters"], 1)
+        self.assertEqual(chapter(self.b, self.book_id, 3)["status"], "pending")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+
+import unittest
+import sys
+import os
+import logging
+import pathlib
+import tempfile
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import support  # noqa: F401 (临时数据目录，须在导入 app 之前)
+
+from app.core.log_manager import LogFilter, NO_FILTER, OPERATION_LOGGER, log_manager
+from app.db.log_store import LogStore, LogStoreHandler
+
+
+def entry(message, level="info", category="system", book=None):
+    return {"message": message, "level": level, "category": category, "book": book, "timestamp": 0}
+
+
+ENTRIES = [
+    entry("启动完成"),
+    entry("甲 第1章 合成完成", category="tts", book="甲"),
+    entry("甲 第2章 合成失败", level="error", category="tts", book="甲"),
+    entry("乙 打包完成", level="success", category="packing", book="乙"),
+    entry("磁盘空间不足", level="warning"),
+    entry("调试信息", level="debug", book="乙"),
+]
+
+
+def messages(log_filter):
+    return [item["message"] for item in log_filter.apply(ENTRIES)]
+
+
+class TestLogFilter(unittest.TestCase):
+    def test_empty_message_is_no_filter(self):
+        log_filter = LogFilter.from_message({"type": "subscribe"})
+        self.assertEqual(log_filter, NO_FILTER)
+        self.assertIs(log_filter.apply(ENTRIES), ENTRIES)
+
+    def test_books(self):
+        log_filter = LogFilter.from_message({"books": ["甲"]})
+        # 无书籍归属的系统日志不推送
+        self.assertEqual(messages(log_filter), ["甲 第1章 合成完成", "甲 第2章 合成失败"])
+
+    def test_several_books(self):
+        log_filter = LogFilter.from_message({"books": ["甲", "乙"]})
+        self.assertEqual(len(messages(log_filter)), 4)
+
+    def test_categories(self):
+        log_filter = LogFilter.from_message({"categories": ["packing", "system"]})
+        self.assertEqual(messages(log_filter), ["启动完成", "乙 打包完成", "磁盘空间不足", "调试信息"])
+
+    def test_min_level(self):
+        self.assertEqual(messages(LogFilter.from_message({"min_level": "warning"})),
+                         ["甲 第2章 合成失败", "磁盘空间不足"])
+        # success 介于 info 与 warning 之间
+        self.assertEqual(messages(LogFilter.from_message({"min_level": "SUCCESS"})),
+                         ["甲 第2章 合成失败", "乙 打包完成", "磁盘空间不足"])
+        self.assertEqual(len(messages(LogFilter.from_message({"min_level": "info"}))), 5)
+
+    def test_unknown_level_does_not_filter(self):
+        self.assertEqual(len(messages(LogFilter.from_message({"min_level": "verbose"}))), len(ENTRIES))
+
+    def test_combined(self):
+        log_filter = LogFilter.from_message({"books": ["甲", "乙"], "categories": ["tts"], "min_level": "error"})
+        self.assertEqual(messages(log_filter), ["甲 第2章 合成失败"])
+
+    def test_equal_filters_share_hash(self):
+        # 广播时按订阅条件分组，相同条件只过滤、编码一次
+        first = LogFilter.from_message({"books": ["甲", "乙"], "min_level": "info"})
+        second = LogFilter.from_message({"books": ["乙", "甲"], "min_level": "INFO"})
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second}), 1)
+
+
+def record(ts, message, level="info", book=None, chapter=None, event=None, category=None, latency_ms=None):
+    levelno = {"debug": 10, "info": 20, "success": 25, "warning": 30, "error": 40}[level]
+    return {"ts": ts, "level": level, "levelno": levelno, "logger": "app.tts", "category": category,
+            "book": book, "chapter": chapter, "event": event, "latency_ms": latency_ms, "message": message}
+
+
+class TestLogStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = LogStore(pathlib.Path(self.tmp.name) / "logs.db", retention_days=7)
+        now = 1_700_000_000.0
+        self.now = now
+        self.store.write_many([
+            record(now - 30, "甲 开始合成", book="甲", event="book_started", category="tts"),
+            record(now - 20, "[1] 合成完成", book="甲", chapter=1, event="chapter_completed", latency_ms=900),
+            record(now - 15, "[2] 合成失败: timeout", level="error", book="甲", chapter=2, event="chapter_failed"),
+            record(now - 10, "乙 打包完成", level="success", book="乙", category="packing"),
+            record(now - 5, "磁盘空间不足", level="warning"),
+            record(now - 1, "[2] 合成完成", book="甲", chapter=2, event="chapter_completed", latency_ms=1200),
+        ])
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def messages(self, **filters):
+        return [row["message"] for row in self.store.search(**filters)]
+
+    def test_newest_first(self):
+        self.assertEqual(self.messages(), [
+            "[2] 合成完成", "磁盘空间不足", "乙 打包完成", "[2] 合成失败: timeout", "[1] 合成完成", "甲 开始合成"
+        ])
+
+    def test_filters(self):
+        self.assertEqual(self.messages(book="乙"), ["乙 打包完成"])
+        self.assertEqual(self.messages(book="甲", chapter=2), ["[2] 合成完成", "[2] 合成失败: timeout"])
+        self.assertEqual(self.messages(event="chapter_completed"), ["[2] 合成完成", "[1] 合成完成"])
+        self.assertEqual(self.messages(category="packing"), ["乙 打包完成"])
+        self.assertEqual(self.messages(q="timeout"), ["[2] 合成失败: timeout"])
+
+    def test_min_level(self):
+        self.assertEqual(self.messages(level="warning"), ["磁盘空间不足", "[2] 合成失败: timeout"])
+        self.assertEqual(self.messages(level="SUCCESS"), ["磁盘空间不足", "乙 打包完成", "[2] 合成失败: timeout"])
+
+    def test_time_range(self):
+        self.assertEqual(self.messages(since=self.now - 16, until=self.now - 5),
+                         ["磁盘空间不足", "乙 打包完成", "[2] 合成失败: timeout"])
+
+    def test_pagination(self):
+        pages, before_id = [], None
+        while True:
+            rows = self.store.search(limit=4, before_id=before_id)
+            pages.append([row["message"] for row in rows])
+            if len(rows) < 4:
+                break
+            before_id = rows[-1]["id"]
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        self.assertEqual(sum(pages, []), self.messages())
+
+    def test_pagination_with_filter(self):
+        first = self.store.search(book="甲", limit=2)
+        second = self.store.search(book="甲", limit=2, before_id=first[-1]["id"])
+        self.assertEqual([row["message"] for row in first + second],
+                         ["[2] 合成完成", "[2] 合成失败: timeout", "[1] 合成完成", "甲 开始合成"])
+
+    def test_structured_fields(self):
+        row = self.store.search(event="chapter_failed")[0]
+        self.assertEqual((row["book"], row["chapter"], row["level"], row["levelno"]), ("甲", 2, "error", 40))
+        self.assertEqual(self.store.search(chapter=1)[0]["latency_ms"], 900)
+
+    def test_purge(self):
+        self.store.write_many([record(self.now - 8 * 86400, "很久以前")])
+        self.assertEqual(self.store.purge(self.now), 1)
+        self.assertNotIn("很久以前", self.messages())
+
+    def test_missing_database(self):
+        store = LogStore(pathlib.Path(self.tmp.name) / "missing.db")
+        self.assertEqual(store.search(), [])
+
+
+class TestLogStoreHandler(unittest.TestCase):
+    def test_extra_fields_written_on_flush(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = LogStore(pathlib.Path(tmp) / "logs.db")
+            handler = LogStoreHandler(store)
+            logger = logging.getLogger("test.log_store")
+            logger.propagate = False
+            logger.addHandler(handler)
+            try:
+                logger.warning("[3] 合成重试", extra={"book": "甲", "chapter": 3, "event": "chapter_retry"})
+                # 刷新前只在缓冲区中
+                self.assertEqual(store.search(), [])
+                handler.flush()
+                row = store.search()[0]
+                self.assertEqual((row["book"], row["chapter"], row["event"], row["level"]),
+                                 ("甲", 3, "chapter_retry", "warning"))
+            finally:
+                logger.removeHandler(handler)
+                handler.close()
+
+
+class TestLogManagerErrors(unittest.TestCase):
+    def test_persist_failure_is_logged(self):
+        # 持久化出错记录到本模块 Logger (带堆栈)，不中断广播
+        with mock.patch.object(logging.getLogger(OPERATION_LOGGER), "log", side_effect=OSError("disk full")):
+            with self.assertLogs("app.core.log_manager", level="ERROR") as logs:
+                log_manager._persist_log(entry("甲 删除完成", level="error"))
+        self.assertIn("Failed to persist log", logs.output[0])
+        self.assertIsNotNone(logs.records[0].exc_info)
+
+
+if __name__ == "__main__":
+    unittest.main()
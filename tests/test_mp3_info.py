@@ -0,0 +1,51 @@
+
+import unittest
+import sys
+import os
+import pathlib
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.mp3_info import measure_duration_ms, scan_frames
+
+# MPEG2 Layer III, 24kHz, 单声道, 每帧 576 采样 (24ms)
+FRAME_48K = bytes([0xFF, 0xF3, 0x64, 0xC0]) + b"\0" * 140   # 48kbps, 144 字节
+FRAME_40K = bytes([0xFF, 0xF3, 0x54, 0xC0]) + b"\0" * 116   # 40kbps, 120 字节
+
+
+def xing_frame(frames):
+    tag = b"Xing" + (1).to_bytes(4, "big") + frames.to_bytes(4, "big")
+    return bytes([0xFF, 0xF3, 0x64, 0xC0]) + b"\0" * 9 + tag + b"\0" * (131 - len(tag))
+
+
+class TestMeasureDuration(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / "a.mp3"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_xing_frame_count(self):
+        # 信息帧记录的帧数优先 (此处故意与实际帧数不同，证明只读了文件头)
+        self.path.write_bytes(xing_frame(1000) + FRAME_48K * 10)
+        self.assertEqual(measure_duration_ms(self.path), 24000)
+
+    def test_cbr_large_file(self):
+        self.path.write_bytes(b"ID3\x03\x00\x00\x00\x00\x00\x00" + FRAME_48K * 5000 + b"TAG" + b"\0" * 125)
+        self.assertEqual(measure_duration_ms(self.path), 120000)
+
+    def test_vbr_without_info_frame_falls_back_to_scan(self):
+        data = FRAME_48K * 1000 + FRAME_40K * 1000 + FRAME_48K * 1000
+        self.path.write_bytes(data)
+        self.assertEqual(measure_duration_ms(self.path), 72000)
+        self.assertEqual(scan_frames(data).frames, 3000)
+
+    def test_not_mp3(self):
+        self.path.write_bytes(b"not audio" * 100)
+        self.assertIsNone(measure_duration_ms(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
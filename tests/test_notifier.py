@@ -0,0 +1,139 @@
+
+import unittest
+import sys
+import os
+import asyncio
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import support  # noqa: F401 (临时数据目录，须在导入 app 之前)
+
+from app.services.notifier import BarkNotifier, Notification, NotificationOutbox
+
+
+class FakeBark(BarkNotifier):
+    """替代 HTTP 投递: 记录发出的通知，按 results 依次返回 (是否成功, 是否值得重试)"""
+
+    def __init__(self, results=()):
+        super().__init__(server_url="http://bark.test", api_key="key", enabled=True)
+        self.results = list(results)
+        self.sent = []
+
+    async def deliver(self, session, title, content, group=None, url=None):
+        self.sent.append(content)
+        return self.results.pop(0) if self.results else (True, False)
+
+
+def error_note(bark, chapter):
+    return Notification(
+        notifier=bark, title="⚠️ 生成失败", content=f"《甲》章节 {chapter} 重试失败", group="甲",
+        digest_key="error:key:甲", digest_summary="《甲》{count} 个章节重试失败", digest_item=str(chapter)
+    )
+
+
+class TestNotificationOutbox(unittest.TestCase):
+    def run_outbox(self, outbox, scenario):
+        async def run():
+            with mock.patch("app.services.notifier.http_client.get_session", mock.AsyncMock()):
+                try:
+                    await scenario()
+                finally:
+                    await outbox.close()
+        asyncio.run(run())
+
+    def test_duplicate_is_dropped(self):
+        bark = FakeBark()
+        outbox = NotificationOutbox(dedup_window=60)
+
+        async def scenario():
+            self.assertTrue(outbox.put(Notification(notifier=bark, title="✅ 生成完成", content="《甲》已完成")))
+            # 排队中的相同通知
+            self.assertFalse(outbox.put(Notification(notifier=bark, title="✅ 生成完成", content="《甲》已完成")))
+            await outbox.flush()
+            # 已发出的相同通知 (去重窗口内)
+            self.assertFalse(outbox.put(Notification(notifier=bark, title="✅ 生成完成", content="《甲》已完成")))
+            self.assertTrue(outbox.put(Notification(notifier=bark, title="✅ 生成完成", content="《乙》已完成")))
+            await outbox.flush()
+
+        self.run_outbox(outbox, scenario)
+        self.assertEqual(bark.sent, ["《甲》已完成", "《乙》已完成"])
+
+    def test_single_digest_message_is_sent_immediately(self):
+        bark = FakeBark()
+        outbox = NotificationOutbox(digest_window=30)
+
+        async def scenario():
+            outbox.put(error_note(bark, 3))
+            for _ in range(20):
+                if bark.sent:
+                    break
+                await asyncio.sleep(0.01)
+
+        self.run_outbox(outbox, scenario)
+        self.assertEqual(bark.sent, ["《甲》章节 3 重试失败"])
+
+    def test_digest_merges_messages_in_window(self):
+        bark = FakeBark()
+        outbox = NotificationOutbox(digest_window=0.2)
+
+        async def scenario():
+            for chapter in (3, 7, 12):
+                outbox.put(error_note(bark, chapter))
+            await asyncio.sleep(0.4)
+
+        self.run_outbox(outbox, scenario)
+        # 首条立即发出，窗口内其余的合并为一条
+        self.assertEqual(bark.sent, ["《甲》章节 3 重试失败", "《甲》2 个章节重试失败: 7, 12"])
+
+    def test_flush_sends_open_digest(self):
+        bark = FakeBark()
+        outbox = NotificationOutbox(digest_window=30)
+
+        async def scenario():
+            outbox.put(error_note(bark, 1))
+            outbox.put(error_note(bark, 2))
+            await outbox.flush()
+
+        self.run_outbox(outbox, scenario)
+        self.assertEqual(bark.sent, ["《甲》章节 1 重试失败", "《甲》章节 2 重试失败"])
+
+    def test_retry_then_success(self):
+        bark = FakeBark(results=[(False, True), (False, True), (True, False)])
+        outbox = NotificationOutbox(max_retries=3, retry_backoff=0.01)
+
+        async def scenario():
+            outbox.put(Notification(notifier=bark, title="📚 任务开始", content="《甲》已加入队列"))
+            await asyncio.sleep(0.2)
+
+        self.run_outbox(outbox, scenario)
+        self.assertEqual(len(bark.sent), 3)
+
+    def test_retry_exhaustion(self):
+        bark = FakeBark(results=[(False, True)] * 10)
+        outbox = NotificationOutbox(max_retries=2, retry_backoff=0.01)
+
+        async def scenario():
+            outbox.put(Notification(notifier=bark, title="📚 任务开始", content="《甲》已加入队列"))
+            await asyncio.sleep(0.2)
+            self.assertEqual(list(outbox._queue), [])
+
+        self.run_outbox(outbox, scenario)
+        # 首次发送 + 2 次重试后放弃
+        self.assertEqual(len(bark.sent), 3)
+
+    def test_client_error_is_not_retried(self):
+        bark = FakeBark(results=[(False, False)])
+        outbox = NotificationOutbox(max_retries=3, retry_backoff=0.01)
+
+        async def scenario():
+            outbox.put(Notification(notifier=bark, title="📚 任务开始", content="《甲》已加入队列"))
+            await asyncio.sleep(0.1)
+
+        self.run_outbox(outbox, scenario)
+        self.assertEqual(len(bark.sent), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+
+import unittest
+import sys
+import os
+import asyncio
+import itertools
+import threading
+import zipfile
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import add_book  # 临时数据目录，须在导入 app 之前
+
+from fastapi import HTTPException
+
+from app.core.config import APP_DATA_DIR, EXPORT_DIR
+from app.db.database import db
+from app.db.jobs import job_store
+from app.api.endpoints.books import pack_book_task, pack_book_endpoint, _run_zip_job
+from app.services.job_runner import JobRunner
+from app.services.pack_queue import pack_queue
+
+_book_numbers = itertools.count(1)
+
+
+def asset_rows(book_id):
+    cursor = db.get_cursor()
+    cursor.execute("SELECT id, filename FROM book_assets WHERE book_id = ?", (book_id,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def asset_entries(asset_id):
+    cursor = db.get_cursor()
+    cursor.execute("SELECT arcname FROM asset_entries WHERE asset_id = ? ORDER BY arcname", (asset_id,))
+    return [row['arcname'] for row in cursor.fetchall()]
+
+
+class TestIncrementalPack(unittest.TestCase):
+    def setUp(self):
+        # 已有两章的完整导出，随后新增第 3 章
+        self.book_name = f"增量打包{next(_book_numbers)}"
+        self.chapters = [os.urandom(700), os.urandom(1500)]
+        self.book_id = add_book(self.book_name, self.chapters)
+        self.pack()
+        [self.asset] = asset_rows(self.book_id)
+        self.zip_path = EXPORT_DIR / self.asset['filename']
+        self.original = self.zip_path.read_bytes()
+        self.new_chapter = os.urandom(900)
+        add_book(self.book_name, [self.new_chapter], start=3)
+
+    def pack(self, cancel_event=None):
+        pack_book_task(self.book_name, APP_DATA_DIR / f"{self.book_name}_audio", cancel_event or threading.Event())
+
+    def assert_original_kept(self):
+        self.assertEqual(self.zip_path.read_bytes(), self.original)
+        self.assertEqual(len(asset_entries(self.asset['id'])), 2)
+        # 追加用的副本已清理
+        self.assertEqual([p.name for p in EXPORT_DIR.glob(f"{self.book_name}_temp_*")], [])
+
+    def test_append_new_chapter(self):
+        self.pack()
+        self.assertEqual(asset_rows(self.book_id), [self.asset])
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertEqual([zf.read(name) for name in zf.namelist()], self.chapters + [self.new_chapter])
+            self.assertIsNone(zf.testzip())
+        self.assertEqual(asset_entries(self.asset['id']), ["0001-第1章.mp3", "0002-第2章.mp3", "0003-第3章.mp3"])
+
+    def test_reader_of_old_file_is_not_affected(self):
+        # 追加期间正在下载原文件的客户端读到完整的旧归档
+        with open(self.zip_path, 'rb') as reader:
+            self.pack()
+            self.assertEqual(reader.read(), self.original)
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertEqual(len(zf.namelist()), 3)
+
+    def test_cancel_keeps_original(self):
+        cancel_event = threading.Event()
+        with mock.patch.object(pack_queue.throttle, "consume", side_effect=lambda n: cancel_event.set()):
+            self.pack(cancel_event)
+        self.assert_original_kept()
+
+    def test_failure_keeps_original(self):
+        with mock.patch.object(pack_queue.throttle, "consume", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.pack()
+        self.assert_original_kept()
+
+    def test_changed_chapter_is_repacked(self):
+        # 已打包的章节内容变化: 不能追加，整体重新打包
+        self.chapters[0] = os.urandom(700)
+        add_book(self.book_name, self.chapters)
+        self.pack()
+        [asset] = asset_rows(self.book_id)
+        self.assertNotEqual(asset['id'], self.asset['id'])
+        with zipfile.ZipFile(self.zip_path) as zf:
+            self.assertEqual([zf.read(name) for name in zf.namelist()], self.chapters + [self.new_chapter])
+
+
+def request_pack(book_name, file_ids=None):
+    return pack_book_endpoint(book_name, description="Full Pack", file_ids=file_ids, priority=0)
+
+
+class TestSelectionCache(unittest.TestCase):
+    def setUp(self):
+        job_store._write(lambda conn: conn.execute("DELETE FROM jobs"))
+        self.book_name = f"导出缓存{next(_book_numbers)}"
+        self.chapters = [os.urandom(300), os.urandom(400)]
+        self.book_id = add_book(self.book_name, self.chapters)
+
+    def tearDown(self):
+        job_store._write(lambda conn: conn.execute("DELETE FROM jobs"))
+
+    def run_queued_pack(self):
+        """模拟打包线程: 领取排队中的任务并执行"""
+        job = job_store.claim("pack")
+        JobRunner()._run_pack(job, _run_zip_job, threading.Event())
+        return job
+
+    def test_cache_hit(self):
+        queued = asyncio.run(request_pack(self.book_name))
+        self.assertEqual(queued["status"], "queued")
+        self.run_queued_pack()
+        [asset] = asset_rows(self.book_id)
+
+        reused = asyncio.run(request_pack(self.book_name))
+        self.assertTrue(reused["cached"])
+        self.assertEqual(reused["asset_id"], asset["id"])
+        self.assertIsNone(job_store.active_job(self.book_name, "pack"))
+
+    def test_other_selection_misses(self):
+        asyncio.run(request_pack(self.book_name))
+        self.run_queued_pack()
+        response = asyncio.run(request_pack(self.book_name, file_ids="1"))
+        self.assertNotIn("cached", response)
+
+    def test_changed_chapter_misses(self):
+        asyncio.run(request_pack(self.book_name))
+        self.run_queued_pack()
+        # 重新合成第 2 章: 音频索引中的大小/修改时间变化
+        add_book(self.book_name, [os.urandom(450)], start=2)
+        response = asyncio.run(request_pack(self.book_name))
+        self.assertNotIn("cached", response)
+        self.assertEqual(response["status"], "queued")
+
+    def test_key_does_not_read_audio(self):
+        with mock.patch("app.api.endpoints.books.file_crc32") as crc:
+            asyncio.run(request_pack(self.book_name))
+        crc.assert_not_called()
+
+    def test_concurrent_identical_requests_share_job(self):
+        async def both():
+            return await asyncio.gather(request_pack(self.book_name), request_pack(self.book_name))
+
+        first, second = asyncio.run(both())
+        self.assertEqual(first["job_id"], second["job_id"])
+        self.assertEqual(sorted(bool(r.get("coalesced")) for r in (first, second)), [False, True])
+        jobs = job_store._read("SELECT id FROM jobs WHERE book_id = ?", (self.book_id,))
+        self.assertEqual(len(jobs), 1)
+
+    def test_different_request_while_packing_is_rejected(self):
+        asyncio.run(request_pack(self.book_name))
+        with self.assertRaises(HTTPException) as ctx:
+            asyncio.run(request_pack(self.book_name, file_ids="2"))
+        self.assertEqual(ctx.exception.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+
+import unittest
+import sys
+import os
+import asyncio
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import make_book  # 临时数据目录，须在导入 app 之前
+
+from app.db.database import db
+from app.services.tts_engine import TTSProcessor
+
+
+def chapter_statuses(book_id):
+    cursor = db.get_cursor()
+    cursor.execute("SELECT chapter_index, status FROM tasks WHERE book_id = ? ORDER BY chapter_index", (book_id,))
+    return {row['chapter_index']: row['status'] for row in cursor.fetchall()}
+
+
+class FakeSynthesis:
+    """替代 edge-tts: 记录合成的文本并写入音频文件，可选择阻塞直到放行"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.texts = []
+        self.started = asyncio.Event()
+
+    async def __call__(self, text, output_path, context_info="", max_retries=3):
+        self.texts.append(text)
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        output_path.write_bytes(b"ID3" + text.encode("utf-8"))
+
+
+class TestResume(unittest.TestCase):
+    def test_completed_chapters_are_skipped(self):
+        book_name, book_id, book_dir = make_book()
+        # 上次运行已完成第 1 章
+        (book_dir / "0001-第1章.mp3").write_bytes(b"previous run")
+        db.get_cursor().execute(
+            "UPDATE tasks SET status = 'completed', audio_path = '0001-第1章.mp3' WHERE book_id = ? AND chapter_index = 1",
+            (book_id,)
+        )
+        db.commit()
+
+        async def run():
+            processor = TTSProcessor(str(book_dir))
+            processor._synthesize_with_retry = FakeSynthesis()
+            await processor.process()
+            return processor
+
+        processor = asyncio.run(run())
+        self.assertEqual(sorted(processor._synthesize_with_retry.texts), ["第2章正文", "第3章正文"])
+        self.assertEqual((book_dir / "0001-第1章.mp3").read_bytes(), b"previous run")
+        self.assertEqual(chapter_statuses(book_id), {1: "completed", 2: "completed", 3: "completed"})
+
+    def test_chapter_claimed_by_live_node_is_not_synthesized(self):
+        book_name, book_id, book_dir = make_book(chapters=2)
+        # 其他节点正在合成第 2 章 (租约有效)
+        db.get_cursor().execute(
+            "UPDATE tasks SET status = 'processing', claimed_by = 'other-node:1', lease_until = 9e12 "
+            "WHERE book_id = ? AND chapter_index = 2", (book_id,)
+        )
+        db.commit()
+
+        async def run():
+            processor = TTSProcessor(str(book_dir))
+            processor._synthesize_with_retry = FakeSynthesis()
+            await processor.process(assist=True)
+            return processor
+
+        processor = asyncio.run(run())
+        self.assertEqual(processor._synthesize_with_retry.texts, ["第1章正文"])
+        self.assertEqual(chapter_statuses(book_id), {1: "completed", 2: "processing"})
+
+
+if __name__ == "__main__":
+    unittest.main()
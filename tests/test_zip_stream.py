@@ -0,0 +1,60 @@
+
+import unittest
+import sys
+import os
+import io
+import pathlib
+import tempfile
+import zipfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.zip_stream import StreamingZip, ZipMember, file_crc32
+
+class TestStreamingZip(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp.name)
+        self.paths = []
+        for i in range(3):
+            path = root / f"{i + 1:04d}-第{i + 1}章.mp3"
+            path.write_bytes(os.urandom(1000 + i * 777))
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def members(self, with_crc=False):
+        return [
+            ZipMember(p, p.name, p.stat().st_size, p.stat().st_mtime, file_crc32(p) if with_crc else None)
+            for p in self.paths
+        ]
+
+    def test_stream_is_valid_zip(self):
+        archive = StreamingZip(self.members())
+        data = b"".join(archive.iter_range())
+        self.assertEqual(len(data), archive.total_size)
+
+        zf = zipfile.ZipFile(io.BytesIO(data))
+        self.assertIsNone(zf.testzip())
+        self.assertEqual(zf.namelist(), [p.name for p in self.paths])
+        self.assertEqual(zf.read(self.paths[1].name), self.paths[1].read_bytes())
+        # CRC is filled in while streaming
+        self.assertTrue(archive.crc_complete)
+
+    def test_range_matches_full_stream(self):
+        full = b"".join(StreamingZip(self.members()).iter_range())
+        archive = StreamingZip(self.members(with_crc=True))
+        self.assertEqual(b"".join(archive.iter_range(500, 3000)), full[500:3001])
+        self.assertEqual(b"".join(archive.iter_range(archive.total_size - 40)), full[-40:])
+
+    def test_partial_read_requires_crc(self):
+        archive = StreamingZip(self.members())
+        with self.assertRaises(ValueError):
+            b"".join(archive.iter_range(100, 200))
+        archive.ensure_crc32()
+        self.assertEqual(len(b"".join(archive.iter_range(100, 200))), 101)
+
+if __name__ == '__main__':
+    unittest.main()